@@ -5,6 +5,8 @@ from dotenv import load_dotenv
 import os
 import logging
 
+from medidor_uso import callbacks_uso
+
 # Silenciar logs ruidosos (opcional)
 os.environ["GRPC_VERBOSITY"] = "NONE"
 os.environ["GRPC_CPP_VERBOSITY"] = "NONE"
@@ -33,7 +35,8 @@ if "{tema}" not in plantilla:
 # LLM (Gemini)
 llm = ChatGoogleGenerativeAI(
     model="gemini-2.5-flash",
-    temperature=0.7
+    temperature=0.7,
+    callbacks=callbacks_uso("1_llmchain"),
 )
 
 # PromptTemplate con el texto que vino de la GUI
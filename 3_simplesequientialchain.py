@@ -4,6 +4,9 @@ from dotenv import load_dotenv
 import os
 import logging
 
+from medidor_uso import callbacks_uso
+from trazas import trazado
+
 # Silenciar logs
 os.environ["GRPC_VERBOSITY"] = "NONE"
 os.environ["GRPC_CPP_VERBOSITY"] = "NONE"
@@ -15,7 +18,8 @@ load_dotenv()
 os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
 
 # Modelo
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.7)
+llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.7,
+                             callbacks=callbacks_uso("3_simplesequientialchain"))
 
 # Prompts (usar {input}, no {texto})
 prompt_resumen = PromptTemplate.from_template("Resume el siguiente texto: {input}")
@@ -49,6 +53,7 @@ def traducir(texto: str, idioma: str) -> str:
     return contenido.strip()
 
 
+@trazado("run_chain", ejercicio=3)
 def run_chain(texto: str) -> str:
     """
     Flujo original del ejercicio 3:
@@ -5,6 +5,9 @@ from dotenv import load_dotenv
 import os
 import logging
 
+from medidor_uso import callbacks_uso
+from trazas import trazado
+
 # Silenciar logs
 os.environ["GRPC_VERBOSITY"] = "NONE"
 os.environ["GRPC_CPP_VERBOSITY"] = "NONE"
@@ -16,7 +19,8 @@ load_dotenv()
 os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
 
 # Modelo
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.7)
+llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.7,
+                             callbacks=callbacks_uso("4_parseo"))
 
 # Prompt
 prompt = PromptTemplate.from_template(
@@ -30,6 +34,7 @@ parser = StrOutputParser()
 chain = prompt | llm | parser
 
 
+@trazado("run_chain", ejercicio=4)
 def run_chain(texto: str) -> str:
     """
     Devuelve un resumen en una sola oración del texto dado.
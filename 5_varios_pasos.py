@@ -5,6 +5,9 @@ from dotenv import load_dotenv
 import os
 import logging
 
+from medidor_uso import callbacks_uso
+from trazas import trazado
+
 # Silenciar logs
 os.environ["GRPC_VERBOSITY"] = "NONE"
 os.environ["GRPC_CPP_VERBOSITY"] = "NONE"
@@ -16,7 +19,8 @@ load_dotenv()
 os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
 
 # Modelo
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.7)
+llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.7,
+                             callbacks=callbacks_uso("5_varios_pasos"))
 
 # Prompts (usar {input}, no {texto})
 prompt_resumen = PromptTemplate.from_template("Resume el siguiente texto: {input}")
@@ -26,6 +30,7 @@ prompt_traduccion = PromptTemplate.from_template("Tradúcelo al inglés: {input}
 chain = prompt_resumen | llm | prompt_traduccion | llm | StrOutputParser()
 
 
+@trazado("run_chain", ejercicio=5)
 def run_chain(texto: str) -> str:
     """
     Ejecuta el flujo de varios pasos y devuelve texto plano.
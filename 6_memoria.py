@@ -1,29 +1,37 @@
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import ChatPromptTemplate
-from langchain.memory import ConversationBufferMemory
 from dotenv import load_dotenv
 import os
 import logging
 
+from prefijo_estable import MedidorPrefijo
+from memoria_concurrente import MemoriaSesiones, SESION_POR_DEFECTO
+from medidor_uso import callbacks_uso
+from trazas import tramo, trazado
 
-def ejecutar_con_memoria(texto: str) -> str:
+
+@trazado("ejecutar_con_memoria", ejercicio=6)
+def ejecutar_con_memoria(texto: str, sesion: str = SESION_POR_DEFECTO) -> str:
     """
     Ejecuta el modelo conservando la memoria entre llamadas.
 
-    Cada vez que se llama, se lee el historial almacenado en `memory`
-    y se añade el nuevo turno de conversación.
+    Cada vez que se llama, se lee el historial de la sesión almacenado en
+    `memoria` y se añade el nuevo turno de conversación. Es seguro llamarla
+    desde varios hilos a la vez (ver memoria_concurrente.py).
     """
-    # Cargar historial previo desde la memoria
-    history = memory.load_memory_variables({}).get("history", [])
+    # Instantánea del historial previo (no cambia aunque otro hilo escriba)
+    history = memoria.instantanea(sesion)
 
     # Crear el chain moderno (RunnableSequence)
     chain = prompt | llm
 
     # Invocar el modelo con historial e input actual
-    response = chain.invoke({"history": history, "input": texto})
+    medidor_prefijo.registrar(list(history) + [("human", texto)], sesion)
+    with tramo("llm.gemini", mensajes=len(history) + 1):
+        response = chain.invoke({"history": history, "input": texto})
 
     # Guardar el intercambio actual en la memoria
-    memory.save_context({"input": texto}, {"output": response.content})
+    memoria.agregar_turno(sesion, texto, response.content)
 
     # Retornar texto limpio
     return response.content.strip()
@@ -40,7 +48,8 @@ load_dotenv()
 os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
 
 # Modelo
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.7)
+llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.7,
+                             callbacks=callbacks_uso("6_memoria"))
 
 # Prompt con espacio para el historial
 prompt = ChatPromptTemplate.from_messages([
@@ -49,16 +58,19 @@ prompt = ChatPromptTemplate.from_messages([
     ("human", "{input}")
 ])
 
-# Crear la memoria (en RAM, no persistente)
-memory = ConversationBufferMemory(return_messages=True)
+# Crear la memoria (en RAM, no persistente), una por sesión y segura entre hilos
+memoria = MemoriaSesiones()
+
+# El historial solo crece por el final: medimos cuánto prefijo se reutiliza
+medidor_prefijo = MedidorPrefijo("6_memoria")
 
 
-def resetear_memoria():
+def resetear_memoria(sesion: str = SESION_POR_DEFECTO):
     """
     Reinicia el historial de la conversación (solo en memoria, no se usa archivo).
     """
-    global memory
-    memory = ConversationBufferMemory(return_messages=True)
+    memoria.reiniciar(sesion)
+    medidor_prefijo.reiniciar(sesion)
 
 
 if __name__ == "__main__":
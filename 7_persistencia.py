@@ -1,48 +1,111 @@
-import os, json
+import os
+import re
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import ChatPromptTemplate
-from langchain.memory import ConversationBufferMemory
 from dotenv import load_dotenv
 
-# Archivo donde se guardará la memoria
-MEMORY_FILE = "memoria.json"
+from escritor_memoria import obtener_escritor
+from memoria_binaria import ConversacionBinaria, convertir_json_a_binario
+from prefijo_estable import MedidorPrefijo, ventana_historial
+from memoria_concurrente import MemoriaSesiones, SESION_POR_DEFECTO
+from medidor_uso import callbacks_uso
+from metricas import registrar_medidor
+from monitor_ram import tamano_aprox
+from trazas import tramo, trazado
+
+# Archivo donde se guardará la memoria (formato binario con índice, ver memoria_binaria.py)
+MEMORY_FILE = "memoria.bin"
+# Formato anterior: si existe y aún no hay .bin, se convierte una sola vez
+MEMORY_JSON = "memoria.json"
+
+# Mensajes que se cargan al importar y que se envían en el prompt;
+# el resto del historial queda en disco y se lee solo si se pide.
+VENTANA_MEMORIA = int(os.getenv("MEMORIA_VENTANA", "40"))
 
 
 # --- Funciones de persistencia ---
-def guardar_memoria():
-    """Guarda el historial en JSON serializando solo texto."""
-    data = memory.load_memory_variables({})
-    # Convertir los mensajes en texto plano
-    history_text = []
-    for msg in data.get("history", []):
-        if hasattr(msg, "type") and hasattr(msg, "content"):
-            history_text.append({"type": msg.type, "content": msg.content})
-    with open(MEMORY_FILE, "w", encoding="utf-8") as f:
-        json.dump({"history": history_text}, f, ensure_ascii=False, indent=2)
-
-
-def cargar_memoria():
-    """Carga la memoria desde el archivo JSON si existe."""
-    if os.path.exists(MEMORY_FILE):
-        with open(MEMORY_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            for msg in data.get("history", []):
-                if msg["type"] == "human":
-                    memory.chat_memory.add_user_message(msg["content"])
-                elif msg["type"] == "ai":
-                    memory.chat_memory.add_ai_message(msg["content"])
+def _archivo_sesion(sesion: str) -> str:
+    if sesion == SESION_POR_DEFECTO:
+        return MEMORY_FILE
+    nombre = re.sub(r"[^\w-]", "_", sesion)
+    return f"memoria_{nombre}.bin"
+
+
+def _conversacion(sesion: str) -> ConversacionBinaria:
+    """
+    Historial en disco de la sesión. La primera vez que se usa se abre y se
+    carga en `memoria` solo la cola que necesita el prompt.
+    """
+    conv = conversaciones.get(sesion)
+    if conv is not None:
+        return conv
+    with memoria.bloqueo(sesion):
+        conv = conversaciones.get(sesion)
+        if conv is None:
+            ruta = _archivo_sesion(sesion)
+            if sesion == SESION_POR_DEFECTO and not os.path.exists(ruta) and os.path.exists(MEMORY_JSON):
+                convertir_json_a_binario(MEMORY_JSON, ruta)
+            conv = ConversacionBinaria(ruta)
+            memoria.reemplazar(sesion, conv.cola(VENTANA_MEMORIA))
+            conversaciones[sesion] = conv
+    return conv
+
+
+def _programar_guardado(sesion: str):
+    """
+    Marca la memoria como pendiente de guardar. El escritor en segundo plano
+    (ver escritor_memoria.py) añade al final del archivo solo los mensajes nuevos.
+    """
+    conv = _conversacion(sesion)
+    obtener_escritor().marcar_sucio(conv.ruta, conv.sincronizar)
+
+
+def guardar_memoria(sesion: str = SESION_POR_DEFECTO):
+    """Guarda ya mismo los mensajes pendientes (sin esperar al escritor)."""
+    conv = _conversacion(sesion)
+    obtener_escritor().descartar(conv.ruta)
+    conv.sincronizar()
+
+
+def cargar_memoria(sesion: str = SESION_POR_DEFECTO):
+    """
+    Abre el historial en disco y carga en `memoria` solo la cola que usa el prompt.
+    """
+    _conversacion(sesion)
+
+
+def uso_memoria() -> int:
+    """Bytes aproximados de los historiales en RAM, para monitor_ram.py."""
+    return sum(tamano_aprox(memoria.instantanea(s)) for s in memoria.sesiones())
+
+
+def historial_completo(sesion: str = SESION_POR_DEFECTO):
+    """Devuelve todo el historial guardado como lista de (tipo, contenido), leído de disco."""
+    return _conversacion(sesion)[:]
 
 
 # --- Ejecutar con memoria persistente ---
-def ejecutar_con_memoria(texto: str) -> str:
-    """Ejecuta el modelo conservando memoria entre sesiones."""
-    history = memory.load_memory_variables({}).get("history", [])
+@trazado("ejecutar_con_memoria", ejercicio=7)
+def ejecutar_con_memoria(texto: str, sesion: str = SESION_POR_DEFECTO) -> str:
+    """
+    Ejecuta el modelo conservando memoria entre sesiones.
+    Es seguro llamarla desde varios hilos a la vez (ver memoria_concurrente.py).
+    """
+    conv = _conversacion(sesion)
+    history = ventana_historial(memoria.instantanea(sesion), VENTANA_MEMORIA)
     chain = prompt | llm
-    response = chain.invoke({"history": history, "input": texto})
-
-    # Guardar el nuevo turno
-    memory.save_context({"input": texto}, {"output": response.content})
-    guardar_memoria()  # 🔄 Guarda después de cada interacción
+    medidor_prefijo.registrar(list(history) + [("human", texto)], sesion)
+    with tramo("llm.gemini", mensajes=len(history) + 1):
+        response = chain.invoke({"history": history, "input": texto})
+
+    # Guardar el nuevo turno (en RAM y en la cola del archivo, en el mismo orden)
+    with memoria.bloqueo(sesion):
+        if memoria.agregar_turno(sesion, texto, response.content) > VENTANA_MEMORIA:
+            # En RAM basta con lo que puede entrar en el prompt: el resto está en disco
+            memoria.reemplazar(sesion, ventana_historial(memoria.instantanea(sesion), VENTANA_MEMORIA))
+        conv.agregar("human", texto)
+        conv.agregar("ai", response.content)
+    _programar_guardado(sesion)  # 🔄 Se guarda en segundo plano tras cada interacción
 
     return response.content.strip()
 
@@ -52,7 +115,8 @@ load_dotenv()
 os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
 
 # Modelo
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.7)
+llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.7,
+                             callbacks=callbacks_uso("7_persistencia"))
 
 # Prompt con memoria
 prompt = ChatPromptTemplate.from_messages([
@@ -61,22 +125,34 @@ prompt = ChatPromptTemplate.from_messages([
     ("human", "{input}")
 ])
 
-# Crear memoria
-memory = ConversationBufferMemory(return_messages=True)
+# Crear memoria (una por sesión, segura entre hilos) y sus historiales en disco
+memoria = MemoriaSesiones()
+conversaciones = {}
+medidor_prefijo = MedidorPrefijo("7_persistencia")
+registrar_medidor("sesiones_activas", lambda: len(memoria), ejercicio="7_persistencia")
 
 # Cargar memoria previa (si existe)
 cargar_memoria()
 
 
-def resetear_memoria():
+def resetear_memoria(sesion: str = SESION_POR_DEFECTO):
     """
-    Borra la memoria en RAM y elimina el archivo JSON de historial.
+    Borra la memoria en RAM y elimina el historial en disco
+    (binario y, si quedó, el JSON del formato anterior).
     """
-    global memory
-    memory = ConversationBufferMemory(return_messages=True)
+    conv = _conversacion(sesion)
+    # Vaciar el escritor antes de borrar, para que un guardado en vuelo
+    # no vuelva a crear el archivo después del reinicio
+    obtener_escritor().flush(conv.ruta)
+    with memoria.bloqueo(sesion):
+        memoria.reiniciar(sesion)
+        conv.vaciar()
+    medidor_prefijo.reiniciar(sesion)
+    if sesion != SESION_POR_DEFECTO:
+        return
     try:
-        if os.path.exists(MEMORY_FILE):
-            os.remove(MEMORY_FILE)
+        if os.path.exists(MEMORY_JSON):
+            os.remove(MEMORY_JSON)
     except OSError:
         # Si no se puede borrar, simplemente ignoramos el error
         pass
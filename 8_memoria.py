@@ -6,16 +6,23 @@
 #   - preguntar(pregunta)
 
 import os
+import sys
 from typing import List
 
 from dotenv import load_dotenv
-from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.embeddings import Embeddings
+from langchain_core.documents import Document
+
+from extraccion_pdf import extraer_paginas
+from medidor_uso import callbacks_uso
+from metricas import registrar_medidor
+from monitor_ram import medida_profunda, tamano_aprox
+from trazas import tramo
 
 # -------------------------------------------------------------------
 # 1. Configuración de Gemini (solo para el LLM de generación de texto)
@@ -23,7 +30,8 @@ from langchain_core.embeddings import Embeddings
 load_dotenv()
 os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
 
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.5)
+llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.5,
+                             callbacks=callbacks_uso("8_memoria"))
 
 # -------------------------------------------------------------------
 # 2. Embeddings súper simples (3 números) -> NO usan torch ni APIs
@@ -43,10 +51,12 @@ class SimpleEmbeddings(Embeddings):
         return [n_words, avg_len, n_chars]
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        return [self._embed_one(t) for t in texts]
+        with tramo("rag.embeddings", textos=len(texts)):
+            return [self._embed_one(t) for t in texts]
 
     def embed_query(self, text: str) -> List[float]:
-        return self._embed_one(text)
+        with tramo("rag.embeddings", textos=1):
+            return self._embed_one(text)
 
     def __call__(self, text: str) -> List[float]:
         """
@@ -78,6 +88,7 @@ prompt = ChatPromptTemplate.from_template(template)
 # 4. Estado global (último índice cargado)
 # -------------------------------------------------------------------
 _rag_chain = None
+_retriever = None
 _pdf_actual = None
 
 
@@ -86,34 +97,52 @@ def _construir_rag_chain(pdf_path: str) -> str:
     Carga el PDF, genera los fragmentos, construye FAISS y prepara la cadena RAG.
     Devuelve un texto de resumen para mostrar en la interfaz.
     """
-    global _rag_chain, _pdf_actual
+    return _construir_indice(pdf_path)[1]
+
+
+def _construir_indice(pdf_path: str):
+    """Como _construir_rag_chain, pero devuelve (retriever, resumen)."""
+    global _rag_chain, _retriever, _pdf_actual
 
     if not os.path.isfile(pdf_path):
         raise FileNotFoundError(f"No se encontró el archivo PDF: {pdf_path}")
 
-    # 1. Cargar PDF
-    loader = PyPDFLoader(pdf_path)
-    pages = loader.load()
-    num_paginas = len(pages)
-
-    # 2. Dividir en chunks
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    docs = splitter.split_documents(pages)
-    num_docs = len(docs)
-
-    # 3. Crear vectorstore FAISS con nuestros SimpleEmbeddings
-    vectorstore = FAISS.from_documents(docs, embedding=embeddings)
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
-
-    # 4. Construir la cadena RAG
-    _rag_chain = (
-        {"context": retriever, "question": RunnablePassthrough()}
-        | prompt
-        | llm
-    )
-    _pdf_actual = pdf_path
-
-    return (
+    # Soltar el índice anterior antes de construir el nuevo, para no tener
+    # los dos en memoria a la vez
+    _rag_chain = _retriever = None
+
+    with tramo("rag.construir", pdf=os.path.basename(pdf_path)) as t:
+        # 1. Cargar PDF (servicio compartido con el cuestionario: si ya se
+        #    extrajo, sale del caché en disco)
+        with tramo("rag.cargar_pdf"):
+            pages = [
+                Document(page_content=texto, metadata={"source": pdf_path, "page": i})
+                for i, texto in enumerate(extraer_paginas(pdf_path))
+            ]
+        num_paginas = len(pages)
+
+        # 2. Dividir en chunks
+        with tramo("rag.dividir"):
+            splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+            docs = splitter.split_documents(pages)
+        num_docs = len(docs)
+
+        # 3. Crear vectorstore FAISS con nuestros SimpleEmbeddings
+        with tramo("rag.indexar", fragmentos=num_docs):
+            vectorstore = FAISS.from_documents(docs, embedding=embeddings)
+        retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
+
+        # 4. Construir la cadena RAG
+        _rag_chain = (
+            {"context": retriever, "question": RunnablePassthrough()}
+            | prompt
+            | llm
+        )
+        _retriever = retriever
+        _pdf_actual = pdf_path
+        t.atributos.update(paginas=num_paginas, fragmentos=num_docs)
+
+    return retriever, (
         f"Documento cargado correctamente:\n"
         f"  Archivo: {os.path.basename(pdf_path)}\n"
         f"  Páginas: {num_paginas}\n"
@@ -141,12 +170,16 @@ def preguntar(pregunta: str) -> str:
     """
     La GUI llama a esta función al pulsar 'Ejecutar' / 'Preguntar'.
 
-    - Si antes ya se llamó a inicializar_indice(), usa ese PDF.
+    - Si antes ya se llamó a inicializar_indice(), usa ese PDF (y si el
+      índice se liberó por memoria, lo reconstruye).
     - Si no, intenta usar documentos/fuente.pdf como valor por defecto.
     """
-    global _rag_chain, _pdf_actual
-
-    if _rag_chain is None:
+    # Una sola lectura del global: liberar_memoria() corre en el hilo del
+    # monitor de memoria y puede soltar el índice en cualquier momento
+    retriever = _retriever
+    if retriever is None and _pdf_actual and os.path.isfile(_pdf_actual):
+        retriever, _ = _construir_indice(_pdf_actual)
+    elif retriever is None:
         pdf_defecto = os.path.join("documentos", "fuente.pdf")
         if not os.path.isfile(pdf_defecto):
             raise RuntimeError(
@@ -154,13 +187,54 @@ def preguntar(pregunta: str) -> str:
                 "Primero selecciona un PDF en la interfaz, "
                 "o crea el archivo 'documentos/fuente.pdf'."
             )
-        _construir_rag_chain(pdf_defecto)
-
-    respuesta = _rag_chain.invoke(pregunta)
+        retriever, _ = _construir_indice(pdf_defecto)
+
+    # Los mismos pasos que _rag_chain, uno a uno para medir cada etapa
+    with tramo("rag.preguntar"):
+        with tramo("rag.buscar") as t:
+            contexto = retriever.invoke(pregunta)
+            t.atributos["docs"] = len(contexto)
+        with tramo("rag.prompt"):
+            mensajes = prompt.invoke({"context": contexto, "question": pregunta})
+        with tramo("llm.gemini", modelo="gemini-2.5-flash"):
+            respuesta = llm.invoke(mensajes)
     contenido = getattr(respuesta, "content", str(respuesta))
     return contenido.strip()
 
 
+def uso_memoria() -> int:
+    """
+    Bytes aproximados del índice cargado (vectores + fragmentos), para
+    monitor_ram.py. Los fragmentos se estiman con uno de muestra por su
+    número; con RAM_MEDIDA_PROFUNDA=1 se recorren todos.
+    """
+    retriever = _retriever
+    if retriever is None:
+        return 0
+    vectorstore = retriever.vectorstore
+    indice = vectorstore.index.ntotal * vectorstore.index.d * 4   # float32
+    fragmentos = vectorstore.docstore._dict
+    if medida_profunda():
+        return indice + tamano_aprox(fragmentos)
+    muestra = next(iter(fragmentos.values()), None)
+    return indice + sys.getsizeof(fragmentos) + len(fragmentos) * tamano_aprox(muestra, limite=200)
+
+
+def _vectores_indice() -> int:
+    retriever = _retriever
+    return retriever.vectorstore.index.ntotal if retriever is not None else 0
+
+
+registrar_medidor("indice_vectores", _vectores_indice, ejercicio="8_memoria")
+registrar_medidor("indice_bytes", uso_memoria, ejercicio="8_memoria")
+
+
+def liberar_memoria():
+    """Suelta el índice; preguntar() lo reconstruye del mismo PDF (la extracción sale del caché)."""
+    global _rag_chain, _retriever
+    _rag_chain = _retriever = None
+
+
 # -------------------------------------------------------------------
 # 6. Prueba rápida desde consola (opcional)
 # -------------------------------------------------------------------
@@ -0,0 +1,357 @@
+# banco_preguntas.py
+# ------------------------------------------------------
+# Banco persistente de preguntas por PDF (SQLite).
+#
+# La primera vez que se usa un PDF se genera en segundo plano un banco
+# grande (BANCO_OBJETIVO, 100 por defecto) en lotes de BANCO_POR_LOTE
+# preguntas por llamada; después cada cuestionario de 5 se sortea en local
+# sin llamar al modelo. El PDF se identifica por el hash de su contenido,
+# así que da igual dónde esté guardado o cómo se llame.
+#
+# También lleva estadísticas:
+#   - duplicados descartados al generar (misma pregunta normalizada),
+#   - reparto de la letra correcta (A-D) en el banco (sesgo del modelo),
+#   - reparto de las respuestas de los estudiantes por pregunta,
+#   - llamadas al modelo y segundos de generación, y su coste por
+#     cuestionario servido (amortizado entre sesiones).
+#
+# Uso desde la terminal:
+#   python banco_preguntas.py stats [archivo.pdf]
+# ------------------------------------------------------
+
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import threading
+
+from cuestionario_ia import (LETRAS, LIMITE_TEXTO_MAPA, NUM_PREGUNTAS, clave_dedup,
+                             dividir_secciones, generar_lote, leer_texto_pdf)
+from extraccion_pdf import hash_archivo
+from limitador import limitador_llm
+
+RUTA_POR_DEFECTO = "banco_preguntas.db"
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS pdfs (
+    hash TEXT PRIMARY KEY,
+    nombre TEXT,
+    texto TEXT,
+    creado REAL,
+    llamadas_modelo INTEGER DEFAULT 0,
+    segundos_generacion REAL DEFAULT 0,
+    duplicados INTEGER DEFAULT 0,
+    cuestionarios_servidos INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS preguntas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pdf_hash TEXT NOT NULL,
+    pregunta TEXT NOT NULL,
+    opciones TEXT NOT NULL,
+    correcta TEXT NOT NULL,
+    explicaciones TEXT,
+    clave TEXT NOT NULL,
+    origen TEXT,
+    veces_servida INTEGER DEFAULT 0,
+    creada REAL,
+    UNIQUE (pdf_hash, clave)
+);
+CREATE TABLE IF NOT EXISTS respuestas (
+    pregunta_id INTEGER NOT NULL,
+    letra TEXT NOT NULL,
+    veces INTEGER DEFAULT 0,
+    PRIMARY KEY (pregunta_id, letra)
+);
+CREATE INDEX IF NOT EXISTS idx_preguntas_pdf ON preguntas (pdf_hash, veces_servida);
+"""
+
+
+def banco_activado() -> bool:
+    return os.getenv("CUESTIONARIO_BANCO", "1").strip().lower() not in ("0", "false", "no")
+
+
+def objetivo_banco() -> int:
+    return int(os.getenv("BANCO_OBJETIVO", "100"))
+
+
+def hash_pdf(ruta: str) -> str:
+    # Memoizado por (ruta, tamaño, mtime) en el servicio de extracción
+    return hash_archivo(ruta)
+
+
+class BancoPreguntas:
+    def __init__(self, ruta: str = None):
+        self.ruta = ruta or os.getenv("BANCO_PREGUNTAS_DB", RUTA_POR_DEFECTO)
+        # Una conexión compartida entre hilos (la interfaz sortea, el llenado inserta)
+        self._con = sqlite3.connect(self.ruta, check_same_thread=False)
+        self._con.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._con:
+            self._con.execute("PRAGMA journal_mode=WAL")
+            self._con.executescript(_ESQUEMA)
+            # Bancos creados antes de guardar las explicaciones por opción
+            columnas = {f["name"] for f in self._con.execute("PRAGMA table_info(preguntas)")}
+            if "explicaciones" not in columnas:
+                self._con.execute("ALTER TABLE preguntas ADD COLUMN explicaciones TEXT")
+
+    def cerrar(self):
+        with self._lock:
+            self._con.close()
+
+    # ---------------- Escritura ----------------
+    def registrar_pdf(self, pdf_hash: str, nombre: str = None, texto: str = None):
+        """Da de alta el PDF; guarda su texto extraído (lo usa la calificación)."""
+        with self._lock, self._con:
+            self._con.execute(
+                "INSERT OR IGNORE INTO pdfs (hash, nombre, creado) VALUES (?, ?, ?)",
+                (pdf_hash, nombre, time.time()),
+            )
+            if texto:
+                self._con.execute("UPDATE pdfs SET texto = ? WHERE hash = ?", (texto, pdf_hash))
+
+    def agregar_preguntas(self, pdf_hash: str, preguntas_mc, origen: str = None):
+        """
+        Guarda las preguntas descartando las repetidas.
+        Devuelve (ids, nuevas): un id por pregunta, en el mismo orden (para
+        las repetidas, el de la que ya estaba), y cuántas eran nuevas.
+        """
+        ids, nuevas = [], 0
+        with self._lock, self._con:
+            for item in preguntas_mc:
+                opciones = list(item.get("opciones", []))[:4]
+                while len(opciones) < 4:
+                    opciones.append("Opción faltante")
+                explicaciones = (list(item.get("explicaciones") or []) + [""] * 4)[:4]
+                clave = clave_dedup(item.get("pregunta", ""))
+                cur = self._con.execute(
+                    "INSERT OR IGNORE INTO preguntas "
+                    "(pdf_hash, pregunta, opciones, correcta, explicaciones, clave, origen, creada) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (pdf_hash, item.get("pregunta", "").strip(),
+                     json.dumps(opciones, ensure_ascii=False),
+                     (item.get("correcta") or "").upper()[:1],
+                     json.dumps(explicaciones, ensure_ascii=False), clave, origen, time.time()),
+                )
+                if cur.rowcount:
+                    nuevas += 1
+                    ids.append(cur.lastrowid)
+                else:
+                    fila = self._con.execute(
+                        "SELECT id FROM preguntas WHERE pdf_hash = ? AND clave = ?",
+                        (pdf_hash, clave),
+                    ).fetchone()
+                    ids.append(fila["id"])
+            self._con.execute(
+                "UPDATE pdfs SET duplicados = duplicados + ? WHERE hash = ?",
+                (len(ids) - nuevas, pdf_hash),
+            )
+        return ids, nuevas
+
+    def registrar_generacion(self, pdf_hash: str, llamadas: int, segundos: float):
+        with self._lock, self._con:
+            self._con.execute(
+                "UPDATE pdfs SET llamadas_modelo = llamadas_modelo + ?, "
+                "segundos_generacion = segundos_generacion + ? WHERE hash = ?",
+                (llamadas, segundos, pdf_hash),
+            )
+
+    def registrar_servido(self, pdf_hash: str, ids):
+        with self._lock, self._con:
+            self._con.executemany(
+                "UPDATE preguntas SET veces_servida = veces_servida + 1 WHERE id = ?",
+                [(i,) for i in ids],
+            )
+            self._con.execute(
+                "UPDATE pdfs SET cuestionarios_servidos = cuestionarios_servidos + 1 WHERE hash = ?",
+                (pdf_hash,),
+            )
+
+    def registrar_respuestas(self, ids, letras, opciones_servidas=None):
+        """
+        Suma la letra elegida por el estudiante en cada pregunta ("" = sin respuesta).
+        Si las opciones se barajaron al servir, `opciones_servidas` (las listas
+        tal como se mostraron) permite traducir la letra a la del banco.
+        """
+        with self._lock, self._con:
+            for i, (id_, letra) in enumerate(zip(ids, letras)):
+                if id_ is None:
+                    continue
+                if letra in LETRAS and opciones_servidas:
+                    fila = self._con.execute(
+                        "SELECT opciones FROM preguntas WHERE id = ?", (id_,)
+                    ).fetchone()
+                    originales = json.loads(fila["opciones"]) if fila else []
+                    servidas = opciones_servidas[i] if i < len(opciones_servidas) else []
+                    indice = LETRAS.index(letra)
+                    # Una pregunta con menos de 4 opciones: la letra no existe en la servida
+                    elegida = servidas[indice] if indice < len(servidas) else None
+                    if elegida is None:
+                        letra = ""
+                    elif elegida in originales:
+                        letra = LETRAS[originales.index(elegida)]
+                self._con.execute(
+                    "INSERT INTO respuestas (pregunta_id, letra, veces) VALUES (?, ?, 1) "
+                    "ON CONFLICT (pregunta_id, letra) DO UPDATE SET veces = veces + 1",
+                    (id_, letra or "-"),
+                )
+
+    # ---------------- Lectura ----------------
+    def contar(self, pdf_hash: str) -> int:
+        with self._lock:
+            fila = self._con.execute(
+                "SELECT COUNT(*) FROM preguntas WHERE pdf_hash = ?", (pdf_hash,)
+            ).fetchone()
+        return fila[0]
+
+    def sortear(self, pdf_hash: str, n: int = NUM_PREGUNTAS, barajar_opciones: bool = True):
+        """
+        Elige n preguntas (primero las menos servidas, al azar entre ellas)
+        y las marca como servidas. Con barajar_opciones, reordena las
+        opciones y ajusta la letra correcta. Devuelve (preguntas_mc, ids)
+        o (None, None) si el banco aún no tiene n preguntas.
+        """
+        with self._lock:
+            filas = self._con.execute(
+                "SELECT id, pregunta, opciones, correcta, explicaciones FROM preguntas "
+                "WHERE pdf_hash = ? ORDER BY veces_servida, RANDOM() LIMIT ?",
+                (pdf_hash, n),
+            ).fetchall()
+        if len(filas) < n:
+            return None, None
+
+        preguntas_mc, ids = [], []
+        for fila in filas:
+            opciones = json.loads(fila["opciones"])
+            explicaciones = json.loads(fila["explicaciones"] or "[]") or [""] * len(opciones)
+            correcta = fila["correcta"]
+            if barajar_opciones and correcta in LETRAS:
+                # Cada explicación viaja con su opción
+                pares = list(zip(opciones, explicaciones))
+                texto_correcta = opciones[LETRAS.index(correcta)]
+                random.shuffle(pares)
+                opciones, explicaciones = [list(t) for t in zip(*pares)]
+                correcta = LETRAS[opciones.index(texto_correcta)]
+            preguntas_mc.append({"pregunta": fila["pregunta"], "opciones": opciones,
+                                 "correcta": correcta, "explicaciones": explicaciones})
+            ids.append(fila["id"])
+        self.registrar_servido(pdf_hash, ids)
+        return preguntas_mc, ids
+
+    def texto(self, pdf_hash: str) -> str:
+        with self._lock:
+            fila = self._con.execute("SELECT texto FROM pdfs WHERE hash = ?", (pdf_hash,)).fetchone()
+        return (fila["texto"] if fila else None) or ""
+
+    def recientes(self, pdf_hash: str, limite: int = 30):
+        """Enunciados más recientes (para pedir al modelo que no los repita)."""
+        with self._lock:
+            filas = self._con.execute(
+                "SELECT pregunta FROM preguntas WHERE pdf_hash = ? ORDER BY id DESC LIMIT ?",
+                (pdf_hash, limite),
+            ).fetchall()
+        return [f["pregunta"] for f in filas]
+
+    def estadisticas(self, pdf_hash: str) -> dict:
+        with self._lock:
+            pdf = self._con.execute("SELECT * FROM pdfs WHERE hash = ?", (pdf_hash,)).fetchone()
+            total = self._con.execute(
+                "SELECT COUNT(*), COALESCE(SUM(veces_servida), 0) FROM preguntas WHERE pdf_hash = ?",
+                (pdf_hash,),
+            ).fetchone()
+            letras_banco = dict(self._con.execute(
+                "SELECT correcta, COUNT(*) FROM preguntas WHERE pdf_hash = ? GROUP BY correcta",
+                (pdf_hash,),
+            ).fetchall())
+            resp = self._con.execute(
+                "SELECT r.letra, SUM(r.veces), "
+                "SUM(CASE WHEN r.letra = p.correcta THEN r.veces ELSE 0 END) "
+                "FROM respuestas r JOIN preguntas p ON p.id = r.pregunta_id "
+                "WHERE p.pdf_hash = ? GROUP BY r.letra",
+                (pdf_hash,),
+            ).fetchall()
+
+        if pdf is None:
+            return {}
+        respuestas = {fila[0]: fila[1] for fila in resp}
+        total_resp = sum(respuestas.values())
+        aciertos = sum(fila[2] for fila in resp)
+        servidos = pdf["cuestionarios_servidos"]
+        return {
+            "nombre": pdf["nombre"],
+            "preguntas": total[0],
+            "veces_servidas": total[1],
+            "cuestionarios_servidos": servidos,
+            "duplicados_descartados": pdf["duplicados"],
+            "llamadas_modelo": pdf["llamadas_modelo"],
+            "segundos_generacion": round(pdf["segundos_generacion"], 1),
+            "llamadas_por_cuestionario": round(pdf["llamadas_modelo"] / servidos, 3) if servidos else None,
+            "correcta_en_banco": {l: letras_banco.get(l, 0) for l in LETRAS},
+            "respuestas_estudiantes": respuestas,
+            "tasa_acierto": round(aciertos / total_resp, 3) if total_resp else None,
+        }
+
+    def pdfs(self):
+        with self._lock:
+            return [dict(f) for f in self._con.execute("SELECT hash, nombre FROM pdfs").fetchall()]
+
+
+# ---------------- Llenado en lote ----------------
+def llenar_banco(banco: BancoPreguntas, ruta_pdf: str, generador, pdf_hash: str = None,
+                 texto: str = None, objetivo: int = None, por_lote: int = None,
+                 max_fallos: int = 3, progreso=None, token=None) -> int:
+    """
+    Genera preguntas hasta que el banco del PDF tenga `objetivo`.
+    Cada llamada al modelo pide `por_lote` preguntas nuevas sobre una
+    sección del PDF (se van rotando para cubrir el documento entero) y se
+    le pasan las más recientes para que no las repita. Para tras
+    `max_fallos` lotes seguidos sin preguntas nuevas. Devuelve cuántas hay.
+    """
+    objetivo = objetivo or objetivo_banco()
+    por_lote = por_lote or int(os.getenv("BANCO_POR_LOTE", "20"))
+    progreso = progreso or (lambda *a: None)
+    pdf_hash = pdf_hash or hash_pdf(ruta_pdf)
+
+    if not texto:
+        texto = banco.texto(pdf_hash) or leer_texto_pdf(ruta_pdf, limite=LIMITE_TEXTO_MAPA, token=token)
+    banco.registrar_pdf(pdf_hash, os.path.basename(ruta_pdf), texto)
+    if not texto.strip():
+        raise RuntimeError("No se pudo extraer texto del PDF.")
+
+    secciones = dividir_secciones(texto)
+    fallos = lote = 0
+    total = banco.contar(pdf_hash)
+    while total < objetivo and fallos < max_fallos:
+        if token is not None:
+            token.verificar()
+        progreso("banco", int(100 * total / objetivo), f"Banco de preguntas: {total}/{objetivo}")
+
+        inicio = time.perf_counter()
+        seccion = secciones[lote % len(secciones)]
+        lote += 1
+        uso = {}
+        # Un lote a medias también sirve: lo que falte lo pide el siguiente
+        preguntas_mc, origen = generar_lote(
+            generador, seccion["texto"], min(por_lote, objetivo - total),
+            evitar=banco.recientes(pdf_hash), log=lambda m: progreso(None, None, m),
+            token=token, limitador=limitador_llm(), uso=uso, parcial=True,
+        )
+        banco.registrar_generacion(pdf_hash, uso.get("llamadas", 0), time.perf_counter() - inicio)
+
+        nuevas = banco.agregar_preguntas(pdf_hash, preguntas_mc, origen)[1] if preguntas_mc else 0
+        fallos = 0 if nuevas else fallos + 1
+        total = banco.contar(pdf_hash)
+
+    progreso("banco", 100, f"Banco de preguntas: {total}/{objetivo}")
+    return total
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "stats":
+        print("Uso: python banco_preguntas.py stats [archivo.pdf]")
+        sys.exit(1)
+    banco = BancoPreguntas()
+    hashes = [hash_pdf(sys.argv[2])] if len(sys.argv) > 2 else [p["hash"] for p in banco.pdfs()]
+    for h in hashes:
+        print(f"{h[:12]}…", json.dumps(banco.estadisticas(h), ensure_ascii=False, indent=2))
@@ -0,0 +1,76 @@
+# benchmarks/apertura_ventanas.py
+# ------------------------------------------------------
+# Tiempo para abrir cada ventana:
+#   - loadUi:     construyendo el diálogo parseando el .ui (como antes)
+#   - compilada:  construyendo el diálogo con la clase de compilar_interfaces.py
+#   - reapertura: la ventana ya está en caché (Load_ventana_principal la reutiliza)
+#                 y solo se vuelve a mostrar
+#
+# Uso (desde la raíz del proyecto):
+#   python compilar_interfaces.py
+#   QT_QPA_PLATFORM=offscreen python benchmarks/apertura_ventanas.py [--repeticiones 10]
+# ------------------------------------------------------
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.chdir(RAIZ)
+
+from PyQt5 import QtWidgets
+
+VENTANAS = (
+    ("basicos", "load.load_ventana_modelos_basicos", "Load_ventana_modelos_basicos"),
+    ("langchain", "load.load_ventana_langchain", "Load_ventana_langchain"),
+    ("cuestionario", "load.load_ventana_cuestionario", "Load_ventana_cuestionario"),
+)
+
+
+def medir_construccion(app, clase, repeticiones: int) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        ventana = clase()
+        app.processEvents()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        ventana.deleteLater()
+    return statistics.median(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de apertura de ventanas")
+    parser.add_argument("--repeticiones", type=int, default=10)
+    args = parser.parse_args()
+
+    app = QtWidgets.QApplication(sys.argv)
+
+    print(f"{'ventana':<14}{'loadUi (ms)':>14}{'compilada (ms)':>16}{'reapertura (ms)':>17}")
+    for nombre, modulo, clase_nombre in VENTANAS:
+        clase = getattr(__import__(modulo, fromlist=[clase_nombre]), clase_nombre)
+
+        os.environ["GUI_UI_COMPILADAS"] = "0"
+        t_loadui = medir_construccion(app, clase, args.repeticiones)
+
+        os.environ["GUI_UI_COMPILADAS"] = "1"
+        t_compilada = medir_construccion(app, clase, args.repeticiones)
+
+        # Reapertura con caché: la instancia ya existe, solo se vuelve a mostrar
+        ventana = clase()
+        tiempos = []
+        for _ in range(args.repeticiones):
+            inicio = time.perf_counter()
+            ventana.show()
+            app.processEvents()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+            ventana.hide()
+        t_reapertura = statistics.median(tiempos)
+
+        print(f"{nombre:<14}{t_loadui:>14.1f}{t_compilada:>16.1f}{t_reapertura:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
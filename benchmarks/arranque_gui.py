@@ -0,0 +1,92 @@
+# benchmarks/arranque_gui.py
+# ------------------------------------------------------
+# Mide el arranque en frío de main_gui.py hasta el primer pintado.
+#
+# Lanza varias veces `python -X importtime main_gui.py` con
+# GUI_MEDIR_ARRANQUE=1 (la app sale sola tras el primer Paint) y reporta:
+#   - tiempo total del proceso y tiempo hasta el primer pintado (mediana)
+#   - los módulos más caros según -X importtime (tiempo acumulado)
+#
+# Uso (desde la raíz del proyecto):
+#   python benchmarks/arranque_gui.py [--repeticiones 5] [--top 15] [--historial arranque.jsonl]
+# Con --historial se añade una línea JSON por ejecución para seguir la evolución.
+# Sin pantalla: QT_QPA_PLATFORM=offscreen python benchmarks/arranque_gui.py
+# ------------------------------------------------------
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+_LINEA_IMPORTTIME = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\| (\s*)(\S+)")
+
+
+def una_ejecucion():
+    env = os.environ.copy()
+    env["GUI_MEDIR_ARRANQUE"] = "1"
+    env["GUI_PRECALENTAR"] = "0"  # que el precalentado no se mezcle con la medida
+
+    inicio = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "main_gui.py"],
+        cwd=str(RAIZ), env=env, capture_output=True, text=True, timeout=120,
+    )
+    total_ms = (time.perf_counter() - inicio) * 1000
+
+    m = re.search(r"primer_pintado_ms=([\d.]+)", proc.stdout)
+    if proc.returncode != 0 or not m:
+        raise RuntimeError(f"main_gui.py no llegó al primer pintado:\n{proc.stderr[-2000:]}")
+
+    importaciones = {}
+    for linea in proc.stderr.splitlines():
+        mi = _LINEA_IMPORTTIME.match(linea)
+        if mi:
+            # Solo módulos importados directamente (sin sangría) para no contar dos veces
+            if not mi.group(3):
+                importaciones[mi.group(4)] = int(mi.group(2)) / 1000.0
+
+    return total_ms, float(m.group(1)), importaciones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Arranque en frío de main_gui.py")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--historial", help="archivo JSONL donde acumular resultados")
+    args = parser.parse_args()
+
+    totales, pintados, ultima = [], [], {}
+    for i in range(args.repeticiones):
+        total, pintado, ultima = una_ejecucion()
+        totales.append(total)
+        pintados.append(pintado)
+        print(f"  ejecución {i + 1}: proceso {total:.0f} ms, primer pintado {pintado:.0f} ms")
+
+    resultado = {
+        "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "proceso_ms": round(statistics.median(totales), 1),
+        "primer_pintado_ms": round(statistics.median(pintados), 1),
+        "importaciones_ms": round(sum(ultima.values()), 1),
+    }
+    print(f"\nMediana: proceso {resultado['proceso_ms']} ms, "
+          f"primer pintado {resultado['primer_pintado_ms']} ms "
+          f"(importaciones de primer nivel {resultado['importaciones_ms']} ms)")
+
+    print("\nMódulos más caros (acumulado, última ejecución):")
+    for nombre, ms in sorted(ultima.items(), key=lambda x: -x[1])[:args.top]:
+        print(f"  {ms:8.1f} ms  {nombre}")
+
+    if args.historial:
+        with open(args.historial, "a", encoding="utf-8") as f:
+            f.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
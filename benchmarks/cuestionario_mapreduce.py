@@ -0,0 +1,103 @@
+# benchmarks/cuestionario_mapreduce.py
+# ------------------------------------------------------
+# Generación de un cuestionario de 5 preguntas sobre un PDF largo:
+#   - simple:    un único prompt con el inicio del texto (camino anterior)
+#   - mapreduce: secciones en paralelo + reductor local (cuestionario_ia.py)
+#
+# Se informa el tiempo de reloj y la cobertura (qué fracción del documento
+# se consultó y de qué fracción salen las preguntas).
+#
+# Por defecto usa un modelo simulado sin red: su latencia crece con el
+# tamaño del prompt y con el número de preguntas pedidas (tiempo de salida),
+# y devuelve preguntas que nombran palabras de su sección. Con --real se
+# usan Gemini/Groq de verdad (necesita GOOGLE_API_KEY o GROQ_API_KEY).
+#
+# Uso (desde la raíz del proyecto):
+#   python benchmarks/cuestionario_mapreduce.py [--pdf documentos/x.pdf] [--paginas 60] [--real]
+# ------------------------------------------------------
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Las llamadas simuladas no cuentan en el medidor de uso (medidor_uso.py)
+os.environ.setdefault("USO_LLM", "0")
+
+from cuestionario_ia import (GeneradorCuestionario, LIMITE_TEXTO_MAPA, MODO_MAPREDUCE,
+                             MODO_SIMPLE, generar_cuestionario, leer_texto_pdf)
+from limitador import limitador_llm
+
+PALABRAS = ("red neuronal gradiente perceptron kernel regresion arbol bosque entropia "
+            "atencion transformador embedding clustering margen sesgo varianza").split()
+
+
+class GeneradorSimulado:
+    """Mismo contrato que GeneradorCuestionario, sin red."""
+
+    def __init__(self, ms_base=400, ms_por_kchar=60, ms_por_pregunta=350):
+        self.gemini_model = object()
+        self.groq_client = None
+        self.ms_base, self.ms_por_kchar, self.ms_por_pregunta = ms_base, ms_por_kchar, ms_por_pregunta
+
+    def configurar(self):
+        pass
+
+    def generar_con_gemini(self, prompt, log=None, num=5, uso=None):
+        base = prompt.split('TEXTO BASE:', 1)[-1]
+        ms = self.ms_base + self.ms_por_kchar * len(prompt) / 1000 + self.ms_por_pregunta * num
+        time.sleep(ms / 1000)
+        palabras = [p for p in base.split() if len(p) > 6] or ["texto"]
+        rnd = random.Random(base)
+        return [{
+            "pregunta": f"¿Qué relación hay entre {rnd.choice(palabras)} y {rnd.choice(palabras)}?",
+            "opciones": ["uno", "dos", "tres", "cuatro"],
+            "correcta": rnd.choice("ABCD"),
+        } for _ in range(num)]
+
+    def generar_con_groq(self, prompt, log=None, num=5, uso=None):
+        return None
+
+
+def texto_sintetico(paginas: int) -> str:
+    rnd = random.Random(7)
+    return "\n".join(
+        f"Página {p}. " + " ".join(f"{rnd.choice(PALABRAS)}{p}" for _ in range(350))
+        for p in range(paginas)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cuestionario simple vs. map-reduce")
+    parser.add_argument("--pdf", help="PDF a usar (por defecto, texto sintético)")
+    parser.add_argument("--paginas", type=int, default=60, help="páginas del texto sintético")
+    parser.add_argument("--real", action="store_true", help="usar Gemini/Groq de verdad")
+    args = parser.parse_args()
+
+    if args.pdf:
+        texto = leer_texto_pdf(args.pdf, limite=LIMITE_TEXTO_MAPA)
+    else:
+        texto = texto_sintetico(args.paginas)
+    generador = GeneradorCuestionario() if args.real else GeneradorSimulado()
+    if not args.real:
+        # El simulado no tiene cuota: que el limitador no distorsione la medida
+        limitador_llm().por_minuto = 0
+
+    print(f"texto: {len(texto)} caracteres ({'real' if args.real else 'modelo simulado'})")
+    for modo in (MODO_SIMPLE, MODO_MAPREDUCE):
+        inicio = time.perf_counter()
+        resultado = generar_cuestionario(args.pdf or "sintetico.pdf", generador, texto=texto, modo=modo)
+        segundos = time.perf_counter() - inicio
+        cobertura = resultado["cobertura"]
+        print(f"\n{modo:<10} {segundos:6.2f} s  origen={resultado['origen']}")
+        print("  cobertura:", json.dumps(cobertura, ensure_ascii=False))
+    espera = limitador_llm().segundos_espera
+    if espera:
+        print(f"\nespera acumulada en el limitador: {espera:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# benchmarks/estres_memoria.py
+# ------------------------------------------------------
+# Prueba de estrés de la memoria concurrente (memoria_concurrente.py).
+#
+# Lanza muchos hilos que conversan en paralelo, varios de ellos sobre la
+# MISMA sesión, con el mismo flujo que 7_persistencia.ejecutar_con_memoria
+# (instantánea -> "modelo" -> agregar turno + encolar en disco), y al final
+# comprueba que no se perdió ni se desordenó ningún turno, tanto en RAM
+# como en el historial binario escrito por el escritor en segundo plano.
+#
+# Uso (desde la raíz del proyecto):
+#   python benchmarks/estres_memoria.py [--hilos 32] [--sesiones 4] [--turnos 200]
+# Devuelve código 1 si detecta turnos perdidos.
+# ------------------------------------------------------
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memoria_concurrente import MemoriaSesiones
+from memoria_binaria import ConversacionBinaria
+from escritor_memoria import EscritorMemoria
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estrés de memoria concurrente")
+    parser.add_argument("--hilos", type=int, default=32)
+    parser.add_argument("--sesiones", type=int, default=4)
+    parser.add_argument("--turnos", type=int, default=200, help="turnos por hilo")
+    args = parser.parse_args()
+
+    memoria = MemoriaSesiones()
+    escritor = EscritorMemoria(durabilidad="intervalo", intervalo=0.05)
+    carpeta = tempfile.mkdtemp(prefix="estres_memoria_")
+    conversaciones = {
+        f"s{i}": ConversacionBinaria(os.path.join(carpeta, f"s{i}.bin"))
+        for i in range(args.sesiones)
+    }
+    errores = []
+
+    def conversar(n_hilo: int):
+        sesion = f"s{n_hilo % args.sesiones}"
+        conv = conversaciones[sesion]
+        for t in range(args.turnos):
+            historial = memoria.instantanea(sesion)
+            # Un lector nunca debe ver un turno a medias
+            if len(historial) % 2:
+                errores.append(f"{sesion}: instantánea con turno incompleto")
+            if random.random() < 0.05:
+                time.sleep(0)  # cede el GIL, como haría la llamada de red
+            pregunta = f"h{n_hilo}-t{t}"
+            with memoria.bloqueo(sesion):
+                memoria.agregar_turno(sesion, pregunta, f"r:{pregunta}")
+                conv.agregar("human", pregunta)
+                conv.agregar("ai", f"r:{pregunta}")
+            escritor.marcar_sucio(conv.ruta, conv.sincronizar)
+
+    inicio = time.perf_counter()
+    hilos = [threading.Thread(target=conversar, args=(i,)) for i in range(args.hilos)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    escritor.cerrar()
+    duracion = time.perf_counter() - inicio
+
+    # ---- Verificación ----
+    por_sesion = {s: [] for s in conversaciones}
+    for i in range(args.hilos):
+        por_sesion[f"s{i % args.sesiones}"].append(i)
+
+    for sesion, hilos_sesion in por_sesion.items():
+        esperados = len(hilos_sesion) * args.turnos * 2
+        en_ram = memoria.instantanea(sesion)
+        en_disco = ConversacionBinaria(conversaciones[sesion].ruta)[:]
+        if len(en_ram) != esperados:
+            errores.append(f"{sesion}: {len(en_ram)} mensajes en RAM, se esperaban {esperados}")
+        if list(en_disco) != list(en_ram):
+            errores.append(f"{sesion}: el historial en disco no coincide con el de RAM")
+        for i in range(0, len(en_ram), 2):
+            (t1, humano), (t2, ia) = en_ram[i], en_ram[i + 1]
+            if t1 != "human" or t2 != "ai" or ia != f"r:{humano}":
+                errores.append(f"{sesion}: turno {i // 2} mezclado ({humano!r} / {ia!r})")
+                break
+        # El orden de cada hilo dentro de su sesión debe conservarse
+        for n_hilo in hilos_sesion:
+            propios = [c for t, c in en_ram if t == "human" and c.startswith(f"h{n_hilo}-")]
+            if propios != [f"h{n_hilo}-t{t}" for t in range(args.turnos)]:
+                errores.append(f"{sesion}: turnos del hilo {n_hilo} perdidos o desordenados")
+
+    total = args.hilos * args.turnos
+    print(f"{total} turnos en {duracion:.2f} s ({total / duracion:,.0f} turnos/s), "
+          f"{args.hilos} hilos sobre {args.sesiones} sesiones")
+    if errores:
+        print("FALLO:")
+        for e in errores[:20]:
+            print("  -", e)
+        sys.exit(1)
+    print("OK: ningún turno perdido ni desordenado.")
+
+
+if __name__ == "__main__":
+    main()
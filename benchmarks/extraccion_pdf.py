@@ -0,0 +1,100 @@
+# benchmarks/extraccion_pdf.py
+# ------------------------------------------------------
+# Rendimiento de la extracción de texto de un PDF:
+#   - anterior:    PdfReader página a página con `texto += ...`
+#                  (lo que hacía el cuestionario)
+#   - secuencial:  extraccion_pdf.py con PDF_PROCESOS=1, sin caché
+#   - paralelo:    extraccion_pdf.py con el pool de procesos, sin caché
+#   - límite:      paralelo con limite=16000 (salida temprana)
+#   - caché:       segunda lectura del mismo PDF (caché en disco)
+#
+# Uso (desde la raíz del proyecto):
+#   python benchmarks/extraccion_pdf.py [--pdf documentos/fuente.pdf] [--procesos 4] [--repetir 10]
+#
+# fuente.pdf tiene pocas páginas (menos de las que justifican el pool):
+# --repetir N mide un PDF temporal con sus páginas repetidas N veces.
+# ------------------------------------------------------
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import extraccion_pdf
+from extraccion_pdf import _pdf_reader, extraer_paginas
+
+
+def anterior(ruta):
+    reader = _pdf_reader(ruta)
+    texto = ""
+    for page in reader.pages:
+        texto += (page.extract_text() or "") + "\n"
+    return texto
+
+
+def repetir_paginas(ruta, veces, carpeta):
+    from pypdf import PdfWriter
+    writer = PdfWriter()
+    for _ in range(veces):
+        writer.append(ruta)
+    destino = os.path.join(carpeta, f"x{veces}_" + os.path.basename(ruta))
+    with open(destino, "wb") as f:
+        writer.write(f)
+    return destino
+
+
+def medir(nombre, fn, paginas_pdf):
+    inicio = time.perf_counter()
+    resultado = fn()
+    segundos = time.perf_counter() - inicio
+    caracteres = len(resultado) if isinstance(resultado, str) else sum(len(p) for p in resultado)
+    paginas = paginas_pdf if isinstance(resultado, str) else len(resultado)
+    print(f"  {nombre:<11} {segundos * 1000:9.1f} ms  {paginas:4d} págs  "
+          f"{paginas / segundos:8.1f} págs/s  {caracteres:8d} caracteres")
+    return segundos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Velocidad de extracción de texto de PDF")
+    parser.add_argument("--pdf", default=os.path.join(RAIZ, "documentos", "fuente.pdf"))
+    parser.add_argument("--procesos", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--repetir", type=int, default=1)
+    args = parser.parse_args()
+
+    cache = tempfile.mkdtemp(prefix="cache_pdf_")
+    os.environ["PDF_CACHE_DIR"] = ""
+    try:
+        if args.repetir > 1:
+            args.pdf = repetir_paginas(args.pdf, args.repetir, cache)
+        total = len(_pdf_reader(args.pdf).pages)
+        print(f"{os.path.basename(args.pdf)}: {total} páginas, {args.procesos} procesos")
+
+        t_anterior = medir("anterior", lambda: anterior(args.pdf), total)
+        medir("secuencial", lambda: extraer_paginas(args.pdf, procesos=1), total)
+
+        # Arranque del pool (spawn) aparte: se paga una vez por sesión
+        inicio = time.perf_counter()
+        extraer_paginas(args.pdf, limite=1, procesos=args.procesos)
+        print(f"  (arranque del pool: {(time.perf_counter() - inicio) * 1000:.1f} ms)")
+
+        t_paralelo = medir("paralelo", lambda: extraer_paginas(args.pdf, procesos=args.procesos), total)
+        medir("límite 16k", lambda: extraer_paginas(args.pdf, limite=16000, procesos=args.procesos), total)
+
+        os.environ["PDF_CACHE_DIR"] = cache
+        extraer_paginas(args.pdf, procesos=args.procesos)
+        t_cache = medir("caché", lambda: extraer_paginas(args.pdf), total)
+
+        print(f"\n  paralelo vs. anterior: x{t_anterior / t_paralelo:.1f}")
+        print(f"  caché vs. anterior:    x{t_anterior / t_cache:.0f}")
+    finally:
+        extraccion_pdf.cerrar_pool()
+        shutil.rmtree(cache, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
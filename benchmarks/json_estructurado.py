@@ -0,0 +1,136 @@
+# benchmarks/json_estructurado.py
+# ------------------------------------------------------
+# Llamadas y tokens por cuestionario válido de 5 preguntas:
+#   - anterior:     json.loads estricto; si falla, otra generación completa
+#                   con Groq y, si también falla, el estudiante vuelve a pulsar
+#   - tolerante:    json_tolerante.py + pedir solo las preguntas que faltan
+#                   (modo texto, CUESTIONARIO_JSON_ESTRUCTURADO=0)
+#   - estructurado: lo mismo con salida JSON con esquema
+#
+# El modelo es simulado y determinista (semilla fija). En modo texto mete
+# los defectos típicos con estas probabilidades por respuesta: ```json
+# alrededor, una coma final, una frase antes del JSON, la lista cortada a
+# mitad, y alguna pregunta sin opciones. Con esquema solo quedan los fallos
+# de contenido (preguntas sin opciones o que faltan), no los de sintaxis.
+#
+# Uso (desde la raíz del proyecto):
+#   python benchmarks/json_estructurado.py [--cuestionarios 200]
+# ------------------------------------------------------
+
+import os
+import re
+import sys
+import json
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Las llamadas simuladas no cuentan en el medidor de uso (medidor_uso.py)
+os.environ.setdefault("USO_LLM", "0")
+
+from cuestionario_ia import GeneradorCuestionario, NUM_PREGUNTAS, construir_prompt_preguntas, generar_lote
+
+TEXTO = "Las redes neuronales aprenden ajustando pesos mediante descenso por gradiente. " * 60
+
+P_FENCE, P_COMA, P_PROSA, P_CORTADA, P_ITEM_MALO = 0.3, 0.15, 0.1, 0.15, 0.06
+
+
+class _Respuesta:
+    def __init__(self, texto, tokens):
+        self.text = texto
+        self.usage_metadata = type("Uso", (), {"total_token_count": tokens})()
+
+
+class ModeloSimulado:
+    """Imita gemini_model.generate_content (con o sin response_schema)."""
+
+    def __init__(self, semilla: int):
+        self.rnd = random.Random(semilla)
+        self.contador = 0
+
+    def generate_content(self, prompt, generation_config=None):
+        rnd = self.rnd
+        num = int(re.search(r"EXACTAMENTE (\d+)", prompt).group(1))
+        estructurada = bool(generation_config)
+        items = []
+        for _ in range(num):
+            self.contador += 1
+            item = {"pregunta": f"Pregunta {self.contador} sobre gradiente y pesos",
+                    "opciones": ["a", "b", "c", "d"], "correcta": rnd.choice("ABCD")}
+            if rnd.random() < P_ITEM_MALO:
+                del item["opciones"]
+            items.append(item)
+        if estructurada and rnd.random() < P_ITEM_MALO:
+            items = items[:-1]  # a veces el modelo se queda corto
+        texto = json.dumps(items, ensure_ascii=False, indent=1)
+
+        if not estructurada:
+            if rnd.random() < P_COMA:
+                texto = texto[:-2] + ",\n]"
+            if rnd.random() < P_CORTADA:
+                texto = texto[:int(len(texto) * rnd.uniform(0.5, 0.95))]
+            if rnd.random() < P_PROSA:
+                texto = "Aquí tienes las preguntas:\n" + texto
+            if rnd.random() < P_FENCE:
+                texto = "```json\n" + texto + "\n```"
+        return _Respuesta(texto, (len(prompt) + len(texto)) // 4)
+
+
+def _parsear_anterior(texto, num):
+    texto = re.sub(r"^```json", "", texto.strip(), flags=re.IGNORECASE).strip()
+    texto = re.sub(r"```$", "", texto).strip()
+    try:
+        data = json.loads(texto)
+    except ValueError:
+        return None
+    validas = [d for d in data if isinstance(d, dict) and d.get("pregunta")
+               and isinstance(d.get("opciones"), list)] if isinstance(data, list) else []
+    return validas[:num] if len(validas) >= num else None
+
+
+def medir_anterior(cuestionarios: int):
+    modelo = ModeloSimulado(1)
+    llamadas = tokens = 0
+    for _ in range(cuestionarios):
+        while True:
+            prompt = construir_prompt_preguntas(TEXTO)
+            resp = modelo.generate_content(prompt)   # Gemini y, si falla, Groq: igual de caros
+            llamadas += 1
+            tokens += resp.usage_metadata.total_token_count
+            if _parsear_anterior(resp.text, NUM_PREGUNTAS):
+                break
+    return llamadas, tokens
+
+
+def medir_nuevo(cuestionarios: int, estructurada: bool):
+    generador = GeneradorCuestionario("", "", log=lambda m: None)
+    generador.configurar()
+    generador.gemini_model = ModeloSimulado(1)
+    generador.estructurada = estructurada
+    hechos = 0
+    while hechos < cuestionarios:
+        preguntas_mc, _ = generar_lote(generador, TEXTO, NUM_PREGUNTAS, log=lambda m: None)
+        if preguntas_mc:
+            hechos += 1
+    return generador.uso["llamadas"], generador.uso["tokens"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Llamadas y tokens por cuestionario válido")
+    parser.add_argument("--cuestionarios", type=int, default=200)
+    args = parser.parse_args()
+    n = args.cuestionarios
+
+    print(f"{n} cuestionarios válidos de {NUM_PREGUNTAS} preguntas (modelo simulado)")
+    for nombre, (llamadas, tokens) in (
+        ("anterior", medir_anterior(n)),
+        ("tolerante", medir_nuevo(n, estructurada=False)),
+        ("estructurado", medir_nuevo(n, estructurada=True)),
+    ):
+        print(f"  {nombre:<13} {llamadas / n:5.2f} llamadas/cuestionario  "
+              f"{tokens / n:7.0f} tokens/cuestionario  "
+              f"({(llamadas - n) / n:.2f} reintentos)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# benchmarks/latencia_scripts.py
+# ------------------------------------------------------
+# Latencia por ejecución de un script de ejercicio:
+#   - frío:    un `python script.py` nuevo en cada ejecución (como antes)
+#   - caliente: el mismo script en el pool de trabajador_scripts.py
+#               (módulos ya importados)
+#
+# Por defecto usa un script sintético que importa lo mismo que
+# 1_llmchain.py y solo imprime el tema, para medir el coste fijo sin
+# depender de la red ni de la clave de Gemini. Con --script se mide
+# un ejercicio real (p. ej. --script 1_llmchain.py, necesita GOOGLE_API_KEY).
+#
+# Uso (desde la raíz del proyecto):
+#   python benchmarks/latencia_scripts.py [--repeticiones 5] [--script 1_llmchain.py]
+# ------------------------------------------------------
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from trabajador_scripts import PoolScripts, MODULOS_PRECARGA
+
+SCRIPT_SINTETICO = f"""
+import os
+for modulo in {MODULOS_PRECARGA!r}:
+    try:
+        __import__(modulo)
+    except ImportError:
+        pass
+print("Tema:", os.getenv("PROMPT_TEMA", ""))
+"""
+
+
+def medir_frio(script: str, env: dict, repeticiones: int):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        subprocess.run([sys.executable, script], cwd=RAIZ, env=env,
+                       capture_output=True, text=True, check=True)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return tiempos
+
+
+def medir_caliente(script: str, env: dict, repeticiones: int):
+    pool = PoolScripts(tam=1)
+    pool.iniciar()
+    try:
+        # La primera ejecución espera a que el trabajador termine de importar:
+        # se informa aparte y no entra en la mediana
+        inicio = time.perf_counter()
+        codigo, stderr = pool.ejecutar(script, env, RAIZ)
+        primera = (time.perf_counter() - inicio) * 1000
+        if codigo != 0:
+            raise RuntimeError(f"El script falló en el pool:\n{stderr}")
+
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            pool.ejecutar(script, env, RAIZ)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        return primera, tiempos
+    finally:
+        pool.cerrar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia fría vs. caliente de los scripts")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--script", help="script a medir (por defecto, uno sintético)")
+    args = parser.parse_args()
+
+    if args.script:
+        script = os.path.abspath(os.path.join(RAIZ, args.script))
+    else:
+        tmp = tempfile.NamedTemporaryFile("w", suffix=".py", delete=False, encoding="utf-8")
+        tmp.write(SCRIPT_SINTETICO)
+        tmp.close()
+        script = tmp.name
+
+    env = os.environ.copy()
+    env["PROMPT_TEMA"] = "el aprendizaje automático"
+    env["PROMPT_TEMPLATE"] = "Explícale a un estudiante universitario el tema {tema}."
+
+    try:
+        frio = medir_frio(script, env, args.repeticiones)
+        primera, caliente = medir_caliente(script, env, args.repeticiones)
+    finally:
+        if not args.script:
+            os.unlink(script)
+
+    m_frio, m_caliente = statistics.median(frio), statistics.median(caliente)
+    print(f"script: {args.script or 'sintético (solo importaciones)'}")
+    print(f"  frío      (subproceso nuevo): mediana {m_frio:8.1f} ms  "
+          f"[{min(frio):.1f} – {max(frio):.1f}]")
+    print(f"  caliente  (pool):             mediana {m_caliente:8.1f} ms  "
+          f"[{min(caliente):.1f} – {max(caliente):.1f}]")
+    print(f"  primera ejecución en el pool (incluye precarga): {primera:.1f} ms")
+    if m_caliente > 0:
+        print(f"  aceleración: x{m_frio / m_caliente:.1f}")
+
+
+if __name__ == "__main__":
+    main()
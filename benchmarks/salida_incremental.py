@@ -0,0 +1,75 @@
+# benchmarks/salida_incremental.py
+# ------------------------------------------------------
+# Coste por mensaje al mostrar una conversación larga en un QTextEdit:
+#   - reconstruir: setPlainText del historial completo en cada turno
+#                  (lo que hacía _historial_to_text en modelos básicos)
+#   - append:      QTextEdit.append por mensaje, sin tope
+#   - incremental: load/vista_salida.py (delta + volcado agrupado + tope de bloques)
+#
+# Se mide el tiempo de los últimos mensajes de cada tramo para ver si el
+# coste crece con la longitud del historial.
+#
+# Uso (desde la raíz del proyecto):
+#   QT_QPA_PLATFORM=offscreen python benchmarks/salida_incremental.py [--mensajes 5000]
+# ------------------------------------------------------
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5 import QtWidgets
+
+from load.vista_salida import SalidaIncremental
+
+MENSAJE = "🤖 " + "Respuesta de ejemplo con algo de texto para ocupar una línea. " * 3
+
+
+def medir(app, nombre, mostrar, mensajes: int, tramos: int = 5):
+    paso = mensajes // tramos
+    resultados = []
+    inicio_tramo = time.perf_counter()
+    for i in range(1, mensajes + 1):
+        mostrar(i)
+        if i % paso == 0:
+            app.processEvents()
+            ms = (time.perf_counter() - inicio_tramo) * 1000 / paso
+            resultados.append((i, ms))
+            inicio_tramo = time.perf_counter()
+    print(f"{nombre:<13}" + "".join(f"  N={n}: {ms:.3f}" for n, ms in resultados))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coste por mensaje en el historial")
+    parser.add_argument("--mensajes", type=int, default=5000)
+    parser.add_argument("--max-bloques", type=int, default=2000)
+    args = parser.parse_args()
+
+    app = QtWidgets.QApplication(sys.argv)
+    print("ms por mensaje (media del tramo) al llegar a N mensajes")
+
+    # 1) Reconstruir todo en cada turno (el coste crece con N: limitar N)
+    widget = QtWidgets.QTextEdit()
+    historial = []
+
+    def reconstruir(i):
+        historial.append(MENSAJE)
+        widget.setPlainText("\n".join(historial))
+    medir(app, "reconstruir", reconstruir, min(args.mensajes, 2000))
+
+    # 2) append sin tope
+    widget = QtWidgets.QTextEdit()
+    medir(app, "append", lambda i: widget.append(MENSAJE), args.mensajes)
+
+    # 3) Vista incremental: el volcado real lo hace el QTimer (processEvents)
+    widget = QtWidgets.QTextEdit()
+    vista = SalidaIncremental(widget, max_bloques=args.max_bloques, intervalo_ms=0)
+    medir(app, "incremental", lambda i: vista.agregar(MENSAJE), args.mensajes)
+    vista.volcar()
+    print(f"\nbloques retenidos en la vista incremental: {widget.document().blockCount()}")
+
+
+if __name__ == "__main__":
+    main()
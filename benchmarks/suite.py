@@ -0,0 +1,421 @@
+# benchmarks/suite.py
+# ------------------------------------------------------
+# Microbenchmarks de los caminos calientes, sin red ni claves: el LLM es
+# un stub (cliente groq falso y FakeListChatModel de langchain_core).
+#
+# Cada caso se registra con @caso; la función prepara los datos (fuera de
+# la medición) y devuelve lo que se cronometra. Se hace un calentamiento y
+# luego pasadas con el recolector de ciclos parado hasta sumar las
+# repeticiones del caso y al menos --tiempo-minimo segundos medidos.
+#
+# Cada pasada va precedida de una pasada de un bucle de calibración (Python
+# puro, mide la máquina y no el código) y se guarda el cociente
+# caso / calibración. La velocidad de la máquina cambia durante la
+# ejecución (otros procesos, frecuencia de la CPU), pero casi igual para
+# dos pasadas seguidas: la mediana de esos cocientes ("relativo") apenas
+# varía entre ejecuciones ni entre máquinas, y es lo que se compara con
+# benchmarks/lineas_base.json. Un caso cuenta como regresión si su relativo
+# supera el de la base en más de su tolerancia (--tolerancia, 25 % por
+# defecto, o la del caso si es mayor) y el tiempo esperado en más de
+# --minimo-ms. La mediana y el mínimo en ms se muestran como referencia.
+#
+# Uso (desde la raíz del proyecto):
+#   python benchmarks/suite.py                 # compara con las líneas base
+#   python benchmarks/suite.py -k memoria      # solo los casos que contienen "memoria"
+#   python benchmarks/suite.py --guardar       # reescribe las líneas base medidas
+# Devuelve código 1 si hay alguna regresión o algún caso medido sin línea
+# base (salvo con --guardar, que la crea). Los casos cuya dependencia no
+# está instalada (PyQt5, langchain, faiss) se marcan como omitidos.
+# ------------------------------------------------------
+
+import os
+import sys
+import json
+import time
+import types
+import random
+import gc
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+# Todo en local: sin trazas, sin medidor de uso y con una clave ficticia
+os.environ.setdefault("TRAZAS", "0")
+os.environ.setdefault("USO_LLM", "0")
+os.environ.setdefault("GOOGLE_API_KEY", "sin-clave")
+os.environ.setdefault("GROQ_API_KEY", "sin-clave")
+
+LINEAS_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lineas_base.json")
+
+PALABRAS = ("red neuronal gradiente pesos capa activación función pérdida entrenamiento "
+            "datos validación sesgo varianza regularización aprendizaje modelo").split()
+
+
+class Omitido(Exception):
+    """El caso no puede correr en este entorno (falta una dependencia)."""
+
+
+_CASOS = {}
+
+
+def caso(nombre: str, repeticiones: int = None, tolerancia: float = None):
+    """tolerancia: mínima para este caso (los cortos o con E/S varían más)."""
+    def registrar(fn):
+        _CASOS[nombre] = (fn, repeticiones, tolerancia)
+        return fn
+    return registrar
+
+
+def _texto(rnd, palabras: int) -> str:
+    return " ".join(rnd.choice(PALABRAS) for _ in range(palabras))
+
+
+# ---------------- Stubs del LLM ----------------
+class _Respuesta:
+    def __init__(self, texto):
+        mensaje = types.SimpleNamespace(content=texto)
+        self.choices = [types.SimpleNamespace(message=mensaje)]
+        self.usage = types.SimpleNamespace(prompt_tokens=0, completion_tokens=0, total_tokens=0)
+
+
+class GroqStub:
+    """Imita groq.Groq: chat.completions.create devuelve siempre lo mismo."""
+
+    def __init__(self, *args, **kwargs):
+        self.chat = types.SimpleNamespace(completions=self)
+
+    def create(self, model=None, messages=None, **kwargs):
+        return _Respuesta("De acuerdo, lo tengo en cuenta.")
+
+
+def _instalar_groq_stub():
+    sys.modules["groq"] = types.SimpleNamespace(Groq=GroqStub)
+
+
+def _importar(modulo: str):
+    try:
+        import importlib
+        return importlib.import_module(modulo)
+    except ImportError as e:
+        raise Omitido(f"falta {e.name or e}")
+
+
+# ---------------- Casos ----------------
+@caso("embeddings_10k")
+def _embeddings():
+    mod = _importar("8_memoria")
+    rnd = random.Random(1)
+    textos = [_texto(rnd, 150) for _ in range(10_000)]
+    return lambda: mod.embeddings.embed_documents(textos)
+
+
+def _indice_faiss(mod, fragmentos: int):
+    faiss_mod = _importar("langchain_community.vectorstores")
+    from langchain_core.documents import Document
+    rnd = random.Random(2)
+    docs = [Document(page_content=_texto(rnd, rnd.randint(40, 180)), metadata={"page": i})
+            for i in range(fragmentos)]
+    return faiss_mod.FAISS, docs
+
+
+@caso("faiss_construir")
+def _faiss_construir():
+    mod = _importar("8_memoria")
+    FAISS, docs = _indice_faiss(mod, 2000)
+    return lambda: FAISS.from_documents(docs, embedding=mod.embeddings)
+
+
+@caso("faiss_buscar", repeticiones=50)
+def _faiss_buscar():
+    mod = _importar("8_memoria")
+    FAISS, docs = _indice_faiss(mod, 2000)
+    retriever = FAISS.from_documents(docs, embedding=mod.embeddings).as_retriever(search_kwargs={"k": 3})
+    return lambda: retriever.invoke("¿Cómo se ajustan los pesos de una red neuronal?")
+
+
+@caso("rag_preguntar", repeticiones=50)
+def _rag_preguntar():
+    mod = _importar("8_memoria")
+    FAISS, docs = _indice_faiss(mod, 2000)
+    from langchain_core.language_models import FakeListChatModel
+    mod._retriever = FAISS.from_documents(docs, embedding=mod.embeddings).as_retriever(search_kwargs={"k": 3})
+    mod.llm = FakeListChatModel(responses=["Trata de redes neuronales."])
+    return lambda: mod.preguntar("¿De qué trata el documento?")
+
+
+@caso("calcular_puntaje", repeticiones=20)
+def _calcular_puntaje():
+    ventana = _importar("load.load_ventana_cuestionario")
+    clase = ventana.Load_ventana_cuestionario
+    rnd = random.Random(3)
+    yo = types.SimpleNamespace(respuestas_correctas=[rnd.choice("ABCD") for _ in range(5)],
+                               _letra_respuesta=clase._letra_respuesta)
+    hojas = [[rnd.choice(["A", "b) ...", "la C", "", "D."]) for _ in range(5)] for _ in range(10_000)]
+    return lambda: [clase._calcular_puntaje(yo, h) for h in hojas]
+
+
+@caso("calcular_puntajes_lote", repeticiones=20, tolerancia=0.4)
+def _calcular_puntajes_lote():
+    lote = _importar("calificador_lote")
+    rnd = random.Random(3)
+    correctas = [rnd.choice("ABCD") for _ in range(5)]
+    hojas = [[rnd.choice(["A", "b) ...", "la C", "", "D."]) for _ in range(5)] for _ in range(10_000)]
+    return lambda: lote.calcular_puntajes(lote.matriz_letras(hojas, 5), correctas)
+
+
+def _payload_preguntas(n: int, rnd) -> str:
+    items = [{
+        "pregunta": f"Pregunta {i}: " + _texto(rnd, 25),
+        "opciones": [_texto(rnd, 8) for _ in range(4)],
+        "explicaciones": [_texto(rnd, 15) for _ in range(4)],
+        "correcta": rnd.choice("ABCD"),
+    } for i in range(n)]
+    return json.dumps(items, ensure_ascii=False)
+
+
+@caso("parsear_preguntas_json", repeticiones=20, tolerancia=0.4)
+def _parsear_json():
+    cuestionario = _importar("cuestionario_ia")
+    texto = _payload_preguntas(500, random.Random(4))
+    return lambda: cuestionario.parsear_preguntas_mc(texto, log=lambda m: None, num=500)
+
+
+@caso("parsear_preguntas_defectuoso", repeticiones=20, tolerancia=0.4)
+def _parsear_defectuoso():
+    cuestionario = _importar("cuestionario_ia")
+    texto = _payload_preguntas(500, random.Random(5))
+    # Lo que suele llegar mal: prosa delante, ```json, coma final y la lista cortada
+    texto = "Aquí tienes las preguntas:\n```json\n" + texto[:-1] + ",\n" + texto[1:len(texto) // 2]
+    return lambda: cuestionario.parsear_preguntas_mc(texto, log=lambda m: None, num=500)
+
+
+@caso("historial_recorte", repeticiones=10)
+def _historial_recorte():
+    _instalar_groq_stub()
+    mod = _importar("modelohistorial_2")
+    modelo = mod.ModeloHistorial()
+    rnd = random.Random(6)
+    mensajes = [_texto(rnd, 30) for _ in range(2000)]
+
+    def conversar():
+        historial = [{"role": "system", "content": "Eres un asistente útil y amable."}]
+        for m in mensajes:
+            modelo.enviar(m, historial)
+    return conversar
+
+
+_temporales = []
+
+
+def _carpeta_temporal():
+    carpeta = tempfile.mkdtemp(prefix="bench_suite_")
+    _temporales.append(carpeta)
+    return carpeta
+
+
+@caso("memoria_guardar", repeticiones=10, tolerancia=0.5)
+def _memoria_guardar():
+    # Lo mismo que 7_persistencia.guardar_memoria: agregar turnos y sincronizar.
+    # Cada pasada hace 50 fsync: el disco pesa más que la CPU y la
+    # calibración no lo compensa, de ahí la tolerancia más amplia.
+    binaria = _importar("memoria_binaria")
+    carpeta = _carpeta_temporal()
+    rnd = random.Random(7)
+    turnos = [(_texto(rnd, 40), _texto(rnd, 120)) for _ in range(5000)]
+    contador = iter(range(10 ** 9))
+
+    def guardar():
+        conv = binaria.ConversacionBinaria(os.path.join(carpeta, f"m{next(contador)}.bin"))
+        for pregunta, respuesta in turnos:
+            conv.agregar("human", pregunta)
+            conv.agregar("ai", respuesta)
+            if len(conv) % 200 == 0:
+                conv.sincronizar()
+        conv.sincronizar()
+    return guardar
+
+
+@caso("memoria_cargar", repeticiones=20, tolerancia=0.5)
+def _memoria_cargar():
+    # Lo mismo que 7_persistencia.cargar_memoria: abrir y leer la ventana del prompt
+    binaria = _importar("memoria_binaria")
+    ruta = os.path.join(_carpeta_temporal(), "larga.bin")
+    rnd = random.Random(8)
+    conv = binaria.ConversacionBinaria(ruta)
+    for _ in range(20_000):
+        conv.agregar("human", _texto(rnd, 40))
+        conv.agregar("ai", _texto(rnd, 120))
+    conv.sincronizar()
+    ventana = int(os.getenv("MEMORIA_VENTANA", "40"))
+
+    def cargar():
+        # Una carga son ~2 ms: se agrupan 25 para que el mínimo no sea una pasada con suerte
+        for _ in range(25):
+            binaria.ConversacionBinaria(ruta).cola(ventana)
+    return cargar
+
+
+@caso("salida_incremental", repeticiones=10)
+def _salida_incremental():
+    # Sucesor de _historial_to_text: volcado por lotes al QTextEdit
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    widgets = _importar("PyQt5.QtWidgets")
+    vista = _importar("load.vista_salida")
+    app = widgets.QApplication.instance() or widgets.QApplication([])
+    rnd = random.Random(9)
+    lineas = [("🧑 Tú: " if i % 2 == 0 else "🤖 IA: ") + _texto(rnd, 30) for i in range(5000)]
+
+    def mostrar():
+        salida = vista.SalidaIncremental(widgets.QTextEdit())
+        for i, linea in enumerate(lineas):
+            salida.agregar(linea)
+            if i % 50 == 0:
+                salida.volcar()
+        salida.volcar()
+        app.processEvents()
+    return mostrar
+
+
+# ---------------- Medición ----------------
+def _bucle_calibracion():
+    d = {}
+    for i in range(300_000):
+        d[i % 1000] = d.get(i % 1000, 0) + i
+    return sorted(d.values())
+
+
+def medir(fn, repeticiones: int, tiempo_minimo: float = 0.0) -> dict:
+    """
+    Al menos `repeticiones` pasadas y `tiempo_minimo` segundos medidos (con
+    un tope de 20 veces las repeticiones), cada una junto a una pasada de
+    calibración.
+    """
+    fn()  # calentamiento
+    tiempos, calibraciones = [], []
+    # Como timeit: sin el recolector de ciclos, que mete pausas al azar
+    gc_activo = gc.isenabled()
+    gc.disable()
+    try:
+        while len(tiempos) < repeticiones or (sum(tiempos) < tiempo_minimo
+                                              and len(tiempos) < repeticiones * 20):
+            inicio = time.perf_counter()
+            _bucle_calibracion()
+            calibraciones.append(time.perf_counter() - inicio)
+            inicio = time.perf_counter()
+            fn()
+            tiempos.append(time.perf_counter() - inicio)
+    finally:
+        if gc_activo:
+            gc.enable()
+        gc.collect()
+    return {
+        "relativo": statistics.median(t / c for t, c in zip(tiempos, calibraciones)),
+        "mediana_s": statistics.median(tiempos),
+        "min_s": min(tiempos),
+        "calibracion_s": statistics.median(calibraciones),
+        "repeticiones": len(tiempos),
+    }
+
+
+def cargar_lineas_base(ruta: str) -> dict:
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"casos": {}}
+
+
+def comparar(medido: dict, base: dict, tolerancia: float, minimo_s: float):
+    """Devuelve (estado, esperado_s o None, diferencia relativa o None)."""
+    if not base or not base.get("relativo"):
+        return "SIN BASE", None, None
+    # Lo que tardaría el caso ahora, a la velocidad actual de la máquina
+    esperado = base["relativo"] * medido["calibracion_s"]
+    delta = medido["relativo"] / base["relativo"] - 1
+    if delta > tolerancia and delta * esperado > minimo_s:
+        return "REGRESIÓN", esperado, delta
+    if delta < -tolerancia and -delta * esperado > minimo_s:
+        return "mejora", esperado, delta
+    return "ok", esperado, delta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks con líneas base")
+    parser.add_argument("-k", dest="filtro", help="solo los casos cuyo nombre contiene este texto")
+    parser.add_argument("--repeticiones", type=int, help="pasadas por caso (por defecto, las de cada caso o 5)")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="regresión relativa admitida (0.25 = 25 %%)")
+    parser.add_argument("--minimo-ms", type=float, default=1.0, help="diferencia absoluta mínima para contar")
+    parser.add_argument("--tiempo-minimo", type=float, default=2.0,
+                        help="segundos medidos como mínimo por caso (se añaden pasadas)")
+    parser.add_argument("--lineas-base", default=LINEAS_BASE)
+    parser.add_argument("--guardar", action="store_true", help="reescribir las líneas base con lo medido")
+    args = parser.parse_args()
+
+    lineas_base = cargar_lineas_base(args.lineas_base)
+    resultados = {}
+    omitidos = {}
+    try:
+        for nombre, (fn, repeticiones, _) in _CASOS.items():
+            if args.filtro and args.filtro not in nombre:
+                continue
+            try:
+                medible = fn()
+            except Omitido as e:
+                omitidos[nombre] = str(e)
+                continue
+            print(f"  midiendo {nombre}...", file=sys.stderr)
+            resultados[nombre] = medir(medible, args.repeticiones or repeticiones or 5, args.tiempo_minimo)
+    finally:
+        for carpeta in _temporales:
+            shutil.rmtree(carpeta, ignore_errors=True)
+
+    print(f"{'caso':<30} {'mediana':>10} {'mínimo':>10} {'esperado':>10} {'relativo':>9} {'Δ':>8}  estado")
+    regresiones = []
+    sin_base = []
+    for nombre in _CASOS:
+        if nombre in omitidos:
+            print(f"{nombre:<30} {'':>10} {'':>10} {'':>10} {'':>9} {'':>8}  omitido ({omitidos[nombre]})")
+        if nombre not in resultados:
+            continue
+        medido = resultados[nombre]
+        tolerancia = max(args.tolerancia, _CASOS[nombre][2] or 0.0)
+        estado, esperado, delta = comparar(medido, lineas_base["casos"].get(nombre),
+                                           tolerancia, args.minimo_ms / 1000)
+        if estado == "REGRESIÓN":
+            regresiones.append(nombre)
+        elif estado == "SIN BASE":
+            sin_base.append(nombre)
+        print(f"{nombre:<30} {medido['mediana_s'] * 1000:>8.2f}ms {medido['min_s'] * 1000:>8.2f}ms "
+              f"{'' if esperado is None else f'{esperado * 1000:.2f}ms':>10} {medido['relativo']:>9.3f} "
+              f"{'' if delta is None else f'{delta:+.0%}':>8}  {estado}")
+
+    if args.guardar:
+        # Los casos no medidos aquí (omitidos o filtrados) conservan su base
+        casos = {n: b for n, b in lineas_base["casos"].items() if n not in resultados}
+        casos.update({n: {k: round(v, 6) if isinstance(v, float) else v for k, v in r.items()}
+                      for n, r in resultados.items()})
+        with open(args.lineas_base, "w", encoding="utf-8") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "casos": dict(sorted(casos.items())),
+            }, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"\nLíneas base guardadas en {args.lineas_base}")
+        return 0
+
+    if regresiones:
+        print(f"\n❌ Regresiones: {', '.join(regresiones)}")
+    if sin_base:
+        print(f"\n❌ Sin línea base (grábala con --guardar): {', '.join(sin_base)}")
+    if regresiones or sin_base:
+        return 1
+    print("\n✅ Sin regresiones")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+# calificador_lote.py
+# ------------------------------------------------------
+# Calificación por lotes (sin interfaz) de las hojas de respuestas de un
+# grupo entero.
+#
+#   python calificador_lote.py cuestionario.json respuestas.csv -o resultados.jsonl
+#   python calificador_lote.py cuestionario.json respuestas.jsonl --narrativa --pdf documentos/fuente.pdf
+#
+# Entradas:
+#   - cuestionario: JSON con {"preguntas_mc": [...]} (o la lista directamente),
+#     cada pregunta con "pregunta", "opciones", "correcta" y, si las tiene,
+#     "explicaciones". También vale {"preguntas_mc": [...], "respuestas_correctas": [...]}.
+#   - respuestas: CSV con cabecera (primera columna = estudiante, las
+#     siguientes = una respuesta por pregunta) o JSONL
+#     ({"estudiante": "...", "respuestas": [...]}).
+#
+# El puntaje se calcula por bloques con numpy (una matriz de letras por
+# bloque de estudiantes) con la regla de retroalimentacion.puntaje, la
+# misma que usa la ventana: 100 puntos repartidos entre las preguntas (20
+# por acierto con 5 preguntas). El informe por pregunta sale de
+# retroalimentacion.py al instante; con --narrativa se pide además el
+# comentario de la IA en paralelo (bajo limitador.py) y se reutiliza para
+# hojas con el mismo patrón de respuestas.
+#
+# Los resultados se escriben según van saliendo, en el orden de entrada
+# (JSONL o CSV según la extensión de -o; por defecto JSONL a stdout), y al
+# final se informa de estudiantes por minuto.
+# ------------------------------------------------------
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+
+import numpy as np
+
+from cuestionario_ia import LETRAS
+from retroalimentacion import generar_narrativa, informe_local, letra_respuesta
+from trazas import propagar, tramo
+import grabadora_llm
+
+TAM_BLOQUE = 1000
+
+
+# ---------------- Entradas ----------------
+def cargar_cuestionario(ruta: str):
+    """Devuelve (preguntas_mc, respuestas_correctas, texto_tema)."""
+    with open(ruta, encoding="utf-8") as f:
+        datos = json.load(f)
+    if isinstance(datos, list):
+        datos = {"preguntas_mc": datos}
+    preguntas_mc = datos.get("preguntas_mc") or []
+    correctas = [(c or "").strip().upper()[:1] for c in datos.get("respuestas_correctas") or
+                 [item.get("correcta") for item in preguntas_mc]]
+    if not preguntas_mc or len(correctas) != len(preguntas_mc):
+        raise ValueError(f"{ruta}: el cuestionario no trae preguntas y respuestas correctas.")
+    # El informe y la narrativa leen "correcta" de cada pregunta: misma clave que el puntaje
+    preguntas_mc = [dict(item, correcta=c) for item, c in zip(preguntas_mc, correctas)]
+    return preguntas_mc, correctas, datos.get("texto", "")
+
+
+def leer_hojas(ruta: str):
+    """Genera (estudiante, [respuestas]) desde un CSV o un JSONL, sin cargarlo entero."""
+    with open(ruta, encoding="utf-8", newline="") as f:
+        if ruta.lower().endswith((".jsonl", ".ndjson")):
+            for n, linea in enumerate(f, 1):
+                if linea.strip():
+                    fila = json.loads(linea)
+                    yield str(fila.get("estudiante", n)), [str(r) for r in fila.get("respuestas", [])]
+        else:
+            lector = csv.reader(f)
+            next(lector, None)  # cabecera
+            for fila in lector:
+                if fila:
+                    yield fila[0], fila[1:]
+
+
+# ---------------- Puntaje vectorizado ----------------
+def matriz_letras(hojas, num: int) -> np.ndarray:
+    """Matriz (estudiantes x preguntas) con el índice de la letra elegida (-1 = ninguna)."""
+    m = np.full((len(hojas), num), -1, dtype=np.int8)
+    for i, respuestas in enumerate(hojas):
+        for j, texto in enumerate(respuestas[:num]):
+            letra = letra_respuesta(texto)
+            if letra:
+                m[i, j] = LETRAS.index(letra)
+    return m
+
+
+def calcular_puntajes(letras: np.ndarray, correctas) -> np.ndarray:
+    """
+    retroalimentacion.puntaje para un bloque entero: puntaje sobre 100
+    repartido entre las preguntas (20 por pregunta con NUM_PREGUNTAS = 5);
+    las preguntas sin letra correcta no puntúan.
+    """
+    correctas = np.array([LETRAS.index(c) if c in LETRAS else -2 for c in correctas], dtype=np.int8)
+    aciertos = (letras == correctas[np.newaxis, :]).sum(axis=1)
+    return np.rint(aciertos * 100 / max(1, len(correctas))).astype(np.int64)
+
+
+# ---------------- Narrativas con caché por patrón ----------------
+class CacheNarrativas:
+    """Una sola llamada por patrón de respuestas, aunque lleguen a la vez."""
+
+    def __init__(self, ejecutor, generador, preguntas_mc, texto_tema):
+        self.ejecutor = ejecutor
+        self.generador = generador
+        self.preguntas_mc = preguntas_mc
+        self.texto_tema = texto_tema
+        self._futuros = {}
+        self._lock = threading.Lock()
+        self.aciertos_cache = 0
+
+    def pedir(self, letras) -> Future:
+        clave = tuple(letras)
+        with self._lock:
+            if clave in self._futuros:
+                self.aciertos_cache += 1
+                return self._futuros[clave]
+            futuro = self.ejecutor.submit(propagar(generar_narrativa), self.generador, self.texto_tema,
+                                          self.preguntas_mc, list(letras))
+            self._futuros[clave] = futuro
+            return futuro
+
+    @property
+    def llamadas(self) -> int:
+        return len(self._futuros)
+
+
+# ---------------- Salida en streaming ----------------
+class Escritor:
+    CAMPOS = ("estudiante", "puntaje", "letras", "informe", "narrativa", "origen_narrativa")
+
+    def __init__(self, destino: str = None):
+        self.archivo = open(destino, "w", encoding="utf-8", newline="") if destino else sys.stdout
+        self.csv = None
+        if destino and destino.lower().endswith(".csv"):
+            self.csv = csv.DictWriter(self.archivo, fieldnames=self.CAMPOS)
+            self.csv.writeheader()
+
+    def escribir(self, fila: dict):
+        if self.csv:
+            self.csv.writerow(dict(fila, letras="".join(l or "-" for l in fila["letras"])))
+        else:
+            self.archivo.write(json.dumps(fila, ensure_ascii=False) + "\n")
+        self.archivo.flush()
+
+    def cerrar(self):
+        if self.archivo is not sys.stdout:
+            self.archivo.close()
+
+
+# ---------------- Lote completo ----------------
+def calificar_lote(preguntas_mc, correctas, hojas, escritor, narrativas: CacheNarrativas = None,
+                   max_en_vuelo: int = 64, progreso=None) -> dict:
+    """
+    Califica las hojas (iterable de (estudiante, respuestas)) por bloques y
+    escribe cada resultado en cuanto está listo, respetando el orden.
+    Devuelve estadísticas del lote.
+    """
+    inicio = time.perf_counter()
+    num = len(preguntas_mc)
+    pendientes = deque()   # (fila, futuro de narrativa o None), en orden de entrada
+    total = errores = 0
+
+    def vaciar(hasta: int):
+        nonlocal errores
+        while len(pendientes) > hasta:
+            fila, futuro = pendientes.popleft()
+            if futuro is not None:
+                try:
+                    fila["narrativa"], fila["origen_narrativa"] = futuro.result()
+                except Exception as e:
+                    errores += 1
+                    fila["narrativa"], fila["origen_narrativa"] = "", f"error: {e}"
+            escritor.escribir(fila)
+
+    bloque = []
+    iterador = iter(hojas)
+    while True:
+        bloque.clear()
+        for hoja in iterador:
+            bloque.append(hoja)
+            if len(bloque) >= TAM_BLOQUE:
+                break
+        if not bloque:
+            break
+
+        with tramo("lote.puntajes", hojas=len(bloque)):
+            letras = matriz_letras([r for _, r in bloque], num)
+            puntajes = calcular_puntajes(letras, correctas)
+        for (estudiante, _), fila_letras, puntaje in zip(bloque, letras, puntajes):
+            elegidas = [LETRAS[k] if k >= 0 else "" for k in fila_letras]
+            fila = {
+                "estudiante": estudiante,
+                "puntaje": int(puntaje),
+                "letras": elegidas,
+                "informe": informe_local(preguntas_mc, elegidas, int(puntaje)),
+                "narrativa": "",
+                "origen_narrativa": "",
+            }
+            pendientes.append((fila, narrativas.pedir(elegidas) if narrativas else None))
+            total += 1
+            vaciar(max_en_vuelo)
+        if progreso:
+            progreso(total, time.perf_counter() - inicio)
+    vaciar(0)
+
+    segundos = time.perf_counter() - inicio
+    return {
+        "estudiantes": total,
+        "segundos": round(segundos, 3),
+        "estudiantes_por_minuto": round(total / segundos * 60, 1) if segundos else None,
+        "llamadas_narrativa": narrativas.llamadas if narrativas else 0,
+        "reutilizadas_de_cache": narrativas.aciertos_cache if narrativas else 0,
+        "errores_narrativa": errores,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calificación por lotes de hojas de respuestas")
+    parser.add_argument("cuestionario", help="JSON con preguntas_mc (y respuestas_correctas)")
+    parser.add_argument("respuestas", help="CSV o JSONL con las respuestas de cada estudiante")
+    parser.add_argument("-o", "--salida", help="archivo .jsonl o .csv (por defecto, JSONL a stdout)")
+    parser.add_argument("--narrativa", action="store_true", help="pedir también el comentario de la IA")
+    parser.add_argument("--pdf", help="PDF del tema (contexto para la narrativa)")
+    parser.add_argument("--hilos", type=int, default=int(os.getenv("LOTE_HILOS", "4")))
+    args = parser.parse_args()
+    grabadora_llm.instalar()
+
+    preguntas_mc, correctas, texto_tema = cargar_cuestionario(args.cuestionario)
+    escritor = Escritor(args.salida)
+    ejecutor = narrativas = None
+    if args.narrativa:
+        from cuestionario_ia import GeneradorCuestionario, leer_texto_pdf
+        if args.pdf:
+            texto_tema = leer_texto_pdf(args.pdf)
+        ejecutor = ThreadPoolExecutor(max_workers=max(1, args.hilos), thread_name_prefix="narrativa")
+        narrativas = CacheNarrativas(ejecutor, GeneradorCuestionario(log=lambda m: None),
+                                     preguntas_mc, texto_tema)
+
+    def progreso(n, segundos):
+        print(f"  {n} estudiantes calificados ({n / segundos * 60 if segundos else 0:.0f}/min)",
+              file=sys.stderr)
+
+    try:
+        with tramo("lote.calificar", narrativa=args.narrativa) as t:
+            stats = calificar_lote(preguntas_mc, correctas, leer_hojas(args.respuestas), escritor,
+                                   narrativas, max_en_vuelo=max(16, args.hilos * 8),
+                                   progreso=progreso)
+            t.atributos["estudiantes"] = stats["estudiantes"]
+    finally:
+        escritor.cerrar()
+        if ejecutor:
+            ejecutor.shutdown(cancel_futures=True)
+    print(json.dumps(stats, ensure_ascii=False), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
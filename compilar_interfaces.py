@@ -0,0 +1,38 @@
+# compilar_interfaces.py
+# ------------------------------------------------------
+# Paso de "build": compila los .ui de interfaces/ a clases de Python en
+# interfaces/compiladas/ui_<nombre>.py. load/cargar_ui.py las usa si están
+# al día; si no, vuelve a uic.loadUi.
+#
+# Uso:  python compilar_interfaces.py
+# Volver a ejecutarlo cada vez que se edite un .ui en Qt Designer.
+# ------------------------------------------------------
+
+import sys
+from pathlib import Path
+
+from PyQt5 import uic
+
+RAIZ = Path(__file__).resolve().parent
+CARPETA_UI = RAIZ / "interfaces"
+CARPETA_COMPILADAS = CARPETA_UI / "compiladas"
+
+
+def compilar():
+    CARPETA_COMPILADAS.mkdir(exist_ok=True)
+    (CARPETA_COMPILADAS / "__init__.py").touch()
+
+    compiladas = 0
+    for ruta_ui in sorted(CARPETA_UI.glob("*.ui")):
+        destino = CARPETA_COMPILADAS / f"ui_{ruta_ui.stem}.py"
+        with open(destino, "w", encoding="utf-8") as f:
+            uic.compileUi(str(ruta_ui), f)
+        print(f"  {ruta_ui.name} -> {destino.relative_to(RAIZ)}")
+        compiladas += 1
+    return compiladas
+
+
+if __name__ == "__main__":
+    total = compilar()
+    print(f"{total} interfaces compiladas.")
+    sys.exit(0 if total else 1)
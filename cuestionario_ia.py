@@ -0,0 +1,732 @@
+# cuestionario_ia.py
+# ------------------------------------------------------
+# Generación de cuestionarios de opción múltiple a partir de un PDF,
+# sin nada de interfaz (la ventana lo ejecuta en un hilo de fondo).
+#
+# Etapas del pipeline:
+#   1. extraer   -> texto del PDF (extraccion_pdf.py, con límite de tamaño)
+#   2. prompt    -> instrucciones + texto base
+#   3. generar   -> Gemini y, si falla, Groq (JSON con esquema si se puede)
+#   4. validar   -> JSON tolerante -> 5 preguntas con 4 opciones y letra correcta
+#                   (si faltan, se piden solo las que faltan)
+#   (5. renderizar lo hace la ventana con el resultado)
+#
+# Cada etapa avisa con progreso(etapa, porcentaje, mensaje) y comprueba el
+# token de cancelación (cualquier objeto con verificar(), p. ej. el
+# TokenCancelacion de load/trabajadores.py) antes de seguir.
+#
+# Modo map-reduce (PDF largos; hay que pedirlo): en lugar de un único prompt
+# con los primeros 6000 caracteres, el PDF completo se divide en secciones, cada sección
+# pide unas pocas preguntas candidatas en paralelo (bajo el limitador de
+# limitador.py) y un reductor local descarta repetidas y elige las 5
+# finales repartidas por todo el documento. El resultado incluye métricas
+# de cobertura.
+#   CUESTIONARIO_MODO         simple (defecto) | auto | mapreduce
+#                             auto = map-reduce solo si el texto pasa de
+#                             CUESTIONARIO_UMBRAL_AUTO caracteres (defecto 60000,
+#                             unas 20 páginas); por debajo, un prompt único
+#   CUESTIONARIO_MAX_SECCIONES  secciones como máximo (defecto 8)
+#   CUESTIONARIO_POR_SECCION    candidatas por sección (defecto 2)
+#   CUESTIONARIO_HILOS_MAPA     llamadas simultáneas (defecto 8)
+#
+# Salida estructurada: Gemini recibe un response_schema (lista de
+# PreguntaMC) y Groq usa su modo JSON. CUESTIONARIO_JSON_ESTRUCTURADO=0 la
+# desactiva; CUESTIONARIO_REINTENTOS (defecto 2) limita cuántas veces se
+# piden las preguntas que falten a cada modelo.
+# ------------------------------------------------------
+
+import os
+import re
+import enum
+import threading
+import unicodedata
+from typing import List, TypedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+from extraccion_pdf import extraer_texto
+from json_tolerante import ParserJSONTolerante
+from limitador import limitador_llm
+from medidor_uso import registrar_respuesta
+from metricas import contar
+from trazas import propagar, tramo, trazado
+
+NUM_PREGUNTAS = 5
+LETRAS = ("A", "B", "C", "D")
+LIMITE_TEXTO_PDF = 16000
+LIMITE_TEXTO_PROMPT = 6000
+LIMITE_TEXTO_MAPA = 400000   # tope de lectura en map-reduce (~150 páginas)
+UMBRAL_MODO_AUTO = 10 * LIMITE_TEXTO_PROMPT
+MODELO_GEMINI = "gemini-2.0-flash"
+MODELO_GROQ = "llama-3.1-8b-instant"
+
+ETAPA_EXTRAER = "extraer"
+ETAPA_PROMPT = "prompt"
+ETAPA_GENERAR = "generar"
+ETAPA_VALIDAR = "validar"
+ETAPA_LISTO = "listo"
+ETAPA_MAPA = "mapa"
+ETAPA_REDUCIR = "reducir"
+
+MODO_AUTO = "auto"
+MODO_SIMPLE = "simple"
+MODO_MAPREDUCE = "mapreduce"
+
+
+def _sin_progreso(etapa, porcentaje, mensaje):
+    pass
+
+
+def _verificar(token):
+    if token is not None:
+        token.verificar()
+
+
+def _entero_env(nombre: str, defecto: int) -> int:
+    try:
+        return int(os.getenv(nombre, str(defecto)))
+    except ValueError:
+        return defecto
+
+
+def modo_generacion() -> str:
+    modo = os.getenv("CUESTIONARIO_MODO", MODO_SIMPLE).strip().lower()
+    return modo if modo in (MODO_AUTO, MODO_SIMPLE, MODO_MAPREDUCE) else MODO_SIMPLE
+
+
+def clave_dedup(pregunta: str) -> str:
+    """Normaliza el enunciado (sin tildes, mayúsculas ni signos) para detectar repetidas."""
+    texto = unicodedata.normalize("NFKD", pregunta.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r"[^a-z0-9]+", " ", texto).strip()
+
+
+# ---------------- Etapa 1: extraer ----------------
+def leer_texto_pdf(ruta: str, limite: int = LIMITE_TEXTO_PDF, token=None) -> str:
+    """
+    Lee el texto del PDF y limita el tamaño para el prompt.
+    Si se cancela, se corta y el pipeline lo detecta al salir.
+    """
+    return extraer_texto(ruta, limite=limite, token=token)
+
+
+# ---------------- Etapa 2: prompt ----------------
+def construir_prompt_preguntas(texto: str, evitar=None, num: int = NUM_PREGUNTAS) -> str:
+    texto_corto = texto[:LIMITE_TEXTO_PROMPT]  # recorte para prompt
+
+    # Para la precarga: que el siguiente cuestionario no repita el actual
+    bloque_evitar = ""
+    if evitar:
+        lista = "\n".join(f"- {p}" for p in evitar)
+        bloque_evitar = f"\nNo repitas ninguna de estas preguntas ya usadas:\n{lista}\n"
+
+    return f"""
+Eres un profesor de Inteligencia Artificial.
+
+A partir del siguiente contenido, genera EXACTAMENTE {num} preguntas de evaluación
+de OPCIÓN MÚLTIPLE en español, de nivel intermedio-avanzado (tipo universitario).
+
+Cada pregunta debe tener:
+- Un enunciado claro sobre el tema.
+- EXACTAMENTE 4 opciones de respuesta (A, B, C, D).
+- Indicar cuál opción es la correcta.
+- Una explicación breve (una frase) por opción: por qué es correcta o por qué no.
+
+DEVUELVE la salida EXCLUSIVAMENTE como un JSON VÁLIDO con esta estructura:
+
+[
+  {{
+    "pregunta": "texto de la pregunta 1",
+    "opciones": ["opción A", "opción B", "opción C", "opción D"],
+    "correcta": "A",
+    "explicaciones": ["por qué A es correcta", "por qué B no lo es", "por qué C no lo es", "por qué D no lo es"]
+  }},
+  {{
+    "pregunta": "texto de la pregunta 2",
+    "opciones": ["opción A", "opción B", "opción C", "opción D"],
+    "correcta": "C",
+    "explicaciones": ["...", "...", "...", "..."]
+  }},
+  ...
+]
+
+Requisitos:
+- Deben ser exactamente {num} elementos en la lista.
+- No agregues texto antes ni después del JSON.
+- No uses comentarios ni explicaciones.
+{bloque_evitar}
+TEXTO BASE:
+\"\"\"{texto_corto}\"\"\"
+"""
+
+
+# ---------------- Etapa 4: validar ----------------
+# Una letra suelta o "B)", "B.", "B:", "B ..."; "Bayes" no es la letra B
+_RE_LETRA = re.compile(r"^[A-Da-d](?:[).:]|\s|$)")
+
+
+def validar_pregunta(item: dict):
+    """
+    Normaliza un objeto devuelto por el modelo a
+    {"pregunta", "opciones", "correcta", "explicaciones"} o devuelve None si
+    no sirve. La correcta puede venir como letra ("B", "B) ...") o como el
+    texto de la opción. Las explicaciones (una por opción) son opcionales:
+    si faltan quedan como cadenas vacías.
+    """
+    item = {str(k).strip().lower(): v for k, v in item.items()}
+    pregunta = item.get("pregunta")
+    opciones = item.get("opciones")
+    correcta = item.get("correcta")
+
+    if not pregunta or not isinstance(opciones, list) or len(opciones) < 2:
+        return None
+    opciones = [str(o) for o in opciones]
+    correcta = str(correcta or "").strip()
+    # Primero el texto exacto de una opción: "Datos" en la C es la C, no la D
+    normalizadas = [o.strip().casefold() for o in opciones]
+    if correcta and correcta.casefold() in normalizadas:
+        indice = normalizadas.index(correcta.casefold())
+        correcta = LETRAS[indice] if indice < len(LETRAS) else ""
+    elif not _RE_LETRA.match(correcta):
+        # Aún si no viene la correcta, podemos seguir, pero marcamos cadena vacía
+        correcta = ""
+
+    explicaciones = item.get("explicaciones")
+    explicaciones = [str(e) for e in explicaciones] if isinstance(explicaciones, list) else []
+    explicaciones = (explicaciones + [""] * len(opciones))[:len(opciones)]
+
+    return {"pregunta": str(pregunta), "opciones": opciones, "correcta": correcta.upper()[:1],
+            "explicaciones": explicaciones}
+
+
+def parsear_preguntas_mc(texto: str, log=print, num: int = NUM_PREGUNTAS):
+    """
+    Interpreta el texto devuelto por el modelo con el parser tolerante
+    (json_tolerante.py): rescata las preguntas válidas aunque el JSON venga
+    con defectos o cortado. Devuelve hasta `num` preguntas (pueden ser
+    menos: generar_lote pide solo las que faltan) o None si no hay ninguna.
+    """
+    parser = ParserJSONTolerante(lambda obj: any(str(k).strip().lower() == "pregunta" for k in obj))
+    preguntas_validas = []
+    for item in parser.alimentar(texto or ""):
+        valida = validar_pregunta(item)
+        if valida:
+            preguntas_validas.append(valida)
+
+    if not preguntas_validas:
+        log("No se encontró ninguna pregunta válida en la respuesta del modelo.")
+        return None
+    if len(preguntas_validas) < num:
+        log(f"Solo se obtuvieron {len(preguntas_validas)} de {num} preguntas válidas en el JSON.")
+
+    # Nos quedamos con las primeras `num`
+    return preguntas_validas[:num]
+
+
+def formatear_pregunta(item: dict):
+    """Devuelve (texto para el QLabel, letra correcta o "")."""
+    pregunta = item.get("pregunta", "").strip()
+    opciones = list(item.get("opciones", []))
+    correcta = item.get("correcta", "").strip().upper()[:1]
+
+    # Asegurarnos de que haya 4 opciones
+    while len(opciones) < 4:
+        opciones.append("Opción faltante")
+    opciones = opciones[:4]
+
+    texto_label = (
+        f"{pregunta}\n"
+        f"A) {opciones[0]}\n"
+        f"B) {opciones[1]}\n"
+        f"C) {opciones[2]}\n"
+        f"D) {opciones[3]}"
+    )
+    return texto_label, (correcta if correcta in LETRAS else "")
+
+
+# ---------------- Etapa 3: generar ----------------
+class LetraCorrecta(enum.Enum):
+    """La correcta solo puede ser una letra (enum en el esquema de Gemini)."""
+    A = "A"
+    B = "B"
+    C = "C"
+    D = "D"
+
+
+class PreguntaMC(TypedDict):
+    """Esquema de salida estructurada para Gemini (response_schema)."""
+    pregunta: str
+    opciones: List[str]
+    correcta: LetraCorrecta
+    explicaciones: List[str]
+
+
+def salida_estructurada_activada() -> bool:
+    return os.getenv("CUESTIONARIO_JSON_ESTRUCTURADO", "1").strip().lower() not in ("0", "false", "no")
+
+
+def _generacion_fallida(error) -> str:
+    """Texto que Groq adjunta al rechazar un JSON inválido (json_validate_failed)."""
+    cuerpo = getattr(error, "body", None)
+    if isinstance(cuerpo, dict):
+        cuerpo = cuerpo.get("error", cuerpo)
+        return cuerpo.get("failed_generation") or ""
+    return ""
+
+
+class GeneradorCuestionario:
+    """Clientes de Gemini y Groq, configurados al primer uso."""
+
+    def __init__(self, google_api_key: str = None, groq_api_key: str = None, log=print):
+        load_dotenv()
+        self.google_api_key = (google_api_key if google_api_key is not None
+                               else os.getenv("GOOGLE_API_KEY", "")).strip()
+        self.groq_api_key = (groq_api_key if groq_api_key is not None
+                             else os.getenv("GROQ_API_KEY", "")).strip()
+        self.log = log
+        self.gemini_model = None
+        self.groq_client = None
+        self._configurado = False
+        # La generación y la precarga pueden pedir los clientes a la vez
+        self._lock = threading.Lock()
+
+        # Salida estructurada (JSON con esquema); se apaga sola si el SDK no la admite
+        self.estructurada = salida_estructurada_activada()
+        # Totales de la sesión: llamadas y tokens por pregunta válida
+        self.uso = {"llamadas": 0, "tokens": 0, "preguntas_validas": 0}
+
+    def configurar(self):
+        with self._lock:
+            if not self._configurado:
+                self._configurar()
+                self._configurado = True
+
+    def _configurar(self):
+
+        if self.google_api_key:
+            try:
+                import google.generativeai as genai
+                genai.configure(api_key=self.google_api_key)
+                # Puedes cambiar el modelo si quieres (gemini-1.5-flash, etc.)
+                self.gemini_model = genai.GenerativeModel(MODELO_GEMINI)
+            except Exception as e:
+                print("Error configurando Gemini:", e)
+                self.gemini_model = None
+
+        if self.groq_api_key:
+            try:
+                from groq import Groq
+                self.groq_client = Groq(api_key=self.groq_api_key)
+            except Exception as e:
+                print("Error configurando Groq:", e)
+                self.groq_client = None
+
+    def _contar(self, uso, tokens: int, validas):
+        n = len(validas) if validas else 0
+        with self._lock:
+            self.uso["llamadas"] += 1
+            self.uso["tokens"] += tokens
+            self.uso["preguntas_validas"] += n
+            if uso is not None:
+                uso["llamadas"] = uso.get("llamadas", 0) + 1
+                uso["tokens"] = uso.get("tokens", 0) + tokens
+
+    def _pedir_gemini(self, prompt: str):
+        if self.estructurada:
+            try:
+                return self.gemini_model.generate_content(prompt, generation_config={
+                    "response_mime_type": "application/json",
+                    "response_schema": list[PreguntaMC],
+                })
+            except (TypeError, ValueError) as e:
+                # El SDK instalado rechaza la configuración (no es un fallo de red)
+                self.log(f"Gemini sin salida estructurada ({e}); se usa el modo texto.")
+                self.estructurada = False
+        return self.gemini_model.generate_content(prompt)
+
+    def generar_con_gemini(self, prompt: str, log=None, num: int = NUM_PREGUNTAS, uso=None):
+        log = log or self.log
+        if not self.gemini_model:
+            return None
+        try:
+            with tramo("llm.gemini", estructurada=self.estructurada) as t:
+                resp = self._pedir_gemini(prompt)
+                texto_resp = (resp.text or "").strip()
+                tokens = getattr(getattr(resp, "usage_metadata", None), "total_token_count", 0) or 0
+                t.atributos["tokens"] = tokens
+            registrar_respuesta("gemini", MODELO_GEMINI, "cuestionario", resp,
+                                entrada=prompt, salida=texto_resp)
+        except Exception as e:
+            self._contar(uso, 0, None)
+            log(f"Error con Gemini: {e}")
+            return None
+        with tramo("cuestionario.parsear", caracteres=len(texto_resp)):
+            validas = parsear_preguntas_mc(texto_resp, log, num) if texto_resp else None
+        self._contar(uso, tokens, validas)
+        return validas
+
+    def generar_con_groq(self, prompt: str, log=None, num: int = NUM_PREGUNTAS, uso=None):
+        log = log or self.log
+        if not self.groq_client:
+            return None
+        sistema = "Eres un profesor de IA que genera preguntas de examen de opción múltiple en español."
+        extra = {}
+        if self.estructurada:
+            # El modo JSON de Groq exige un objeto en la raíz: la lista va dentro
+            sistema += ' Responde solo con un objeto JSON de la forma {"preguntas": [...]}.'
+            extra["response_format"] = {"type": "json_object"}
+        try:
+            with tramo("llm.groq", estructurada=self.estructurada) as t:
+                resp = self.groq_client.chat.completions.create(
+                    model=MODELO_GROQ,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": sistema,
+                        },
+                        {"role": "user", "content": prompt},
+                    ],
+                    temperature=0.7,
+                    **extra,
+                )
+                texto_resp = (resp.choices[0].message.content or "").strip()
+                tokens = getattr(getattr(resp, "usage", None), "total_tokens", 0) or 0
+                t.atributos["tokens"] = tokens
+            registrar_respuesta("groq", MODELO_GROQ, "cuestionario", resp,
+                                entrada=sistema + prompt, salida=texto_resp)
+        except Exception as e:
+            # Con JSON inválido Groq devuelve 400 pero adjunta lo generado:
+            # se rescata lo que se pueda sin otra llamada
+            texto_resp, tokens = _generacion_fallida(e), 0
+            if not texto_resp:
+                self._contar(uso, 0, None)
+                log(f"Error con Groq: {e}")
+                return None
+            # Esa generación también se cobra (sin usage: se estima)
+            registrar_respuesta("groq", MODELO_GROQ, "cuestionario",
+                                entrada=sistema + prompt, salida=texto_resp)
+        with tramo("cuestionario.parsear", caracteres=len(texto_resp)):
+            validas = parsear_preguntas_mc(texto_resp, log, num) if texto_resp else None
+        self._contar(uso, tokens, validas)
+        return validas
+
+    def resumen_uso(self) -> dict:
+        """Llamadas y tokens por cuestionario válido de NUM_PREGUNTAS (sesión actual)."""
+        with self._lock:
+            uso = dict(self.uso)
+        cuestionarios = uso["preguntas_validas"] / NUM_PREGUNTAS
+        if cuestionarios:
+            uso["llamadas_por_cuestionario"] = round(uso["llamadas"] / cuestionarios, 2)
+            uso["tokens_por_cuestionario"] = round(uso["tokens"] / cuestionarios)
+        return uso
+
+
+def _nuevas_sin_repetir(nuevas, ya):
+    claves = {clave_dedup(p["pregunta"]) for p in ya}
+    unicas = []
+    for item in nuevas or []:
+        clave = clave_dedup(item["pregunta"])
+        if clave not in claves:
+            claves.add(clave)
+            unicas.append(item)
+    return unicas
+
+
+@trazado("cuestionario.lote")
+def generar_lote(generador: GeneradorCuestionario, texto: str, num: int = NUM_PREGUNTAS,
+                 evitar=None, log=print, token=None, limitador=None, uso=None,
+                 parcial: bool = False):
+    """
+    Pide `num` preguntas sobre `texto` (Gemini y, si falla, Groq).
+    Si la respuesta trae solo parte de las preguntas válidas, se piden
+    únicamente las que faltan (hasta CUESTIONARIO_REINTENTOS veces por
+    modelo) en lugar de regenerarlas todas. Con `limitador`, cada llamada
+    al modelo espera su turno; `uso` (dict) acumula llamadas y tokens.
+    Devuelve (preguntas_mc, origen) o (None, None) si no se completaron
+    (con `parcial`, también se devuelven las que haya aunque falten).
+    """
+    generador.configurar()
+    reintentos = _entero_env("CUESTIONARIO_REINTENTOS", 2)
+    obtenidas, origenes = [], []
+
+    modelos = (("Gemini", generador.gemini_model, generador.generar_con_gemini),
+               ("Groq", generador.groq_client, generador.generar_con_groq))
+    for nombre, cliente, generar in modelos:
+        intentos = 0
+        while cliente and len(obtenidas) < num and intentos <= reintentos:
+            _verificar(token)
+            faltan = num - len(obtenidas)
+            with tramo("cuestionario.prompt"):
+                prompt = construir_prompt_preguntas(
+                    texto, evitar=list(evitar or []) + [p["pregunta"] for p in obtenidas], num=faltan)
+            if limitador is not None:
+                limitador.adquirir(token)
+            nuevas = _nuevas_sin_repetir(generar(prompt, log, faltan, uso=uso), obtenidas)
+            intentos += 1
+            if not nuevas:
+                break  # error o nada aprovechable: se pasa al siguiente modelo
+            obtenidas += nuevas[:faltan]
+            if nombre not in origenes:
+                origenes.append(nombre)
+            if len(obtenidas) < num:
+                log(f"Faltan {num - len(obtenidas)} preguntas: se piden solo esas a {nombre}.")
+        if len(obtenidas) >= num:
+            return obtenidas[:num], " + ".join(origenes)
+        if nombre == "Gemini" and cliente and generador.groq_client:
+            contar("llm_respaldos_total", de="gemini", a="groq", funcion="cuestionario")
+    if parcial and obtenidas:
+        return obtenidas, " + ".join(origenes)
+    return None, None
+
+
+def armar_cuestionario(ruta_pdf: str, texto: str, preguntas_mc, origen: str) -> dict:
+    """Etapa de validación final: textos para los QLabel y letras correctas."""
+    preguntas, correctas = [], []
+    for item in preguntas_mc:
+        texto_label, correcta = formatear_pregunta(item)
+        preguntas.append(texto_label)
+        correctas.append(correcta)
+    return {
+        "pdf": ruta_pdf,
+        "texto": texto,
+        "preguntas_mc": preguntas_mc,
+        "preguntas": preguntas,
+        "respuestas_correctas": correctas,
+        "origen": origen,
+    }
+
+
+# ---------------- Map-reduce por secciones ----------------
+def dividir_secciones(texto: str, tam: int = LIMITE_TEXTO_PROMPT, max_secciones: int = None):
+    """
+    Parte el texto en secciones de como mucho `tam` caracteres, cortando
+    en saltos de línea cuando se puede. Si salen más de `max_secciones`,
+    se toman unas repartidas a lo largo de todo el documento.
+    Devuelve [{"indice", "inicio", "fin", "texto"}].
+    """
+    secciones, inicio = [], 0
+    while inicio < len(texto):
+        fin = min(len(texto), inicio + tam)
+        if fin < len(texto):
+            corte = texto.rfind("\n", inicio + tam // 2, fin)
+            if corte > 0:
+                fin = corte + 1
+        if texto[inicio:fin].strip():
+            secciones.append({"inicio": inicio, "fin": fin, "texto": texto[inicio:fin]})
+        inicio = fin
+
+    if max_secciones and len(secciones) > max_secciones:
+        paso = len(secciones) / max_secciones
+        secciones = [secciones[int(i * paso)] for i in range(max_secciones)]
+    for i, seccion in enumerate(secciones):
+        seccion["indice"] = i
+    return secciones
+
+
+def _parecidas(a: set, b: set, umbral: float = 0.8) -> bool:
+    if not a or not b:
+        return False
+    return len(a & b) / len(a | b) >= umbral
+
+
+def reducir_preguntas(candidatas, num: int = NUM_PREGUNTAS):
+    """
+    Reductor local (sin modelo): quita repetidas (enunciado normalizado
+    igual o casi igual) y elige `num` preguntas repartidas entre secciones
+    lo más separadas posible. Prefiere las que traen 4 opciones y la letra
+    correcta. Cada candidata lleva su "seccion".
+    """
+    unicas, vistas = [], []
+    for item in candidatas:
+        palabras = set(clave_dedup(item["pregunta"]).split())
+        if any(_parecidas(palabras, otra) for otra in vistas):
+            continue
+        vistas.append(palabras)
+        unicas.append(item)
+
+    por_seccion = {}
+    for item in sorted(unicas, key=lambda m: (not m["correcta"], len(m["opciones"]) < 4)):
+        por_seccion.setdefault(item["seccion"], []).append(item)
+    indices = sorted(por_seccion)
+    if not indices:
+        return []
+
+    # Orden de visita: secciones equiespaciadas primero, luego el resto
+    paso = max(1, len(indices) / num)
+    orden = [indices[int(i * paso)] for i in range(min(num, len(indices)))]
+    orden += [i for i in indices if i not in orden]
+
+    elegidas = []
+    while len(elegidas) < num and any(por_seccion[i] for i in orden):
+        for i in orden:
+            if por_seccion[i] and len(elegidas) < num:
+                elegidas.append(por_seccion[i].pop(0))
+    # Mantener el orden del documento en el cuestionario
+    return sorted(elegidas, key=lambda m: m["seccion"])
+
+
+def metricas_cobertura(texto: str, secciones, elegidas, candidatas) -> dict:
+    """Qué parte del documento se consultó y de qué parte salen las preguntas."""
+    total = max(1, len(texto))
+    usadas = {m["seccion"] for m in elegidas}
+    return {
+        "caracteres_texto": len(texto),
+        "secciones": len(secciones),
+        "secciones_con_candidatas": len({m["seccion"] for m in candidatas}),
+        "secciones_en_cuestionario": len(usadas),
+        "candidatas": len(candidatas),
+        "fraccion_consultada": round(
+            sum(min(s["fin"] - s["inicio"], LIMITE_TEXTO_PROMPT) for s in secciones) / total, 3),
+        "fraccion_en_cuestionario": round(
+            sum(s["fin"] - s["inicio"] for s in secciones if s["indice"] in usadas) / total, 3),
+    }
+
+
+def cobertura_simple(texto: str) -> dict:
+    """Las mismas métricas para el modo simple (un prompt con el inicio del texto)."""
+    fraccion = round(min(len(texto), LIMITE_TEXTO_PROMPT) / max(1, len(texto)), 3)
+    return {
+        "caracteres_texto": len(texto),
+        "secciones": 1,
+        "secciones_con_candidatas": 1,
+        "secciones_en_cuestionario": 1,
+        "fraccion_consultada": fraccion,
+        "fraccion_en_cuestionario": fraccion,
+    }
+
+
+def generar_mapa(generador: GeneradorCuestionario, secciones, por_seccion: int = None,
+                 evitar=None, hilos: int = None, limitador=None, progreso=None, token=None,
+                 uso=None):
+    """
+    Etapa map: pide `por_seccion` candidatas a cada sección en paralelo.
+    Las secciones que fallan se saltan. Devuelve (candidatas, origenes).
+    """
+    por_seccion = por_seccion or _entero_env("CUESTIONARIO_POR_SECCION", 2)
+    hilos = hilos or _entero_env("CUESTIONARIO_HILOS_MAPA", 8)
+    limitador = limitador if limitador is not None else limitador_llm()
+    progreso = progreso or _sin_progreso
+    generador.configurar()
+
+    def log(msg):
+        progreso(None, None, msg)
+
+    def una(seccion):
+        _verificar(token)
+        with tramo("cuestionario.seccion", seccion=seccion["indice"]):
+            mc, origen = generar_lote(generador, seccion["texto"], por_seccion, evitar=evitar,
+                                      log=log, token=token, limitador=limitador, uso=uso,
+                                      parcial=True)
+        return seccion["indice"], mc or [], origen
+
+    candidatas, origenes, hechas = [], set(), 0
+    ejecutor = ThreadPoolExecutor(max_workers=max(1, hilos), thread_name_prefix="mapa")
+    try:
+        futuros = [ejecutor.submit(propagar(una), s) for s in secciones]
+        for futuro in as_completed(futuros):
+            indice, mc, origen = futuro.result()
+            hechas += 1
+            for item in mc:
+                candidatas.append(dict(item, seccion=indice))
+            if origen:
+                origenes.update(origen.split(" + "))
+            progreso(ETAPA_MAPA, 35 + int(50 * hechas / len(secciones)),
+                     f"Sección {hechas}/{len(secciones)}: {len(mc)} preguntas candidatas.")
+    finally:
+        # Al cancelar no se espera a las secciones que aún no empezaron
+        ejecutor.shutdown(wait=False, cancel_futures=True)
+    return candidatas, origenes
+
+
+@trazado("cuestionario.mapreduce")
+def generar_cuestionario_mapreduce(ruta_pdf: str, generador: GeneradorCuestionario, texto: str,
+                                   evitar=None, progreso=None, token=None) -> dict:
+    """Etapas 2-4 en modo map-reduce sobre el texto ya extraído."""
+    progreso = progreso or _sin_progreso
+    secciones = dividir_secciones(texto, max_secciones=_entero_env("CUESTIONARIO_MAX_SECCIONES", 8))
+    uso = {}
+
+    progreso(ETAPA_PROMPT, 25, f"Dividiendo el PDF en {len(secciones)} secciones...")
+    progreso(ETAPA_GENERAR, 35, "Generando preguntas candidatas por sección en paralelo...")
+    candidatas, origenes = generar_mapa(generador, secciones, evitar=evitar,
+                                        progreso=progreso, token=token, uso=uso)
+    _verificar(token)
+
+    progreso(ETAPA_REDUCIR, 88, f"Seleccionando {NUM_PREGUNTAS} de {len(candidatas)} candidatas...")
+    with tramo("cuestionario.reducir", candidatas=len(candidatas)):
+        elegidas = reducir_preguntas(candidatas, NUM_PREGUNTAS)
+
+    progreso(ETAPA_VALIDAR, 90, "Validando preguntas...")
+    if len(elegidas) < NUM_PREGUNTAS:
+        raise RuntimeError("No se pudieron generar 5 preguntas de opción múltiple válidas.")
+
+    cobertura = metricas_cobertura(texto, secciones, elegidas, candidatas)
+    origen = " + ".join(sorted(origenes))
+    progreso(ETAPA_LISTO, 100,
+             f"Preguntas generadas con {origen} a partir de {cobertura['secciones_en_cuestionario']} "
+             f"de {cobertura['secciones']} secciones ({uso.get('llamadas', 0)} llamadas).")
+    preguntas_mc = [{k: v for k, v in m.items() if k != "seccion"} for m in elegidas]
+    resultado = armar_cuestionario(ruta_pdf, texto, preguntas_mc, origen)
+    resultado["cobertura"] = cobertura
+    resultado["uso"] = uso
+    return resultado
+
+
+# ---------------- Pipeline completo ----------------
+@trazado("cuestionario.generar")
+def generar_cuestionario(ruta_pdf: str, generador: GeneradorCuestionario, texto: str = None,
+                         evitar=None, progreso=None, token=None, modo: str = None) -> dict:
+    """
+    Ejecuta las etapas 1-4 y devuelve
+        {"pdf", "texto", "preguntas_mc", "preguntas", "respuestas_correctas",
+         "origen", "cobertura", "uso"}.
+    Si se pasa `texto` (ya extraído antes) se salta la lectura del PDF.
+    `modo` (o CUESTIONARIO_MODO) elige entre un prompt único y map-reduce.
+    Lanza RuntimeError si no se pudo obtener un cuestionario válido.
+    """
+    progreso = progreso or _sin_progreso
+    modo = modo or modo_generacion()
+
+    def log(msg):
+        progreso(None, None, msg)
+
+    # 1) Extraer (en map-reduce se lee el PDF completo)
+    if texto is None:
+        progreso(ETAPA_EXTRAER, 5, "Leyendo PDF...")
+        limite = LIMITE_TEXTO_PDF if modo == MODO_SIMPLE else LIMITE_TEXTO_MAPA
+        try:
+            texto = leer_texto_pdf(ruta_pdf, limite=limite, token=token)
+        except Exception as e:
+            raise RuntimeError(f"Error leyendo el PDF: {e}") from e
+        _verificar(token)
+    if not texto.strip():
+        raise RuntimeError("No se pudo extraer texto del PDF.")
+
+    umbral = _entero_env("CUESTIONARIO_UMBRAL_AUTO", UMBRAL_MODO_AUTO)
+    if modo == MODO_MAPREDUCE or (modo == MODO_AUTO and len(texto) > umbral):
+        return generar_cuestionario_mapreduce(ruta_pdf, generador, texto, evitar=evitar,
+                                              progreso=progreso, token=token)
+
+    # 2) Prompt + 3) Generar (Gemini, si falla Groq)
+    progreso(ETAPA_PROMPT, 25, "Preparando instrucciones para el modelo...")
+    progreso(ETAPA_GENERAR, 35,
+             "Generando 5 preguntas de opción múltiple (4 opciones) con Gemini "
+             "(si falla, se usará Groq)...")
+    uso = {}
+    preguntas_mc, origen = generar_lote(generador, texto, NUM_PREGUNTAS,
+                                        evitar=evitar, log=log, token=token, uso=uso)
+    _verificar(token)
+
+    # 4) Validar
+    progreso(ETAPA_VALIDAR, 90, "Validando preguntas...")
+    if not preguntas_mc:
+        raise RuntimeError("No se pudieron generar 5 preguntas de opción múltiple válidas.")
+
+    llamadas = uso.get("llamadas", 0)
+    progreso(ETAPA_LISTO, 100, f"Preguntas generadas con {origen}"
+             + (f" ({llamadas} llamadas)." if llamadas > 1 else "."))
+    resultado = armar_cuestionario(ruta_pdf, texto, preguntas_mc, origen)
+    resultado["cobertura"] = cobertura_simple(texto)
+    resultado["uso"] = uso
+    return resultado
@@ -0,0 +1,169 @@
+# escritor_memoria.py
+# ------------------------------------------------------
+# Escritor en segundo plano para la memoria de las conversaciones.
+#
+# En lugar de serializar y escribir a disco en cada turno (bloqueando la
+# respuesta del modelo), los módulos marcan su sesión como "sucia" y este
+# hilo agrupa los cambios y los vuelca cada cierto intervalo.
+#
+# Durabilidad (variable de entorno MEMORIA_DURABILIDAD):
+#   - "inmediata": se escribe en el mismo hilo en cada turno (comportamiento original).
+#   - "intervalo": se escribe en segundo plano cada MEMORIA_FLUSH_SEGUNDOS (por defecto).
+#   - "salida":    solo se escribe al cerrar la aplicación o con flush() explícito.
+# ------------------------------------------------------
+
+import os
+import atexit
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DURABILIDAD_INMEDIATA = "inmediata"
+DURABILIDAD_INTERVALO = "intervalo"
+DURABILIDAD_SALIDA = "salida"
+
+_DURABILIDADES = (DURABILIDAD_INMEDIATA, DURABILIDAD_INTERVALO, DURABILIDAD_SALIDA)
+
+
+def escribir_atomico(ruta: str, contenido, modo: str = "w", encoding: str = "utf-8"):
+    """
+    Escribe el archivo en un temporal y lo renombra, para que un cierre
+    a mitad de escritura nunca deje el historial corrupto.
+    """
+    tmp = f"{ruta}.tmp"
+    with open(tmp, modo, encoding=None if "b" in modo else encoding) as f:
+        f.write(contenido)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, ruta)
+
+
+class EscritorMemoria:
+    """
+    Agrupa las sesiones pendientes de guardar y las vuelca desde un hilo propio.
+
+    Cada sesión se identifica con una clave (p. ej. la ruta del archivo) y se
+    asocia a una función sin argumentos que hace la escritura. Si la misma
+    sesión se marca varias veces antes del siguiente volcado, solo se ejecuta
+    la última función registrada.
+    """
+
+    def __init__(self, durabilidad: str = None, intervalo: float = None):
+        durabilidad = (durabilidad or os.getenv("MEMORIA_DURABILIDAD", DURABILIDAD_INTERVALO)).strip().lower()
+        if durabilidad not in _DURABILIDADES:
+            logger.warning("MEMORIA_DURABILIDAD desconocida (%s); se usa '%s'.",
+                           durabilidad, DURABILIDAD_INTERVALO)
+            durabilidad = DURABILIDAD_INTERVALO
+        if intervalo is None:
+            try:
+                intervalo = float(os.getenv("MEMORIA_FLUSH_SEGUNDOS", "2"))
+            except ValueError:
+                intervalo = 2.0
+
+        self.durabilidad = durabilidad
+        self.intervalo = max(0.05, intervalo)
+
+        self._pendientes = {}
+        self._lock = threading.Lock()
+        # Serializa los volcados (hilo de fondo vs. flush() explícito)
+        self._lock_volcado = threading.Lock()
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    # ---------------- API ----------------
+    def marcar_sucio(self, clave: str, escribir):
+        """Registra (o reemplaza) la escritura pendiente de una sesión."""
+        if self.durabilidad == DURABILIDAD_INMEDIATA:
+            with self._lock_volcado:
+                self._ejecutar(clave, escribir)
+            return
+
+        with self._lock:
+            self._pendientes[clave] = escribir
+        if self.durabilidad == DURABILIDAD_INTERVALO:
+            self._asegurar_hilo()
+
+    def descartar(self, clave: str):
+        """
+        Olvida la escritura pendiente de una sesión (p. ej. al borrar su memoria).
+        Si hay un volcado en curso, espera a que termine.
+        """
+        with self._lock_volcado:
+            with self._lock:
+                self._pendientes.pop(clave, None)
+
+    def flush(self, clave: str = None):
+        """
+        Vuelca ya, en el hilo que llama, las sesiones pendientes
+        (todas o solo la indicada).
+        """
+        with self._lock_volcado:
+            with self._lock:
+                if clave is None:
+                    lote = self._pendientes
+                    self._pendientes = {}
+                else:
+                    escribir = self._pendientes.pop(clave, None)
+                    lote = {clave: escribir} if escribir else {}
+            for k, escribir in lote.items():
+                self._ejecutar(k, escribir)
+
+    def pendientes(self) -> int:
+        with self._lock:
+            return len(self._pendientes)
+
+    def cerrar(self):
+        """Detiene el hilo y vuelca todo lo pendiente."""
+        self._detener.set()
+        self._despertar.set()
+        if self._hilo and self._hilo.is_alive() and self._hilo is not threading.current_thread():
+            self._hilo.join(timeout=self.intervalo + 5)
+        self.flush()
+
+    # ---------------- Internos ----------------
+    def _asegurar_hilo(self):
+        if self._hilo and self._hilo.is_alive():
+            return
+        with self._lock:
+            if self._hilo and self._hilo.is_alive():
+                return
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._bucle, name="EscritorMemoria", daemon=True)
+            self._hilo.start()
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+            self.flush()
+
+    def _ejecutar(self, clave, escribir):
+        try:
+            escribir()
+        except Exception:
+            # Un fallo de disco no debe tumbar el hilo ni la conversación
+            logger.exception("No se pudo guardar la memoria de la sesión %s", clave)
+
+
+# ---------------- Instancia compartida ----------------
+_escritor = None
+_escritor_lock = threading.Lock()
+
+
+def obtener_escritor() -> EscritorMemoria:
+    """Devuelve el escritor compartido por todos los módulos (se crea al primer uso)."""
+    global _escritor
+    if _escritor is None:
+        with _escritor_lock:
+            if _escritor is None:
+                _escritor = EscritorMemoria()
+                atexit.register(_escritor.cerrar)
+    return _escritor
+
+
+def cerrar_escritor():
+    """Para conectar con QApplication.aboutToQuit: vuelca todo antes de salir."""
+    if _escritor is not None:
+        _escritor.cerrar()
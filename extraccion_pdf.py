@@ -0,0 +1,243 @@
+# extraccion_pdf.py
+# ------------------------------------------------------
+# Servicio único de extracción de texto de PDF, compartido por el
+# cuestionario (cuestionario_ia.py) y el RAG (8_memoria.py).
+#
+# Antes el cuestionario leía con PyPDF2 concatenando cadenas y el RAG
+# volvía a leer el mismo PDF con PyPDFLoader. Ahora:
+#   - las páginas se extraen por bloques en un pool de procesos (el
+#     análisis de PDF es CPU puro y no suelta el GIL);
+#   - el texto se acumula en listas y se une una sola vez;
+#   - con `limite`, se deja de pedir bloques en cuanto se alcanza;
+#   - el resultado se guarda en disco (JSON por PDF, clave = sha256 del
+#     contenido + mtime), así que cualquier ventana lo reutiliza al momento.
+#
+#   paginas = extraer_paginas("documentos/fuente.pdf")
+#   texto = extraer_texto("documentos/fuente.pdf", limite=16000)
+#
+# Variables de entorno:
+#   PDF_PROCESOS=4            procesos de extracción (1 = en el mismo proceso)
+#   PDF_PAGINAS_POR_BLOQUE=8  páginas por trabajo del pool
+#   PDF_CACHE_DIR=.cache_pdf  carpeta del caché ("" lo desactiva)
+#   PDF_CACHE_MAX=50          PDF guardados como mucho (se borran los más viejos)
+#
+# Usa pypdf si está instalado y, si no, PyPDF2 (la misma API PdfReader).
+# ------------------------------------------------------
+
+import os
+import json
+import atexit
+import hashlib
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from trazas import tramo
+
+logger = logging.getLogger(__name__)
+
+# Por debajo de esto no compensa repartir entre procesos
+MIN_PAGINAS_PARALELO = 16
+
+
+def _entero_env(nombre: str, defecto: int) -> int:
+    try:
+        return int(os.getenv(nombre, str(defecto)))
+    except ValueError:
+        return defecto
+
+
+def _pdf_reader(ruta: str):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        from PyPDF2 import PdfReader
+    return PdfReader(ruta)
+
+
+# ---------------- Trabajo de cada proceso ----------------
+_lectores = {}  # ruta -> (mtime_ns, PdfReader), en cada proceso del pool
+
+
+def _extraer_bloque(ruta: str, inicio: int, fin: int):
+    """Texto de las páginas [inicio, fin). Se ejecuta en el pool."""
+    # El PdfReader se reutiliza entre bloques del mismo PDF (abrirlo ya
+    # cuesta analizar la tabla de objetos)
+    mtime = os.stat(ruta).st_mtime_ns
+    if ruta not in _lectores or _lectores[ruta][0] != mtime:
+        _lectores.clear()
+        _lectores[ruta] = (mtime, _pdf_reader(ruta))
+    reader = _lectores[ruta][1]
+    return [(reader.pages[i].extract_text() or "") for i in range(inicio, fin)]
+
+
+# ---------------- Hash (memoizado por ruta, tamaño y mtime) ----------------
+_hashes = {}
+_lock_hashes = threading.Lock()
+
+
+def hash_archivo(ruta: str) -> str:
+    """sha256 del contenido; solo se recalcula si el archivo cambió."""
+    st = os.stat(ruta)
+    clave = (os.path.abspath(ruta), st.st_size, st.st_mtime_ns)
+    with _lock_hashes:
+        if clave in _hashes:
+            return _hashes[clave]
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    with _lock_hashes:
+        _hashes[clave] = h.hexdigest()
+    return _hashes[clave]
+
+
+# ---------------- Caché en disco ----------------
+def _dir_cache() -> str:
+    return os.getenv("PDF_CACHE_DIR", ".cache_pdf").strip()
+
+
+def _ruta_cache(ruta: str) -> str:
+    return os.path.join(_dir_cache(), f"{hash_archivo(ruta)}-{os.stat(ruta).st_mtime_ns}.json")
+
+
+def _leer_cache(ruta: str):
+    if not _dir_cache():
+        return None
+    try:
+        with open(_ruta_cache(ruta), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _guardar_cache(ruta: str, paginas, completo: bool, total_paginas: int):
+    carpeta = _dir_cache()
+    if not carpeta:
+        return
+    destino = _ruta_cache(ruta)
+    try:
+        os.makedirs(carpeta, exist_ok=True)
+        tmp = destino + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"paginas": paginas, "completo": completo,
+                       "total_paginas": total_paginas}, f, ensure_ascii=False)
+        os.replace(tmp, destino)  # atómico: otra ventana nunca ve medio archivo
+        _podar_cache(carpeta)
+    except OSError as e:
+        logger.warning("No se pudo guardar el caché de %s: %s", ruta, e)
+
+
+def _podar_cache(carpeta: str):
+    maximo = _entero_env("PDF_CACHE_MAX", 50)
+    archivos = [os.path.join(carpeta, n) for n in os.listdir(carpeta) if n.endswith(".json")]
+    if len(archivos) <= maximo:
+        return
+    archivos.sort(key=os.path.getmtime)
+    for viejo in archivos[:len(archivos) - maximo]:
+        try:
+            os.remove(viejo)
+        except OSError:
+            pass
+
+
+# ---------------- Pool de procesos ----------------
+_pool = None
+_lock_pool = threading.Lock()
+
+
+def _obtener_pool(procesos: int) -> ProcessPoolExecutor:
+    global _pool
+    with _lock_pool:
+        if _pool is None:
+            # spawn: la GUI tiene hilos (Qt) y hacer fork con hilos no es seguro
+            _pool = ProcessPoolExecutor(max_workers=procesos,
+                                        mp_context=multiprocessing.get_context("spawn"))
+            atexit.register(cerrar_pool)
+        return _pool
+
+
+def cerrar_pool():
+    global _pool
+    with _lock_pool:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+# ---------------- API ----------------
+def _suma(paginas) -> int:
+    return sum(len(p) + 1 for p in paginas)
+
+
+def extraer_paginas(ruta: str, limite: int = None, token=None, procesos: int = None):
+    """
+    Lista con el texto de cada página. Con `limite` (caracteres) puede
+    devolver solo las primeras páginas: las justas para superarlo.
+    Si el token se cancela, se corta y se devuelve lo que haya (sin caché).
+    """
+    with tramo("pdf.extraer", pdf=os.path.basename(ruta)) as t:
+        cache = _leer_cache(ruta)
+        if cache and (cache["completo"] or (limite and _suma(cache["paginas"]) > limite)):
+            t.atributos.update(cache=True, paginas=len(cache["paginas"]))
+            return cache["paginas"]
+        paginas = _extraer_sin_cache(ruta, limite, token, procesos)
+        t.atributos.update(cache=False, paginas=len(paginas))
+        return paginas
+
+
+def _extraer_sin_cache(ruta: str, limite, token, procesos):
+    reader = _pdf_reader(ruta)
+    total = len(reader.pages)
+    procesos = procesos or _entero_env("PDF_PROCESOS", min(4, os.cpu_count() or 1))
+    por_bloque = max(1, _entero_env("PDF_PAGINAS_POR_BLOQUE", 8))
+
+    paginas, cancelado, acumulado = [], False, 0
+    if procesos <= 1 or total < MIN_PAGINAS_PARALELO:
+        for pagina in reader.pages:
+            if token is not None and token.cancelado:
+                cancelado = True
+                break
+            paginas.append(pagina.extract_text() or "")
+            acumulado += len(paginas[-1]) + 1
+            if limite and acumulado > limite:
+                break
+    else:
+        pool = _obtener_pool(procesos)
+        bloques = [(i, min(total, i + por_bloque)) for i in range(0, total, por_bloque)]
+        # Solo hay en vuelo unos pocos bloques más que procesos: si se llega
+        # al límite, los siguientes ni se piden
+        en_vuelo, siguiente = [], 0
+        while siguiente < len(bloques) or en_vuelo:
+            while siguiente < len(bloques) and len(en_vuelo) < procesos * 2:
+                en_vuelo.append(pool.submit(_extraer_bloque, ruta, *bloques[siguiente]))
+                siguiente += 1
+            bloque = en_vuelo.pop(0).result()  # en orden de página
+            paginas.extend(bloque)
+            acumulado += _suma(bloque)
+            if token is not None and token.cancelado:
+                cancelado = True
+            if cancelado or (limite and acumulado > limite):
+                for futuro in en_vuelo:
+                    futuro.cancel()
+                break
+
+    if not cancelado:
+        _guardar_cache(ruta, paginas, len(paginas) == total, total)
+    return paginas
+
+
+def extraer_texto(ruta: str, limite: int = None, token=None) -> str:
+    """Texto del PDF (páginas separadas por salto de línea)."""
+    paginas = extraer_paginas(ruta, limite=limite, token=token)
+    if limite:
+        # Misma regla que antes: páginas enteras hasta pasar el límite
+        usadas, acumulado = [], 0
+        for pagina in paginas:
+            usadas.append(pagina)
+            acumulado += len(pagina) + 1
+            if acumulado > limite:
+                break
+        paginas = usadas
+    return "".join(p + "\n" for p in paginas)
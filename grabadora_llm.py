@@ -0,0 +1,447 @@
+# grabadora_llm.py
+# ------------------------------------------------------
+# Grabación y reproducción de las llamadas a los modelos, para repetir
+# sesiones reales de clase (cuestionarios, preguntas al RAG, chats) como
+# pruebas de rendimiento deterministas y sin red.
+#
+#   LLM_GRABADORA=grabar     python main_gui.py    # usa los modelos y graba
+#   LLM_GRABADORA=reproducir python main_gui.py    # responde desde el casete
+#
+# Se interceptan, a nivel de clase (afecta a todos los clientes):
+#   - Groq:          groq.resources.chat.completions.Completions.create
+#   - Gemini:        google.generativeai.GenerativeModel.generate_content
+#   - LangChain:     ChatGoogleGenerativeAI._generate (por debajo de los
+#                    callbacks, así medidor_uso y las trazas siguen viéndolo)
+#
+# Cada llamada se guarda con su petición, su respuesta (o el error, con el
+# cuerpo que trae Groq al rechazar un JSON) y lo que tardó. El casete es
+# JSONL comprimido: cada registro es un miembro gzip escrito con un solo
+# write en modo append, así varios procesos (la GUI y los trabajadores de
+# trabajador_scripts.py) pueden grabar en el mismo archivo.
+#
+# Al reproducir, cada petición se busca por su huella (backend + petición
+# normalizada) y se sirven en el orden en que se grabaron; si la misma
+# petición se repite más veces que en la grabación se repite la última.
+# Si no está y LLM_CASETE_ESTRICTO=0, se sirve la siguiente respuesta sin
+# usar del mismo backend (útil si el prompt cambió un poco). La espera es
+# la latencia grabada por LLM_CASETE_LATENCIA.
+#
+#   python grabadora_llm.py info casetes/clase.llm.gz
+#   python grabadora_llm.py ejecutar 8_memoria.py     (un script con la grabadora puesta)
+#
+# Variables de entorno:
+#   LLM_GRABADORA=               grabar | reproducir (vacío = desactivada)
+#   LLM_CASETE=casetes/sesion.llm.gz
+#   LLM_CASETE_LATENCIA=original original | factor (0 = sin espera, 0.5 = la mitad)
+#   LLM_CASETE_ESTRICTO=0        1: una petición no grabada es un error
+# ------------------------------------------------------
+
+import os
+import sys
+import gzip
+import json
+import time
+import runpy
+import hashlib
+import logging
+import argparse
+import functools
+import threading
+from types import SimpleNamespace
+from collections import Counter, defaultdict, deque
+
+logger = logging.getLogger(__name__)
+
+GRABAR = "grabar"
+REPRODUCIR = "reproducir"
+
+
+def modo() -> str:
+    valor = os.getenv("LLM_GRABADORA", "").strip().lower()
+    return valor if valor in (GRABAR, REPRODUCIR) else ""
+
+
+def _ruta_casete() -> str:
+    return os.getenv("LLM_CASETE", os.path.join("casetes", "sesion.llm.gz"))
+
+
+def factor_latencia() -> float:
+    valor = os.getenv("LLM_CASETE_LATENCIA", "original").strip().lower()
+    if valor in ("", "original"):
+        return 1.0
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        return 1.0
+
+
+class SinGrabacion(RuntimeError):
+    """Al reproducir, la petición no está en el casete."""
+
+
+class ErrorGrabado(RuntimeError):
+    """Error del proveedor tal como se grabó (con body y status_code si los traía)."""
+
+    def __init__(self, tipo: str, mensaje: str, cuerpo=None, estado=None):
+        super().__init__(f"[{tipo}] {mensaje}")
+        self.body = cuerpo
+        self.status_code = estado
+
+
+def huella(backend: str, peticion: dict) -> str:
+    datos = json.dumps(peticion, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(f"{backend}\n{datos}".encode("utf-8")).hexdigest()[:20]
+
+
+# ---------------- Casete ----------------
+def leer_registros(ruta: str):
+    """Registros del casete, en orden (lee todos los miembros gzip)."""
+    registros = []
+    try:
+        with gzip.open(ruta, "rt", encoding="utf-8") as f:
+            for linea in f:
+                try:
+                    registros.append(json.loads(linea))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        return []
+    except (OSError, EOFError) as e:
+        # Un último miembro a medio escribir (proceso matado): se usa lo anterior
+        logger.warning("Casete %s truncado: %s", ruta, e)
+    return registros
+
+
+class Casete:
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._por_huella = defaultdict(deque)    # (backend, huella) -> registros sin servir
+        self._por_backend = defaultdict(deque)   # backend -> registros en orden de grabación
+        self._ultimo = {}
+        self.servidas = Counter()                # exacta | repetida | aproximada
+
+    # ---------------- Grabar ----------------
+    def grabar(self, backend: str, peticion: dict, segundos: float, respuesta=None, error=None):
+        registro = {
+            "backend": backend,
+            "huella": huella(backend, peticion),
+            "peticion": peticion,
+            "segundos": round(segundos, 4),
+            "t": round(time.time(), 3),
+            "pid": os.getpid(),
+        }
+        if error is not None:
+            registro["error"] = error
+        else:
+            registro["respuesta"] = respuesta
+        linea = json.dumps(registro, ensure_ascii=False, default=str) + "\n"
+        datos = gzip.compress(linea.encode("utf-8"))
+        with self._lock:
+            carpeta = os.path.dirname(self.ruta)
+            if carpeta:
+                os.makedirs(carpeta, exist_ok=True)
+            fd = os.open(self.ruta, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                os.write(fd, datos)
+            finally:
+                os.close(fd)
+
+    # ---------------- Reproducir ----------------
+    def cargar(self):
+        registros = leer_registros(self.ruta)
+        with self._lock:
+            for r in registros:
+                r["_servido"] = False
+                self._por_huella[(r["backend"], r["huella"])].append(r)
+                self._por_backend[r["backend"]].append(r)
+        logger.info("Casete %s: %d llamadas grabadas", self.ruta, len(registros))
+        return len(registros)
+
+    def buscar(self, backend: str, peticion: dict) -> dict:
+        clave = (backend, huella(backend, peticion))
+        with self._lock:
+            cola = self._por_huella.get(clave)
+            while cola:
+                registro = cola.popleft()
+                if not registro["_servido"]:
+                    return self._servir(clave, registro, "exacta")
+            if clave in self._ultimo:
+                self.servidas["repetida"] += 1
+                return self._ultimo[clave]
+            if os.getenv("LLM_CASETE_ESTRICTO", "0") != "1":
+                cola = self._por_backend.get(backend)
+                while cola:
+                    registro = cola.popleft()
+                    if not registro["_servido"]:
+                        return self._servir(clave, registro, "aproximada")
+        raise SinGrabacion(f"{backend}: la petición {clave[1]} no está en el casete {self.ruta}")
+
+    def _servir(self, clave, registro: dict, tipo: str) -> dict:
+        registro["_servido"] = True
+        self._ultimo[clave] = registro
+        # Si la grabación se gastó en otra petición, la suya propia la repite
+        self._ultimo.setdefault((registro["backend"], registro["huella"]), registro)
+        self.servidas[tipo] += 1
+        if tipo == "aproximada":
+            logger.debug("Casete: %s servida sin coincidencia exacta", clave[1])
+        return registro
+
+
+_casete = None
+_lock_casete = threading.Lock()
+
+
+def casete() -> Casete:
+    global _casete
+    with _lock_casete:
+        if _casete is None:
+            _casete = Casete(_ruta_casete())
+            if modo() == REPRODUCIR:
+                _casete.cargar()
+        return _casete
+
+
+# ---------------- Envoltura genérica ----------------
+def _error_a_dict(e: Exception) -> dict:
+    cuerpo = getattr(e, "body", None)
+    return {
+        "tipo": type(e).__name__,
+        "mensaje": str(e)[:2000],
+        "cuerpo": cuerpo if isinstance(cuerpo, (dict, list, str)) else None,
+        "estado": getattr(e, "status_code", None),
+    }
+
+
+def _envolver(backend: str, original, a_peticion, a_registro, de_registro):
+    @functools.wraps(original)
+    def envoltura(yo, *args, **kwargs):
+        peticion = a_peticion(yo, *args, **kwargs)
+        if modo() == REPRODUCIR:
+            registro = casete().buscar(backend, peticion)
+            espera = registro["segundos"] * factor_latencia()
+            if espera > 0:
+                time.sleep(espera)
+            if "error" in registro:
+                e = registro["error"]
+                raise ErrorGrabado(e["tipo"], e["mensaje"], e.get("cuerpo"), e.get("estado"))
+            return de_registro(registro["respuesta"])
+
+        inicio = time.perf_counter()
+        try:
+            resp = original(yo, *args, **kwargs)
+        except Exception as e:
+            casete().grabar(backend, peticion, time.perf_counter() - inicio, error=_error_a_dict(e))
+            raise
+        segundos = time.perf_counter() - inicio
+        try:
+            casete().grabar(backend, peticion, segundos, respuesta=a_registro(resp))
+        except Exception as e:
+            logger.warning("No se pudo grabar la llamada a %s: %s", backend, e)
+        return resp
+
+    envoltura._grabadora_original = original
+    return envoltura
+
+
+def _uso_dict(uso, campos) -> dict:
+    if uso is None:
+        return None
+    return {c: getattr(uso, c, None) if not isinstance(uso, dict) else uso.get(c) for c in campos}
+
+
+# ---------------- Groq ----------------
+_CAMPOS_USO_GROQ = ("prompt_tokens", "completion_tokens", "total_tokens")
+
+
+def _peticion_groq(yo, *args, **kwargs) -> dict:
+    return {k: v for k, v in kwargs.items() if k not in ("timeout", "extra_headers")}
+
+
+def _registro_groq(resp) -> dict:
+    return {
+        "modelo": getattr(resp, "model", None),
+        "contenidos": [c.message.content for c in resp.choices],
+        "uso": _uso_dict(getattr(resp, "usage", None), _CAMPOS_USO_GROQ),
+    }
+
+
+def _respuesta_groq(r: dict):
+    return SimpleNamespace(
+        model=r.get("modelo"),
+        choices=[SimpleNamespace(index=i, finish_reason="stop",
+                                 message=SimpleNamespace(role="assistant", content=c))
+                 for i, c in enumerate(r["contenidos"])],
+        usage=SimpleNamespace(**r["uso"]) if r.get("uso") else None,
+    )
+
+
+# ---------------- Gemini (google.generativeai) ----------------
+_CAMPOS_USO_GEMINI = ("prompt_token_count", "candidates_token_count", "total_token_count")
+
+
+class _RespuestaGemini:
+    def __init__(self, r: dict):
+        self._texto = r.get("texto")
+        self.usage_metadata = SimpleNamespace(**r["uso"]) if r.get("uso") else None
+
+    @property
+    def text(self):
+        if self._texto is None:
+            raise ValueError("La respuesta grabada no tenía texto (bloqueada o vacía).")
+        return self._texto
+
+
+def _peticion_gemini(yo, contents=None, *args, **kwargs) -> dict:
+    peticion = {"modelo": getattr(yo, "model_name", None), "contenido": contents}
+    peticion.update({k: v for k, v in kwargs.items() if k not in ("request_options",)})
+    return peticion
+
+
+def _registro_gemini(resp) -> dict:
+    try:
+        texto = resp.text
+    except ValueError:
+        texto = None
+    return {"texto": texto, "uso": _uso_dict(getattr(resp, "usage_metadata", None), _CAMPOS_USO_GEMINI)}
+
+
+# ---------------- LangChain (ChatGoogleGenerativeAI) ----------------
+def _peticion_langchain(yo, messages, stop=None, run_manager=None, **kwargs) -> dict:
+    return {
+        "modelo": getattr(yo, "model", None),
+        "temperatura": getattr(yo, "temperature", None),
+        "mensajes": [[m.type, m.content] for m in messages],
+        "stop": stop,
+        **kwargs,
+    }
+
+
+def _registro_langchain(resultado) -> dict:
+    return {
+        "generaciones": [{
+            "contenido": g.message.content,
+            "uso": getattr(g.message, "usage_metadata", None),
+            "meta": getattr(g.message, "response_metadata", None) or {},
+            "info": g.generation_info,
+        } for g in resultado.generations],
+        "llm_output": resultado.llm_output,
+    }
+
+
+def _respuesta_langchain(r: dict):
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+    generaciones = []
+    for g in r["generaciones"]:
+        mensaje = AIMessage(content=g["contenido"], response_metadata=g.get("meta") or {},
+                            usage_metadata=g.get("uso") or None)
+        generaciones.append(ChatGeneration(message=mensaje, generation_info=g.get("info")))
+    return ChatResult(generations=generaciones, llm_output=r.get("llm_output"))
+
+
+# ---------------- Instalación ----------------
+_instalada = False
+
+
+def _parchear(clase, metodo: str, backend: str, a_peticion, a_registro, de_registro):
+    actual = getattr(clase, metodo)
+    if getattr(actual, "_grabadora_original", None) is not None:
+        return
+    setattr(clase, metodo, _envolver(backend, actual, a_peticion, a_registro, de_registro))
+
+
+def instalar() -> bool:
+    """
+    Intercepta los SDK instalados según LLM_GRABADORA. Devuelve False si la
+    grabadora está desactivada. Importa los SDK al instalarse (solo en este modo).
+    """
+    global _instalada
+    actual = modo()
+    if not actual:
+        return False
+    if _instalada:
+        return True
+    # Ruta absoluta: los trabajadores de scripts cambian de carpeta por trabajo
+    os.environ["LLM_CASETE"] = os.path.abspath(_ruta_casete())
+    if actual == REPRODUCIR:
+        # Sin red: claves de relleno para que los clientes se construyan, y el
+        # gasto reproducido no cuenta en el medidor de uso
+        os.environ.setdefault("GOOGLE_API_KEY", "reproduccion")
+        os.environ.setdefault("GROQ_API_KEY", "reproduccion")
+        os.environ.setdefault("USO_LLM", "0")
+
+    interceptados = []
+    try:
+        from groq.resources.chat.completions import Completions
+        _parchear(Completions, "create", "groq", _peticion_groq, _registro_groq, _respuesta_groq)
+        interceptados.append("groq")
+    except ImportError:
+        pass
+    try:
+        import google.generativeai as genai
+        _parchear(genai.GenerativeModel, "generate_content", "gemini",
+                  _peticion_gemini, _registro_gemini, _RespuestaGemini)
+        interceptados.append("gemini")
+    except ImportError:
+        pass
+    try:
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        _parchear(ChatGoogleGenerativeAI, "_generate", "langchain-gemini",
+                  _peticion_langchain, _registro_langchain, _respuesta_langchain)
+        interceptados.append("langchain-gemini")
+    except ImportError:
+        pass
+
+    _instalada = True
+    logger.info("Grabadora de LLM en modo %s (%s): %s", actual,
+                ", ".join(interceptados) or "ningún SDK instalado", os.environ["LLM_CASETE"])
+    if actual == REPRODUCIR:
+        casete()   # carga el casete ya, no en la primera llamada
+    return True
+
+
+# ---------------- CLI ----------------
+def texto_info(ruta: str) -> str:
+    registros = leer_registros(ruta)
+    if not registros:
+        return f"{ruta}: sin llamadas grabadas."
+    por_backend = defaultdict(list)
+    for r in registros:
+        por_backend[r["backend"]].append(r)
+    lineas = [f"{ruta}: {len(registros)} llamadas, {os.path.getsize(ruta) / 1024:.1f} KiB, "
+              f"{len({r['pid'] for r in registros})} proceso(s), "
+              f"{registros[-1]['t'] - registros[0]['t']:.0f} s de sesión"]
+    for backend, regs in sorted(por_backend.items()):
+        errores = sum("error" in r for r in regs)
+        latencia = sum(r["segundos"] for r in regs)
+        lineas.append(f"  {backend:<18} {len(regs):>5} llamadas  {errores:>3} errores  "
+                      f"{latencia:>8.1f} s de espera  ({latencia / len(regs):.2f} s de media)")
+    return "\n".join(lineas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grabación y reproducción de llamadas a los modelos")
+    sub = parser.add_subparsers(dest="orden", required=True)
+    info = sub.add_parser("info", help="resumen de un casete")
+    info.add_argument("casete", nargs="?", default=_ruta_casete())
+    ejecutar = sub.add_parser("ejecutar", help="ejecuta un script con la grabadora instalada")
+    ejecutar.add_argument("script")
+    ejecutar.add_argument("argumentos", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    if args.orden == "info":
+        print(texto_info(args.casete))
+        return 0
+
+    if not instalar():
+        print("LLM_GRABADORA no está definida (grabar | reproducir).", file=sys.stderr)
+        return 2
+    sys.argv = [args.script] + args.argumentos
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args.script)))
+    runpy.run_path(args.script, run_name="__main__")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
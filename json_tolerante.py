@@ -0,0 +1,134 @@
+# json_tolerante.py
+# ------------------------------------------------------
+# Lectura tolerante del JSON que devuelven los modelos.
+#
+# json.loads falla entero por un solo defecto (una coma de más, un
+# ```json alrededor, texto antes o después, la respuesta cortada a
+# mitad...) y se perdía toda la generación. Este parser recorre el texto
+# (o los fragmentos de un stream, según van llegando) y entrega cada
+# OBJETO completo que encuentra, a cualquier profundidad, en cuanto se
+# cierra su llave. Cada objeto se intenta leer tal cual y, si falla, tras
+# reparar los defectos habituales:
+#   - comas finales  ([1, 2,]  {"a": 1,})
+#   - comillas tipográficas (“ ” ‘ ’) y comillas simples al estilo Python
+#   - saltos de línea sin escapar dentro de cadenas
+#   - sintaxis de Python (True / False / None)
+#
+#   parser = ParserJSONTolerante(lambda obj: "pregunta" in obj)
+#   for fragmento in stream:
+#       for obj in parser.alimentar(fragmento):
+#           ...
+#
+# Así, de una lista cortada o con un elemento roto se rescatan los
+# elementos buenos.
+# ------------------------------------------------------
+
+import re
+import ast
+import json
+
+_COMILLAS = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+_COMA_FINAL = re.compile(r",\s*([}\]])")
+_LITERALES_JSON = re.compile(r"\b(true|false|null)\b")
+_A_PYTHON = {"true": "True", "false": "False", "null": "None"}
+
+
+def _escapar_saltos_en_cadenas(texto: str) -> str:
+    """Sustituye los saltos de línea literales que quedan dentro de cadenas por \\n."""
+    salida, en_cadena, escape = [], False, False
+    for c in texto:
+        if en_cadena:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                en_cadena = False
+            elif c in "\r\n":
+                salida.append("\\n" if c == "\n" else "")
+                continue
+        elif c == '"':
+            en_cadena = True
+        salida.append(c)
+    return "".join(salida)
+
+
+def cargar_tolerante(texto: str):
+    """json.loads con reparaciones; devuelve None si ni así se puede leer."""
+    try:
+        return json.loads(texto)
+    except ValueError:
+        pass
+
+    reparado = texto.translate(_COMILLAS)
+    reparado = _COMA_FINAL.sub(r"\1", reparado)
+    reparado = _escapar_saltos_en_cadenas(reparado)
+    try:
+        return json.loads(reparado)
+    except ValueError:
+        pass
+
+    # Último recurso: sintaxis de Python (comillas simples, True/None...)
+    for candidato in (reparado, _LITERALES_JSON.sub(lambda m: _A_PYTHON[m.group(1)], reparado)):
+        try:
+            return ast.literal_eval(candidato)
+        except (ValueError, SyntaxError, MemoryError, RecursionError):
+            pass
+    return None
+
+
+class ParserJSONTolerante:
+    """
+    Parser incremental: alimentar() recibe texto nuevo y devuelve los
+    objetos que se han completado con él (y que acepta el filtro).
+    """
+
+    def __init__(self, filtro=None):
+        self.filtro = filtro or (lambda obj: True)
+        self._texto = ""
+        self._pos = 0
+        self._aperturas = []      # posiciones de las "{" aún abiertas
+        self._comilla = None      # comilla de la cadena en curso (o None)
+        self._escape = False
+        self._ultimo_significativo = ""
+        self.descartados = 0      # objetos cerrados que no se pudieron leer
+
+    def alimentar(self, fragmento: str):
+        self._texto += fragmento
+        nuevos = []
+        texto = self._texto
+        for i in range(self._pos, len(texto)):
+            c = texto[i]
+            if self._comilla:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == self._comilla:
+                    self._comilla = None
+                continue
+
+            if c in "\"“":
+                self._comilla = '"' if c == '"' else "”"
+            elif c == "'" and self._ultimo_significativo and self._ultimo_significativo in "{[,:":
+                # Comilla simple solo donde puede empezar una cadena (estilo Python)
+                self._comilla = "'"
+            elif c == "{":
+                self._aperturas.append(i)
+            elif c == "}" and self._aperturas:
+                inicio = self._aperturas.pop()
+                obj = cargar_tolerante(texto[inicio:i + 1])
+                if isinstance(obj, dict):
+                    if self.filtro(obj):
+                        nuevos.append(obj)
+                elif obj is None:
+                    self.descartados += 1
+            if not c.isspace():
+                self._ultimo_significativo = c
+        self._pos = len(texto)
+        return nuevos
+
+
+def extraer_objetos(texto: str, filtro=None):
+    """Todos los objetos legibles del texto (lista cortada o con basura incluida)."""
+    return ParserJSONTolerante(filtro).alimentar(texto or "")
@@ -0,0 +1,101 @@
+# limitador.py
+# ------------------------------------------------------
+# Limitador de peticiones por minuto (cubeta de fichas) compartido entre
+# hilos, para no pasarse de la cuota de Gemini/Groq cuando se lanzan
+# varias llamadas a la vez (p. ej. la generación por secciones).
+#
+#   limitador = limitador_llm()
+#   limitador.adquirir(token)      # espera si no quedan fichas
+#   respuesta = modelo.generate_content(prompt)
+#
+# La cubeta se rellena de forma continua a `por_minuto` fichas por minuto
+# y admite ráfagas de hasta `rafaga` peticiones seguidas.
+#
+# LLM_PETICIONES_MINUTO (por defecto 15) y LLM_RAFAGA (por defecto 8)
+# configuran el limitador compartido; 0 peticiones por minuto lo desactiva.
+# ------------------------------------------------------
+
+import os
+import time
+import threading
+
+from metricas import registrar_medidor
+from trazas import tramo
+
+
+def _entero_env(nombre: str, defecto: int) -> int:
+    try:
+        return int(os.getenv(nombre, str(defecto)))
+    except ValueError:
+        return defecto
+
+
+class LimitadorTasa:
+    def __init__(self, por_minuto: float, rafaga: int = 1):
+        self.por_minuto = por_minuto
+        self.rafaga = max(1, rafaga)
+        self._fichas = float(self.rafaga)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+        # Estadísticas para los benchmarks y metricas.py
+        self.peticiones = 0
+        self.segundos_espera = 0.0
+        self.esperando = 0
+
+    def _rellenar(self, ahora: float):
+        ritmo = self.por_minuto / 60.0
+        self._fichas = min(self.rafaga, self._fichas + (ahora - self._ultimo) * ritmo)
+        self._ultimo = ahora
+
+    def adquirir(self, token=None):
+        """
+        Toma una ficha, esperando lo necesario. Si se pasa un token de
+        cancelación, se comprueba durante la espera (token.verificar()).
+        """
+        if self.por_minuto <= 0:
+            return
+        with self._lock:
+            self.esperando += 1
+        try:
+            with tramo("limitador.esperar"):
+                self._adquirir(token)
+        finally:
+            with self._lock:
+                self.esperando -= 1
+
+    def _adquirir(self, token):
+        inicio = time.monotonic()
+        while True:
+            if token is not None:
+                token.verificar()
+            with self._lock:
+                ahora = time.monotonic()
+                self._rellenar(ahora)
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    self.peticiones += 1
+                    self.segundos_espera += ahora - inicio
+                    return
+                falta = (1 - self._fichas) * 60.0 / self.por_minuto
+            # Esperas cortas para poder salir pronto si se cancela
+            time.sleep(min(falta, 0.2))
+
+
+_compartido = None
+_lock_compartido = threading.Lock()
+
+
+def limitador_llm() -> LimitadorTasa:
+    """Limitador único del proceso para las llamadas a los modelos."""
+    global _compartido
+    with _lock_compartido:
+        if _compartido is None:
+            _compartido = LimitadorTasa(
+                _entero_env("LLM_PETICIONES_MINUTO", 15),
+                _entero_env("LLM_RAFAGA", 8),
+            )
+            limitador = _compartido
+            registrar_medidor("llm_limitador_en_cola", lambda: limitador.esperando)
+            registrar_medidor("llm_limitador_peticiones_total", lambda: limitador.peticiones)
+            registrar_medidor("llm_limitador_espera_segundos_total", lambda: limitador.segundos_espera)
+        return _compartido
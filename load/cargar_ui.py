@@ -0,0 +1,72 @@
+# load/cargar_ui.py
+# ------------------------------------------------------
+# Carga de las interfaces .ui de la carpeta interfaces/.
+#
+# Si existe la versión precompilada (interfaces/compiladas/ui_<nombre>.py,
+# generada con `python compilar_interfaces.py`) y está al día con el .ui,
+# se usa esa clase: evita parsear el XML cada vez que se abre una ventana.
+# Si no existe, está desactualizada o falla, se usa uic.loadUi como siempre.
+#
+# Forzar siempre loadUi: GUI_UI_COMPILADAS=0
+# ------------------------------------------------------
+
+import os
+import logging
+import importlib
+from pathlib import Path
+
+from PyQt5 import uic
+
+logger = logging.getLogger(__name__)
+
+RAIZ = Path(__file__).resolve().parent.parent
+CARPETA_UI = RAIZ / "interfaces"
+CARPETA_COMPILADAS = CARPETA_UI / "compiladas"
+
+
+def _ruta_ui(nombre: str) -> Path:
+    for ruta in (CARPETA_UI / f"{nombre}.ui",
+                 Path("interfaces") / f"{nombre}.ui",
+                 Path(f"{nombre}.ui")):
+        if ruta.exists():
+            return ruta
+    raise FileNotFoundError(f"No se encontró la interfaz {nombre}.ui")
+
+
+def _clase_compilada(nombre: str, ruta_ui: Path):
+    if os.getenv("GUI_UI_COMPILADAS", "1") == "0":
+        return None
+    ruta_py = CARPETA_COMPILADAS / f"ui_{nombre}.py"
+    if not ruta_py.exists():
+        return None
+    if ruta_py.stat().st_mtime < ruta_ui.stat().st_mtime:
+        logger.info("ui_%s.py está desactualizado; se usa loadUi (recompila con compilar_interfaces.py)", nombre)
+        return None
+    try:
+        modulo = importlib.import_module(f"interfaces.compiladas.ui_{nombre}")
+    except Exception as e:
+        logger.warning("No se pudo importar ui_%s.py (%s); se usa loadUi", nombre, e)
+        return None
+    for atributo, valor in vars(modulo).items():
+        if atributo.startswith("Ui_") and isinstance(valor, type):
+            return valor
+    return None
+
+
+def cargar_ui(widget, nombre: str):
+    """
+    Construye la interfaz `nombre` (sin .ui) sobre `widget`.
+    Igual que uic.loadUi, los objetos del .ui quedan como atributos del widget.
+    """
+    ruta_ui = _ruta_ui(nombre)
+    clase = _clase_compilada(nombre, ruta_ui)
+    if clase is None:
+        uic.loadUi(str(ruta_ui), widget)
+        return
+
+    ui = clase()
+    ui.setupUi(widget)
+    # setupUi guarda los widgets en el objeto Ui_*; los pasamos al widget
+    # para que el resto del código los use igual que con loadUi
+    for atributo, valor in vars(ui).items():
+        setattr(widget, atributo, valor)
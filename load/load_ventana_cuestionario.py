@@ -1,32 +1,26 @@
 import os
 import re
-import json
 from dotenv import load_dotenv
 
-from PyQt5 import QtWidgets, uic
+from PyQt5 import QtWidgets
 from PyQt5.QtWidgets import QFileDialog, QMessageBox
 
-from PyPDF2 import PdfReader
+from load.cargar_ui import cargar_ui
+from load.trabajadores import EjecutorTareas
+from metricas import contar
+from trazas import tramo, trazado
 
-import google.generativeai as genai
-from groq import Groq
+# La generación de preguntas vive en cuestionario_ia.py y corre en un hilo
+# de fondo; pypdf, google.generativeai y groq se importan al primer uso.
+# Con el banco de preguntas (banco_preguntas.py) los cuestionarios de un PDF
+# ya conocido se sortean en local, sin llamar al modelo.
 
 
 class Load_ventana_cuestionario(QtWidgets.QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
-        # Intentar cargar el .ui desde las rutas más comunes sin cambiar tu estructura
-        loaded = False
-        for ui_path in ("interfaces/ventana_cuestionario.ui", "ventana_cuestionario.ui"):
-            try:
-                uic.loadUi(ui_path, self)
-                loaded = True
-                break
-            except Exception:
-                continue
-        if not loaded:
-            # Si falla, lanza el error normal para que se vea claro en consola
-            uic.loadUi("ventana_cuestionario.ui", self)
+        # Carga el .ui (precompilado si existe; busca también en las rutas de siempre)
+        cargar_ui(self, "ventana_cuestionario")
 
         # --- Estado interno ---
         self.pdf_path = None
@@ -43,8 +37,24 @@ class Load_ventana_cuestionario(QtWidgets.QDialog):
         self.google_api_key = os.getenv("GOOGLE_API_KEY", "").strip()
         self.groq_api_key = os.getenv("GROQ_API_KEY", "").strip()
 
-        # --- Configurar modelos ---
-        self._configurar_modelos()
+        # --- Modelos: se configuran en segundo plano al generar por primera vez ---
+        self._generador = None
+
+        # --- Generación en segundo plano ---
+        self.ejecutor = EjecutorTareas(max_hilos=2, parent=self)
+        self._tarea_generacion = None   # la que el estudiante está esperando
+        self._precarga = None           # {"pdf", "tarea", "resultado"} del siguiente cuestionario
+        self._texto_de_pdf = None       # PDF del que viene self.source_text
+        self._texto_boton_generar = self.btnGenerarPreguntas.text()
+
+        # --- Banco de preguntas por PDF ---
+        self._banco = None
+        self._ids_preguntas = None      # ids en el banco del cuestionario mostrado
+        self._llenado = None            # {"hash", "tarea"} del llenado en segundo plano
+
+        # --- Calificación: informe local + comentario de la IA opcional ---
+        self._tarea_narrativa = None
+        self._informe_local = ""
 
         # --- Conexiones de botones ---
         self._conectar_signals()
@@ -59,25 +69,24 @@ class Load_ventana_cuestionario(QtWidgets.QDialog):
     # ------------------------------------------------------------------
     # Configuración de modelos IA
     # ------------------------------------------------------------------
-    def _configurar_modelos(self):
-        self.gemini_model = None
-        self.groq_client = None
-
-        if self.google_api_key:
-            try:
-                genai.configure(api_key=self.google_api_key)
-                # Puedes cambiar el modelo si quieres (gemini-1.5-flash, etc.)
-                self.gemini_model = genai.GenerativeModel("gemini-2.0-flash")
-            except Exception as e:
-                print("Error configurando Gemini:", e)
-                self.gemini_model = None
-
-        if self.groq_api_key:
-            try:
-                self.groq_client = Groq(api_key=self.groq_api_key)
-            except Exception as e:
-                print("Error configurando Groq:", e)
-                self.groq_client = None
+    @property
+    def generador(self):
+        if self._generador is None:
+            from cuestionario_ia import GeneradorCuestionario
+            self._generador = GeneradorCuestionario(self.google_api_key, self.groq_api_key)
+        return self._generador
+
+    @property
+    def banco(self):
+        """BancoPreguntas compartido, o None si CUESTIONARIO_BANCO=0."""
+        if self._banco is None:
+            from banco_preguntas import BancoPreguntas, banco_activado
+            self._banco = BancoPreguntas() if banco_activado() else False
+        return self._banco or None
+
+    def _hash_pdf_actual(self) -> str:
+        from banco_preguntas import hash_pdf
+        return hash_pdf(self.pdf_path)
 
     # ------------------------------------------------------------------
     # Conexión de señales
@@ -106,223 +115,219 @@ class Load_ventana_cuestionario(QtWidgets.QDialog):
             "Archivos PDF (*.pdf)"
         )
         if ruta:
+            if ruta != self.pdf_path:
+                self._cancelar_precarga()
+                self._cancelar_llenado()
             self.pdf_path = ruta
             self.lineEditPDF.setText(ruta)
             self.textEstado.clear()
             self.textEstado.append("PDF seleccionado correctamente.")
 
-    def _leer_texto_pdf(self, ruta: str) -> str:
-        """Lee el texto del PDF y limita el tamaño para el prompt."""
-        try:
-            reader = PdfReader(ruta)
-            texto = ""
-            for page in reader.pages:
-                pag_text = page.extract_text() or ""
-                texto += pag_text + "\n"
-                # Limitar tamaño para no saturar el modelo
-                if len(texto) > 16000:
-                    break
-            return texto
-        except Exception as e:
-            self.textEstado.append(f"Error leyendo el PDF: {e}")
-            return ""
-
     # ------------------------------------------------------------------
-    # Generar preguntas usando IA (opción múltiple)
+    # Generar preguntas usando IA (opción múltiple), en segundo plano
+    #   extraer -> prompt -> generar -> validar (cuestionario_ia.py) -> renderizar (aquí)
     # ------------------------------------------------------------------
     def generar_preguntas_desde_pdf(self):
+        # Mientras se genera, el mismo botón sirve para cancelar
+        if self._tarea_generacion is not None:
+            self._cancelar_generacion()
+            return
+
         if not self.pdf_path:
             QMessageBox.warning(self, "Sin PDF", "Primero selecciona un archivo PDF.")
             return
 
         self.textEstado.clear()
-        self.textEstado.append("Leyendo PDF...")
-        self.source_text = self._leer_texto_pdf(self.pdf_path)
+        self.progressGeneracion.setValue(0)
 
-        if not self.source_text.strip():
-            self.textEstado.append("No se pudo extraer texto del PDF.")
+        # ¿El banco ya tiene preguntas de este PDF? Se sortean en local
+        if self.banco and self._servir_desde_banco():
             return
 
-        self.textEstado.append(
-            "Generando 5 preguntas de opción múltiple (4 opciones) con Gemini "
-            "(si falla, se usará Groq)..."
-        )
+        # ¿Ya hay un cuestionario de este PDF preparado (o preparándose)?
+        precarga = self._precarga
+        if precarga and precarga["pdf"] == self.pdf_path:
+            self._precarga = None
+            if precarga["resultado"]:
+                self.textEstado.append("Usando el cuestionario preparado en segundo plano.")
+                self._renderizar_cuestionario(precarga["resultado"])
+                return
+            # Aún en marcha: se adopta en lugar de empezar de cero
+            self.textEstado.append("Terminando el cuestionario que se preparaba en segundo plano...")
+            self._empezar_generacion(precarga["tarea"])
+            self.progressGeneracion.setRange(0, 0)  # sin porcentaje hasta el próximo aviso
+            return
 
-        preguntas_mc = self._generar_preguntas(self.source_text)
+        self._cancelar_precarga()
+        self._empezar_generacion(self._lanzar_generacion(precarga=False))
 
-        if not preguntas_mc or len(preguntas_mc) != 5:
-            self.textEstado.append("No se pudieron generar 5 preguntas de opción múltiple válidas.")
-            return
+    def _lanzar_generacion(self, precarga: bool):
+        from cuestionario_ia import generar_cuestionario
 
-        self.preguntas_mc = preguntas_mc
-        self.preguntas = []
-        self.respuestas_correctas = []
+        # El texto ya extraído del mismo PDF se reutiliza (la precarga no relee el PDF)
+        texto = self.source_text if self._texto_de_pdf == self.pdf_path else None
+        evitar = [item.get("pregunta", "") for item in self.preguntas_mc] if precarga else None
 
-        # Convertir a texto para mostrar en los QLabel y guardar correctas
-        for item in self.preguntas_mc:
-            pregunta = item.get("pregunta", "").strip()
-            opciones = item.get("opciones", [])
-            correcta = item.get("correcta", "").strip().upper()[:1]
-
-            # Asegurarnos de que haya 4 opciones
-            while len(opciones) < 4:
-                opciones.append("Opción faltante")
-            opciones = opciones[:4]
-
-            texto_label = (
-                f"{pregunta}\n"
-                f"A) {opciones[0]}\n"
-                f"B) {opciones[1]}\n"
-                f"C) {opciones[2]}\n"
-                f"D) {opciones[3]}"
+        tarea = self.ejecutor.lanzar(
+            generar_cuestionario, self.pdf_path, self.generador, texto=texto, evitar=evitar,
+            al_progreso=lambda etapa, pct, msg: self._on_progreso_generacion(tarea, pct, msg),
+            al_terminar=lambda resultado: self._on_cuestionario_generado(tarea, resultado),
+            al_error=lambda msg: self._on_generacion_error(tarea, msg),
+            # La generación que el estudiante está esperando va antes que la precarga
+            prioridad=0 if precarga else 1,
+        )
+        return tarea
+
+    def _empezar_generacion(self, tarea):
+        self._tarea_generacion = tarea
+        self.btnGenerarPreguntas.setText("Cancelar")
+
+    def _terminar_generacion(self):
+        self._tarea_generacion = None
+        self.btnGenerarPreguntas.setText(self._texto_boton_generar)
+        self.progressGeneracion.setRange(0, 100)
+
+    def _cancelar_generacion(self):
+        # La ventana queda libre al momento; el hilo sale en la siguiente etapa
+        self._tarea_generacion.token.cancelar()
+        self._terminar_generacion()
+        self.progressGeneracion.setValue(0)
+        self.textEstado.append("⛔ Generación cancelada.")
+
+    def _on_progreso_generacion(self, tarea, porcentaje, mensaje):
+        if tarea is not self._tarea_generacion:
+            return  # precarga: trabaja en silencio
+        if porcentaje is not None:
+            self.progressGeneracion.setRange(0, 100)
+            self.progressGeneracion.setValue(porcentaje)
+        if mensaje:
+            self.textEstado.append(mensaje)
+
+    def _on_cuestionario_generado(self, tarea, resultado):
+        if tarea is self._tarea_generacion:
+            self._terminar_generacion()
+            self._renderizar_cuestionario(resultado)
+        elif self._precarga and self._precarga["tarea"] is tarea:
+            self._precarga["resultado"] = resultado
+
+    def _on_generacion_error(self, tarea, msg):
+        if tarea is self._tarea_generacion:
+            self._terminar_generacion()
+            self.progressGeneracion.setValue(0)
+            # Solo el mensaje; el traceback no aporta nada en la UI
+            self.textEstado.append(msg.split("\n\n")[0])
+        elif self._precarga and self._precarga["tarea"] is tarea:
+            # Si la precarga falla, el próximo clic genera como siempre
+            self._precarga = None
+
+    @trazado("gui.renderizar_cuestionario")
+    def _renderizar_cuestionario(self, resultado):
+        self.source_text = resultado["texto"]
+        self._texto_de_pdf = resultado["pdf"]
+        self.preguntas_mc = resultado["preguntas_mc"]
+        self.preguntas = list(resultado["preguntas"])
+        self.respuestas_correctas = [(c or "").strip().upper()[:1] for c in resultado["respuestas_correctas"]]
+        self._ids_preguntas = resultado.get("ids")
+
+        # Lo generado por el modelo también entra al banco
+        if self.banco and self._ids_preguntas is None and resultado["pdf"] == self.pdf_path:
+            pdf_hash = self._hash_pdf_actual()
+            self.banco.registrar_pdf(pdf_hash, os.path.basename(self.pdf_path), self.source_text)
+            self._ids_preguntas, _ = self.banco.agregar_preguntas(
+                pdf_hash, self.preguntas_mc, resultado.get("origen")
             )
+            # Ya las vio: que el próximo sorteo empiece por otras
+            self.banco.registrar_servido(pdf_hash, self._ids_preguntas)
 
-            self.preguntas.append(texto_label)
-            self.respuestas_correctas.append(correcta if correcta in ("A", "B", "C", "D") else "")
-
+        self.progressGeneracion.setValue(100)
         self._mostrar_preguntas_en_ui()
         self.textEstado.append("Preguntas de opción múltiple generadas correctamente.")
+        cobertura = resultado.get("cobertura")
+        if cobertura and cobertura["secciones"] > 1:
+            self.textEstado.append(
+                f"🗺️ Cobertura: las preguntas salen de {cobertura['fraccion_en_cuestionario']:.0%} "
+                f"del documento ({cobertura['secciones_en_cuestionario']} de "
+                f"{cobertura['secciones']} secciones)."
+            )
         self.stackedWidget.setCurrentIndex(1)  # Pasar a pestaña de evaluación
 
-    def _generar_preguntas(self, texto: str):
-        texto_corto = texto[:6000]  # recorte para prompt
-
-        prompt = f"""
-Eres un profesor de Inteligencia Artificial.
-
-A partir del siguiente contenido, genera EXACTAMENTE 5 preguntas de evaluación
-de OPCIÓN MÚLTIPLE en español, de nivel intermedio-avanzado (tipo universitario).
-
-Cada pregunta debe tener:
-- Un enunciado claro sobre el tema.
-- EXACTAMENTE 4 opciones de respuesta (A, B, C, D).
-- Indicar cuál opción es la correcta.
-
-DEVUELVE la salida EXCLUSIVAMENTE como un JSON VÁLIDO con esta estructura:
-
-[
-  {{
-    "pregunta": "texto de la pregunta 1",
-    "opciones": ["opción A", "opción B", "opción C", "opción D"],
-    "correcta": "A"
-  }},
-  {{
-    "pregunta": "texto de la pregunta 2",
-    "opciones": ["opción A", "opción B", "opción C", "opción D"],
-    "correcta": "C"
-  }},
-  ...
-]
-
-Requisitos:
-- Deben ser exactamente 5 elementos en la lista.
-- No agregues texto antes ni después del JSON.
-- No uses comentarios ni explicaciones.
-
-TEXTO BASE:
-\"\"\"{texto_corto}\"\"\"
-"""
-
-        # 1) Intentar con Gemini
-        preguntas = self._generar_preguntas_con_gemini(prompt)
-        if preguntas and len(preguntas) == 5:
-            self.textEstado.append("Preguntas generadas con Gemini.")
-            return preguntas
-
-        # 2) Fallback con Groq
-        preguntas = self._generar_preguntas_con_groq(prompt)
-        if preguntas and len(preguntas) == 5:
-            self.textEstado.append("Preguntas generadas con Groq.")
-            return preguntas
-
-        return None
-
-    def _parsear_preguntas_mc_de_texto(self, texto: str):
-        """
-        Intenta interpretar el texto devuelto por el modelo como JSON
-        con la estructura de opción múltiple.
-        """
-        texto = texto.strip()
-        # En algunos casos, el modelo puede envolver el JSON en ```json ... ```
-        texto = re.sub(r"^```json", "", texto, flags=re.IGNORECASE).strip()
-        texto = re.sub(r"```$", "", texto).strip()
+        # Mientras el estudiante responde, se prepara el siguiente cuestionario
+        self._precargar_siguiente()
+
+    # ---------------- Banco de preguntas ----------------
+    def _servir_desde_banco(self) -> bool:
+        from cuestionario_ia import armar_cuestionario
+
+        pdf_hash = self._hash_pdf_actual()
+        preguntas_mc, ids = self.banco.sortear(pdf_hash)
+        contar("cache_consultas_total", cache="banco", resultado="acierto" if preguntas_mc else "fallo")
+        if not preguntas_mc:
+            return False
+
+        self._cancelar_precarga()
+        texto = self.banco.texto(pdf_hash)
+        resultado = armar_cuestionario(self.pdf_path, texto, preguntas_mc, "banco")
+        resultado["ids"] = ids
+        total = self.banco.contar(pdf_hash)
+        self.textEstado.append(f"📚 Cuestionario sorteado del banco de preguntas ({total} preguntas de este PDF).")
+        self._renderizar_cuestionario(resultado)
+        return True
+
+    def _llenar_banco_en_segundo_plano(self):
+        """Completa el banco del PDF actual (BANCO_OBJETIVO preguntas) sin bloquear nada."""
+        from banco_preguntas import llenar_banco, objetivo_banco
+
+        pdf_hash = self._hash_pdf_actual()
+        if self._llenado and self._llenado["hash"] == pdf_hash:
+            return  # ya se está llenando
+        if self.banco.contar(pdf_hash) >= objetivo_banco():
+            return
 
-        try:
-            data = json.loads(texto)
-        except Exception as e:
-            self.textEstado.append(f"No se pudo parsear el JSON de preguntas: {e}")
-            return None
-
-        if not isinstance(data, list):
-            self.textEstado.append("El JSON de preguntas no es una lista.")
-            return None
-
-        preguntas_validas = []
-        for item in data:
-            if not isinstance(item, dict):
-                continue
-            pregunta = item.get("pregunta")
-            opciones = item.get("opciones")
-            correcta = item.get("correcta")
-
-            if not pregunta or not isinstance(opciones, list) or len(opciones) < 2:
-                continue
-            if not isinstance(correcta, str) or correcta.upper()[:1] not in ("A", "B", "C", "D"):
-                # Aún si no viene la correcta, podemos seguir, pero marcamos cadena vacía
-                correcta = ""
-
-            preguntas_validas.append(
-                {
-                    "pregunta": str(pregunta),
-                    "opciones": [str(o) for o in opciones],
-                    "correcta": correcta.upper()[:1],
-                }
-            )
+        self._cancelar_llenado()
+        texto = self.source_text if self._texto_de_pdf == self.pdf_path else None
 
-        if len(preguntas_validas) < 5:
-            self.textEstado.append(
-                f"Solo se obtuvieron {len(preguntas_validas)} preguntas válidas en el JSON."
-            )
-            return None
+        def terminado(total):
+            if self._llenado and self._llenado["tarea"] is tarea:
+                self._llenado = None
+                self.textEstado.append(f"📚 Banco de preguntas listo: {total} preguntas para este PDF.")
 
-        # Nos quedamos con las primeras 5
-        return preguntas_validas[:5]
+        def fallo(msg):
+            if self._llenado and self._llenado["tarea"] is tarea:
+                self._llenado = None
+                self.textEstado.append("No se pudo completar el banco de preguntas: " + msg.split("\n\n")[0])
 
-    def _generar_preguntas_con_gemini(self, prompt: str):
-        if not self.gemini_model:
-            return None
-        try:
-            resp = self.gemini_model.generate_content(prompt)
-            texto_resp = (resp.text or "").strip()
-            if not texto_resp:
-                return None
-            return self._parsear_preguntas_mc_de_texto(texto_resp)
-        except Exception as e:
-            self.textEstado.append(f"Error con Gemini: {e}")
-            return None
-
-    def _generar_preguntas_con_groq(self, prompt: str):
-        if not self.groq_client:
-            return None
-        try:
-            resp = self.groq_client.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Eres un profesor de IA que genera preguntas de examen de opción múltiple en español.",
-                    },
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0.7,
-            )
-            texto_resp = resp.choices[0].message.content.strip()
-            if not texto_resp:
-                return None
-            return self._parsear_preguntas_mc_de_texto(texto_resp)
-        except Exception as e:
-            self.textEstado.append(f"Error con Groq: {e}")
-            return None
+        tarea = self.ejecutor.lanzar(
+            llenar_banco, self.banco, self.pdf_path, self.generador,
+            pdf_hash=pdf_hash, texto=texto,
+            al_progreso=lambda *_: None,  # para recibir el token de cancelación
+            al_terminar=terminado, al_error=fallo, prioridad=0,
+        )
+        self._llenado = {"hash": pdf_hash, "tarea": tarea}
+
+    def _cancelar_llenado(self):
+        if self._llenado:
+            self._llenado["tarea"].token.cancelar()
+        self._llenado = None
+
+    # ---------------- Precarga del siguiente cuestionario ----------------
+    def _precargar_siguiente(self):
+        # Con banco, en lugar de un solo cuestionario se prepara el banco entero
+        if self.banco:
+            self._llenar_banco_en_segundo_plano()
+            return
+        if os.getenv("CUESTIONARIO_PRECARGA", "1").strip() == "0":
+            return
+        self._cancelar_precarga()
+        self._precarga = {
+            "pdf": self.pdf_path,
+            "tarea": self._lanzar_generacion(precarga=True),
+            "resultado": None,
+        }
+
+    def _cancelar_precarga(self):
+        if self._precarga and self._precarga["resultado"] is None:
+            self._precarga["tarea"].token.cancelar()
+        self._precarga = None
 
     def _mostrar_preguntas_en_ui(self):
         labels = [
@@ -336,8 +341,10 @@ TEXTO BASE:
             labels[i].setText(self.preguntas[i])
 
     # ------------------------------------------------------------------
-    # Calificación con IA (usando opción múltiple)
+    # Calificación (opción múltiple): puntaje e informe en local,
+    # comentario de la IA opcional en segundo plano (retroalimentacion.py)
     # ------------------------------------------------------------------
+    @trazado("calificar")
     def calificar_respuestas(self):
         if not self.preguntas or len(self.preguntas) != 5:
             QMessageBox.warning(self, "Sin preguntas", "Primero genera las preguntas con IA.")
@@ -359,27 +366,21 @@ TEXTO BASE:
 
         # 🔹 Calculamos el puntaje SOLO en función de cuántas letras correctas coincidieron
         score = self._calcular_puntaje(respuestas)
+        letras = [self._letra_respuesta(r) for r in respuestas]
+
+        # Estadísticas del banco: qué letra eligió el estudiante en cada pregunta
+        if self.banco and self._ids_preguntas:
+            self.banco.registrar_respuestas(
+                self._ids_preguntas,
+                letras,
+                [item.get("opciones", []) for item in self.preguntas_mc],
+            )
 
-        texto_corto = (self.source_text or "")[:8000]
-        prompt = self._construir_prompt_calificacion(texto_corto, self.preguntas, respuestas)
-
-        self.textEstado.append("Calificando respuestas con Gemini (si falla, Groq)...")
-
-        # 1) Intentar con Gemini
-        feedback = self._calificar_con_gemini(prompt)
-        origen = "Gemini"
-
-        if not feedback:
-            # 2) Fallback Groq
-            feedback = self._calificar_con_groq(prompt)
-            origen = "Groq"
-
-        if not feedback:
-            QMessageBox.warning(self, "Error", "No se pudo obtener calificación de la IA.")
-            return
-
-        self.textEstado.append(f"Calificación generada con {origen}.")
-        self.textFeedback.setPlainText(feedback)
+        # Informe al instante con las explicaciones por opción (sin llamar al modelo)
+        from retroalimentacion import informe_local, narrativa_activada
+        with tramo("calificar.informe_local"):
+            self._informe_local = informe_local(self.preguntas_mc, letras, score)
+        self.textFeedback.setPlainText(self._informe_local)
 
         # 🔹 Usamos SIEMPRE nuestro score (0,20,40,60,80,100)
         self.progressPuntaje.setValue(score)
@@ -388,6 +389,40 @@ TEXTO BASE:
         # Ir a pestaña de resultados
         self.stackedWidget.setCurrentIndex(2)
 
+        # El comentario del profesor (IA) llega después, si está activado
+        if narrativa_activada() and (self.google_api_key or self.groq_api_key):
+            self._pedir_narrativa(letras)
+
+    def _pedir_narrativa(self, letras):
+        from retroalimentacion import generar_narrativa
+
+        # Solo cuenta la última calificación
+        if self._tarea_narrativa is not None:
+            self._tarea_narrativa.token.cancelar()
+
+        def terminado(resultado):
+            if tarea is self._tarea_narrativa:
+                self._tarea_narrativa = None
+                texto, origen = resultado
+                self.textFeedback.setPlainText(
+                    f"{self._informe_local}\n\n🧑‍🏫 Comentario del profesor ({origen}):\n{texto}"
+                )
+                self.textEstado.append(f"Comentario de la calificación generado con {origen}.")
+
+        def fallo(msg):
+            if tarea is self._tarea_narrativa:
+                self._tarea_narrativa = None
+                self.textFeedback.setPlainText(self._informe_local)
+                self.textEstado.append(msg.split("\n\n")[0])
+
+        self.textFeedback.append("\n⏳ Preparando el comentario del profesor (IA)...")
+        tarea = self.ejecutor.lanzar(
+            generar_narrativa, self.generador, self.source_text, self.preguntas_mc, letras,
+            al_progreso=lambda *_: None,  # para recibir el token de cancelación
+            al_terminar=terminado, al_error=fallo, prioridad=1,
+        )
+        self._tarea_narrativa = tarea
+
     def _calcular_puntaje(self, respuestas):
         """
         Calcula el puntaje con base en respuestas_correctas y las respuestas del estudiante.
@@ -395,106 +430,17 @@ TEXTO BASE:
         - 1 correcta  -> 20
         - ...
         - 5 correctas -> 100
+        La regla es retroalimentacion.puntaje, la misma que usa calificador_lote.py
+        (respuestas_correctas ya viene normalizada a una letra al recibir el cuestionario).
         """
-        correctas = 0
-        num_preguntas = min(5, len(respuestas), len(self.respuestas_correctas))
-
-        for i in range(num_preguntas):
-            correcta = (self.respuestas_correctas[i] or "").strip().upper()[:1]
-            if correcta not in ("A", "B", "C", "D"):
-                continue
-
-            resp_texto = respuestas[i].strip().upper()
-            # Buscar la primera letra A-D que aparezca en la respuesta
-            m = re.search(r"[ABCD]", resp_texto)
-            if not m:
-                continue
-
-            respuesta_letra = m.group(0)
-            if respuesta_letra == correcta:
-                correctas += 1
-
-        # Cada pregunta vale 20 puntos
-        return correctas * 20
-
-    def _construir_prompt_calificacion(self, texto_tema, preguntas, respuestas):
-        """
-        Construye el prompt para que la IA dé retroalimentación de un cuestionario
-        de opción múltiple. El puntaje numérico lo calculamos nosotros aparte.
-        """
-        bloque_pyr = []
-        for i in range(5):
-            pregunta_texto = preguntas[i]
-            resp_estudiante = respuestas[i] or "(sin respuesta)"
-            correcta = ""
-            if i < len(self.respuestas_correctas):
-                correcta = self.respuestas_correctas[i] or ""
-            bloque_pyr.append(
-                f"Pregunta {i+1}:\n"
-                f"{pregunta_texto}\n"
-                f"Opción correcta (según el examen): {correcta if correcta else '(no especificada)'}\n"
-                f"Respuesta del estudiante: {resp_estudiante}"
-            )
-        bloque_pyr = "\n\n".join(bloque_pyr)
-
-        prompt = f"""
-Eres un profesor universitario de Inteligencia Artificial.
-
-Tienes el siguiente TEXTO BASE (resumen del contenido del PDF):
-
-\"\"\"{texto_tema}\"\"\"
-
-Debes evaluar las siguientes respuestas del estudiante a 5 preguntas de OPCIÓN MÚLTIPLE.
-Cada pregunta incluye sus 4 opciones (A, B, C, D). Para cada una se indica, cuando está disponible,
-cuál es la opción correcta según el examen, y también la respuesta del estudiante
-(que será una letra A, B, C o D, y en algunos casos una pequeña explicación).
-
-Información de las preguntas y respuestas:
-
-{bloque_pyr}
-
-Instrucciones de evaluación:
-- Indica para cada pregunta si la respuesta del estudiante es correcta o incorrecta y explica brevemente por qué.
-- Explica brevemente qué tan bien comprendió el tema en general.
-- Da una conclusión final.
-
-IMPORTANTE:
-- NO des un puntaje numérico global (no escribas 'Puntaje: X/100').
-- Solo ofrece retroalimentación cualitativa por pregunta y una breve conclusión.
-
-No incluyas nada fuera de este formato.
-"""
-        return prompt
-
-    def _calificar_con_gemini(self, prompt: str):
-        if not self.gemini_model:
-            return None
-        try:
-            resp = self.gemini_model.generate_content(prompt)
-            return (resp.text or "").strip()
-        except Exception as e:
-            self.textEstado.append(f"Error al calificar con Gemini: {e}")
-            return None
-
-    def _calificar_con_groq(self, prompt: str):
-        if not self.groq_client:
-            return None
-        try:
-            resp = self.groq_client.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Eres un profesor de IA que evalúa respuestas de estudiantes en español.",
-                    },
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0.3,
-            )
-            return resp.choices[0].message.content.strip()
-        except Exception as e:
-            self.textEstado.append(f"Error al calificar con Groq: {e}")
-            return None
+        from retroalimentacion import puntaje
+        return puntaje([self._letra_respuesta(r) for r in respuestas], self.respuestas_correctas)
+
+    @staticmethod
+    def _letra_respuesta(texto: str) -> str:
+        """Primera letra A-D que aparezca en la respuesta ("" si no hay)."""
+        from retroalimentacion import letra_respuesta
+        return letra_respuesta(texto)
 
     def _extraer_puntaje(self, texto: str) -> int:
         """
@@ -6,21 +6,49 @@
 # 4,5: texto → texto simple (usando funciones del script).
 # 6 y 7: chat interactivo con memoria (6: memoria en GUI, 7: memoria en el script).
 # 8: RAG con PDF seleccionable.
+#
+# Todas las acciones pasan por un PlanificadorTareas (load/planificador.py):
+# ejercicios distintos corren en paralelo, las del mismo ejercicio en cola,
+# y el panel "Tareas" permite ver y cancelar lo que está en marcha.
 # ------------------------------------------------------
 
 import os
 import sys
 import traceback
 import subprocess
+import contextvars
 from pathlib import Path
 import importlib.util
 
-from PyQt5 import uic, QtCore
+from PyQt5 import QtCore
 from PyQt5.QtCore import QThread, pyqtSignal
 from PyQt5.QtWidgets import (
     QDialog, QListWidget, QTextEdit, QLabel, QWidget,
     QVBoxLayout, QPushButton, QMessageBox, QLineEdit, QSplitter,
-    QComboBox, QFileDialog
+    QComboBox, QFileDialog, QTableWidget, QTableWidgetItem, QHeaderView, QCheckBox
+)
+
+from load.cargar_ui import cargar_ui
+from load.vista_salida import vista_de
+from load.trabajadores import TokenCancelacion
+from perfilado import perfilado_activado, perfilar
+import grabadora_llm
+from metricas import registrar_medidor
+from monitor_ram import atribuir, medida_profunda, registrar_subsistema, quitar_subsistema, tamano_aprox
+from trazas import env_con_traza, tramo
+from load.planificador import (
+    PlanificadorTareas, PRIORIDAD_LOTE, PRIORIDAD_NORMAL, PRIORIDAD_INTERACTIVA,
+)
+
+# Widgets de cada panel de ejercicio que la ventana referencia como atributos.
+# Al cambiar de ejercicio se guardan junto al panel y se restauran al volver.
+ATRIBUTOS_PANEL = (
+    "btn_play", "txt_output",
+    "inp_tema", "inp_template", "btn_run_tema",
+    "txt_input", "btn_run_chain",
+    "inp_chat", "btn_chat_send", "btn_chat_reset",
+    "btn_resumir", "btn_traducir", "cmb_idioma", "txt_resumen", "txt_traduccion",
+    "txt_pdf_path", "btn_select_pdf", "pdf_path_8",
 )
 
 
@@ -40,6 +68,12 @@ class QLabelBig(QLabel):
 
 # ---------------- Runner (ejecuta scripts en subproceso) ----------------
 class ScriptRunner(QThread):
+    """
+    Ejecuta un script de ejercicio. Por defecto lo manda a un proceso
+    trabajador ya caliente (trabajador_scripts.py: LangChain y Gemini ya
+    importados); con SCRIPTS_POOL=0, o si el pool no arranca, lanza un
+    subproceso nuevo como antes.
+    """
     line = pyqtSignal(str)
     finished_ok = pyqtSignal(int)
     finished_err = pyqtSignal(str)
@@ -49,30 +83,72 @@ class ScriptRunner(QThread):
         self.script_path = script_path
         self.workdir = workdir
         self.env = env
+        self._matar = None
+        self._cancelado = False
+        # Contexto de trazas de quien crea el runner (el QThread no lo hereda)
+        self._contexto = contextvars.copy_context()
+
+    def cancelar(self):
+        """Mata el proceso que ejecuta el script; run() termina en cuanto se cierra su salida."""
+        self._cancelado = True
+        if self._matar is not None:
+            self._matar()
+
+    def _al_iniciar(self, matar):
+        self._matar = matar
+        if self._cancelado:  # cancelado justo mientras arrancaba
+            matar()
+
+    def _ejecutar_en_pool(self, env):
+        from trabajador_scripts import obtener_pool
+        return obtener_pool().ejecutar(
+            self.script_path, env, self.workdir,
+            al_linea=self.line.emit, al_iniciar=self._al_iniciar,
+        )
+
+    def _ejecutar_en_subproceso(self, env):
+        comando = [sys.executable, str(self.script_path)]
+        if grabadora_llm.modo():
+            # El script se lanza a través de la grabadora para que la instale antes
+            comando = [sys.executable, grabadora_llm.__file__, "ejecutar", str(self.script_path)]
+        proc = subprocess.Popen(
+            comando,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            cwd=str(self.workdir),
+            env=env,
+            bufsize=1
+        )
+        self._al_iniciar(proc.kill)
+
+        assert proc.stdout is not None
+        for line in proc.stdout:
+            self.line.emit(line.rstrip("\n"))
+
+        assert proc.stderr is not None
+        stderr_txt = proc.stderr.read().strip()
+        return proc.wait(), stderr_txt
 
     def run(self):
+        self._contexto.run(self._run)
+
+    def _run(self):
         try:
             if not self.script_path.exists():
                 self.finished_err.emit(f"Archivo no encontrado:\n{self.script_path}")
                 return
 
-            proc = subprocess.Popen(
-                [sys.executable, str(self.script_path)],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                cwd=str(self.workdir),
-                env=self.env,
-                bufsize=1
-            )
-
-            assert proc.stdout is not None
-            for line in proc.stdout:
-                self.line.emit(line.rstrip("\n"))
-
-            assert proc.stderr is not None
-            stderr_txt = proc.stderr.read().strip()
-            code = proc.wait()
+            from trabajador_scripts import pool_activado
+            en_pool = pool_activado()
+            with tramo("tarea.script", script=self.script_path.name, pool=en_pool) as t:
+                # El proceso que ejecuta el script cuelga sus tramos de este
+                env = env_con_traza(self.env)
+                if en_pool:
+                    code, stderr_txt = self._ejecutar_en_pool(env)
+                else:
+                    code, stderr_txt = self._ejecutar_en_subproceso(env)
+                t.atributos["codigo"] = code
 
             if code == 0:
                 if stderr_txt:
@@ -98,10 +174,30 @@ class FunctionRunner(QThread):
         self.fn = fn
         self.args = args
         self.kwargs = kwargs
+        self.token = TokenCancelacion()
+        self._contexto = contextvars.copy_context()
+
+    def cancelar(self):
+        # Una llamada de Python no se puede interrumpir: se descarta su resultado
+        self.token.cancelar()
 
     def run(self):
+        self._contexto.run(self._run)
+
+    def _run(self):
         try:
-            result = self.fn(*self.args, **self.kwargs)
+            nombre = getattr(self.fn, "__qualname__", repr(self.fn))
+            rutas_perfil = None
+            with tramo("tarea.funcion", funcion=nombre), atribuir(f"tarea.{nombre}"):
+                if perfilado_activado():
+                    modulo = getattr(self.fn, "__module__", "") or ""
+                    result, rutas_perfil = perfilar(f"{modulo}.{nombre}".strip("."), self.fn,
+                                                    *self.args, **self.kwargs)
+                else:
+                    result = self.fn(*self.args, **self.kwargs)
+            if self.token.cancelado:
+                self.finished_err.emit("Cancelada")
+                return
 
             # Soportar listas/tuplas como varias salidas
             if isinstance(result, (list, tuple)):
@@ -112,6 +208,8 @@ class FunctionRunner(QThread):
             if not text.strip():
                 text = "[Sin salida]"
 
+            if rutas_perfil:
+                text += "\n\n🔬 Perfil guardado: " + rutas_perfil.get("pstats", rutas_perfil["memoria"])
             self.line.emit(text)
             self.finished_ok.emit(0)
         except Exception as e:
@@ -120,9 +218,12 @@ class FunctionRunner(QThread):
 
 # ================== Ventana principal ==================
 class Load_ventana_langchain(QDialog):
+    # monitor_ram.py libera desde su hilo; el caché de módulos se toca solo en el de la GUI
+    expulsar_modulo = pyqtSignal(str, object)
+
     def __init__(self):
         super().__init__()
-        uic.loadUi("interfaces/ventana_langchain.ui", self)
+        cargar_ui(self, "ventana_langchain")
 
         # Ventana max, sin botón de ayuda
         self.setWindowFlag(QtCore.Qt.WindowContextHelpButtonHint, False)
@@ -162,71 +263,151 @@ class Load_ventana_langchain(QDialog):
         for n, _ in self.items:
             self.list.addItem(n)
 
-        self.list.currentRowChanged.connect(self._on_select)
-        self._on_select(0)
-
-        # Estado de ejecución
-        self.runner = None
-        self.btn_play = None
-        self.txt_output = None
+        # Widgets del panel activo (ver ATRIBUTOS_PANEL); _clear_panel los pone a None
+        for nombre in ATRIBUTOS_PANEL:
+            setattr(self, nombre, None)
 
-        # Campos del ejercicio 1
-        self.inp_tema = None
-        self.inp_template = None
-        self.btn_run_tema = None
-
-        # Campos genéricos de paneles de texto
-        self.txt_input = None
-        self.btn_run_chain = None
-
-        # Campos para paneles de chat (6 y 7)
-        self.inp_chat = None
-        self.btn_chat_send = None
-        self.btn_chat_reset = None
-
-        # Panel resumen/traducción (2 y 3)
-        self.btn_resumir = None
-        self.btn_traducir = None
-        self.cmb_idioma = None
-        self.txt_resumen = None
-        self.txt_traduccion = None
-
-        # Panel RAG (8)
-        self.txt_pdf_path = None
-        self.btn_select_pdf = None
-        self.pdf_path_8 = None
+        # Paneles ya construidos: nombre -> (widget, {atributo: valor})
+        self._paneles = {}
 
         # Cache de módulos cargados dinámicamente
         self.modules_cache = {}
+        self.expulsar_modulo.connect(self._expulsar_modulo_del_cache, QtCore.Qt.QueuedConnection)
 
         # Estado de memoria para el ejercicio 6 (en GUI)
         self._mem6 = None
+        registrar_subsistema(
+            "historial.6_memoria (GUI)",
+            lambda: tamano_aprox(self._mem6.memory.chat_memory.messages) if self._mem6 else 0,
+        )
+        registrar_medidor("sesiones_activas", lambda: int(self._mem6 is not None),
+                          ejercicio="6_memoria (GUI)")
+
+        # Planificador: pool acotado, una cola por ejercicio y prioridades
+        self.planificador = PlanificadorTareas(
+            max_concurrentes=int(os.getenv("LANGCHAIN_MAX_TAREAS", "3")), parent=self
+        )
+        self.planificador.cambios.connect(self._refrescar_monitor)
+
+        # Monitor de tareas (del .ui)
+        self.tablaTareas: QTableWidget = self.findChild(QTableWidget, "tablaTareas")
+        self.btnCancelarTarea: QPushButton = self.findChild(QPushButton, "btnCancelarTarea")
+        self.tablaTareas.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.btnCancelarTarea.clicked.connect(self._cancelar_tarea_seleccionada)
+        # Perfilado (perfilado.py): cada FunctionRunner con cProfile + tracemalloc
+        self.chkPerfilar: QCheckBox = self.findChild(QCheckBox, "chkPerfilar")
+        self.chkPerfilar.setChecked(perfilado_activado())
+        self.chkPerfilar.toggled.connect(self._cambiar_perfilado)
+        self._filas_monitor = []
+        # Mientras haya tareas activas se refresca la columna de tiempo
+        self._timer_monitor = QtCore.QTimer(self)
+        self._timer_monitor.setInterval(500)
+        self._timer_monitor.timeout.connect(self._refrescar_monitor)
+
+        self.list.currentRowChanged.connect(self._on_select)
+        self._on_select(0)
+
+        # Los procesos trabajadores empiezan a importar LangChain ya, así el
+        # primer "Ejecutar" no paga el arranque en frío
+        QtCore.QTimer.singleShot(0, self._iniciar_pool_scripts)
+
+    def _cambiar_perfilado(self, activo: bool):
+        from perfilado import activar
+        activar(activo)
+        if activo:
+            carpeta = os.path.abspath(os.getenv("PERFILES_DIR", "perfiles"))
+            QMessageBox.information(
+                self, "Perfilado",
+                "Las próximas tareas se perfilarán con cProfile y tracemalloc.\n"
+                f"Los perfiles (.pstats, .collapsed, .memoria.txt) se guardan en:\n{carpeta}"
+            )
+
+    def _iniciar_pool_scripts(self):
+        from trabajador_scripts import obtener_pool, pool_activado
+        if pool_activado():
+            obtener_pool().iniciar()
 
     # ------------ util ------------
     def _clear_panel(self):
+        # El panel no se destruye: queda en self._paneles (oculto) para que las
+        # tareas en segundo plano sigan escribiendo en él.
         while self.panelLayout.count():
             it = self.panelLayout.takeAt(0)
             w = it.widget()
             if w:
-                w.setParent(None)
+                w.hide()
 
         # Reset referencias de widgets dinámicos
-        self.txt_output = None
-        self.txt_input = None
-        self.btn_run_chain = None
-        self.inp_chat = None
-        self.btn_chat_send = None
-        self.btn_chat_reset = None
-
-        self.btn_resumir = None
-        self.btn_traducir = None
-        self.cmb_idioma = None
-        self.txt_resumen = None
-        self.txt_traduccion = None
+        for nombre in ATRIBUTOS_PANEL:
+            setattr(self, nombre, None)
+
+    def _lanzar(self, script_name: str, descripcion: str, runner, prioridad: int,
+                salida: QTextEdit, boton: QPushButton = None, al_linea=None,
+                texto_ok: str = "\n[OK] Ejecución terminada."):
+        """
+        Encola una tarea del ejercicio. Los callbacks usan los widgets del panel
+        que la lanzó (no self.txt_output), así el resultado llega a su sitio
+        aunque el usuario haya cambiado de ejercicio mientras tanto.
+        """
+        vista = vista_de(salida)
+        if boton:
+            boton.setEnabled(False)
+
+        def liberar():
+            if boton:
+                boton.setEnabled(True)
+
+        def al_ok(_):
+            liberar()
+            if texto_ok:
+                vista.agregar(texto_ok)
+
+        def al_error(msg):
+            liberar()
+            err(self, msg)
+            vista.agregar("\n[ERROR]\n" + msg)
+
+        def al_cancelar():
+            liberar()
+            vista.agregar("\n⏹ Tarea cancelada.")
+
+        return self.planificador.enviar(
+            script_name, descripcion, runner, prioridad,
+            al_linea=al_linea or vista.agregar,
+            al_ok=al_ok, al_error=al_error, al_cancelar=al_cancelar,
+        )
 
-        self.txt_pdf_path = None
-        self.btn_select_pdf = None
-        self.pdf_path_8 = None
+    # ------------ monitor de tareas ------------
+    def _refrescar_monitor(self):
+        tareas = list(reversed(self.planificador.tareas()))  # las más nuevas arriba
+        self._filas_monitor = tareas
+        self.tablaTareas.setRowCount(len(tareas))
+        for fila, t in enumerate(tareas):
+            tiempo = f"{t.duracion():.1f} s" if t.inicio is not None else "—"
+            for col, texto in enumerate((t.clave, t.descripcion, t.estado, tiempo)):
+                self.tablaTareas.setItem(fila, col, QTableWidgetItem(texto))
+
+        # Marca en la lista los ejercicios con trabajo pendiente
+        for row, (nombre, _) in enumerate(self.items):
+            item = self.list.item(row)
+            texto = f"{nombre}  ⏳" if self.planificador.ocupada(nombre) else nombre
+            if item.text() != texto:
+                item.setText(texto)
+
+        hay_activas = any(t.activa for t in tareas)
+        if hay_activas and not self._timer_monitor.isActive():
+            self._timer_monitor.start()
+        elif not hay_activas:
+            self._timer_monitor.stop()
+
+    def _cancelar_tarea_seleccionada(self):
+        fila = self.tablaTareas.currentRow()
+        if fila < 0 or fila >= len(self._filas_monitor):
+            return warn(self, "Selecciona una tarea en la tabla.")
+        tarea = self._filas_monitor[fila]
+        if not tarea.activa:
+            return warn(self, "Esa tarea ya terminó.")
+        self.planificador.cancelar(tarea)
 
     def _load_module(self, script_name: str):
         """Importa dinámicamente el archivo de ejercicio y lo cachea."""
@@ -247,11 +428,40 @@ class Load_ventana_langchain(QDialog):
             module = importlib.util.module_from_spec(spec)
             spec.loader.exec_module(module)
             self.modules_cache[script_name] = module
+            self._registrar_memoria_modulo(script_name, module)
             return module
         except Exception as e:
             err(self, f"Error al importar {script_name}:\n{e}\n\n{traceback.format_exc()}")
             return None
 
+    def _registrar_memoria_modulo(self, script_name: str, module):
+        """
+        Da de alta el ejercicio en monitor_ram.py. Si el módulo expone
+        uso_memoria()/liberar_memoria() (índices, historiales) se usan esas;
+        un módulo sin estado propio se puede sacar del caché y se vuelve a
+        importar al usarlo. Su tamaño solo se mide (recorriendo sus
+        variables) con RAM_MEDIDA_PROFUNDA=1.
+        """
+        nombre = f"ejercicio.{script_name}"
+        medir = getattr(module, "uso_memoria", None)
+        liberar = getattr(module, "liberar_memoria", None)
+        sin_estado = not callable(medir)
+        if sin_estado:
+            medir = lambda: tamano_aprox(vars(module), limite=20_000) if medida_profunda() else 0
+
+        def expulsar():
+            self.expulsar_modulo.emit(script_name, module)
+
+        if not callable(liberar):
+            liberar = expulsar if sin_estado else None
+        registrar_subsistema(nombre, medir, liberar)
+
+    def _expulsar_modulo_del_cache(self, script_name: str, module):
+        """Saca un módulo sin estado propio del caché (se reimporta al usarlo)."""
+        if self.modules_cache.get(script_name) is module:
+            del self.modules_cache[script_name]
+            quitar_subsistema(f"ejercicio.{script_name}")
+
     # ---------- Panel del ejercicio 1: Tema + Template ----------
     def _build_llmchain1_panel(self, script_name: str, desc: str):
         self._clear_panel()
@@ -287,9 +497,6 @@ class Load_ventana_langchain(QDialog):
         self.btn_run_tema.clicked.connect(lambda: self._run_script_llmchain1(script_name))
 
     def _run_script_llmchain1(self, script_name: str):
-        if self.runner and self.runner.isRunning():
-            return warn(self, "Ya hay un script ejecutándose.")
-
         path = self.scripts_dir / script_name
         if not path.exists():
             return err(self, f"No se encontró el archivo:\n{path}")
@@ -308,14 +515,12 @@ class Load_ventana_langchain(QDialog):
         env["PROMPT_TEMA"] = tema
         env["PROMPT_TEMPLATE"] = template
 
-        self.txt_output.clear()
-        self.txt_output.append(f"[Ejecutando] {path}\n")
+        vista_de(self.txt_output).limpiar()
+        vista_de(self.txt_output).agregar(f"[Ejecutando] {path}\n")
 
-        self.runner = ScriptRunner(path, self.project_root, env)
-        self.runner.line.connect(self.txt_output.append)
-        self.runner.finished_ok.connect(lambda _: self.txt_output.append("\n[OK] Ejecución terminada."))
-        self.runner.finished_err.connect(lambda m: (err(self, m), self.txt_output.append("\n[ERROR]\n" + m)))
-        self.runner.start()
+        runner = ScriptRunner(path, self.project_root, env)
+        self._lanzar(script_name, f"Tema: {tema[:40]}", runner, PRIORIDAD_LOTE,
+                     self.txt_output, self.btn_run_tema)
 
     # ---------- Panel genérico (1,4,5,7,8 fallback de script directo) ----------
     def _build_play_panel(self, script_name: str, desc: str):
@@ -340,23 +545,18 @@ class Load_ventana_langchain(QDialog):
         self.btn_play.clicked.connect(lambda: self._run_script(script_name))
 
     def _run_script(self, script_name: str):
-        if self.runner and self.runner.isRunning():
-            return warn(self, "Ya hay un script ejecutándose.")
-
         path = self.scripts_dir / script_name
         if not path.exists():
             return err(self, f"No se encontró el archivo:\n{path}")
 
         env = os.environ.copy()
 
-        self.txt_output.clear()
-        self.txt_output.append(f"[Ejecutando] {path}\n")
+        vista_de(self.txt_output).limpiar()
+        vista_de(self.txt_output).agregar(f"[Ejecutando] {path}\n")
 
-        self.runner = ScriptRunner(path, self.project_root, env)
-        self.runner.line.connect(self.txt_output.append)
-        self.runner.finished_ok.connect(lambda _: self.txt_output.append("\n[OK] Ejecución terminada."))
-        self.runner.finished_err.connect(lambda m: (err(self, m), self.txt_output.append("\n[ERROR]\n" + m)))
-        self.runner.start()
+        runner = ScriptRunner(path, self.project_root, env)
+        self._lanzar(script_name, "Ejecutar script", runner, PRIORIDAD_LOTE,
+                     self.txt_output, self.btn_play)
 
     # ---------- Panel simple texto → texto (4,5) ----------
     def _build_simple_chain_panel(self, script_name: str, desc: str,
@@ -391,9 +591,6 @@ class Load_ventana_langchain(QDialog):
         )
 
     def _run_simple_chain(self, script_name: str, func_name: str):
-        if self.runner and self.runner.isRunning():
-            return warn(self, "Ya hay un proceso en ejecución.")
-
         if not self.txt_input:
             return
 
@@ -409,31 +606,11 @@ class Load_ventana_langchain(QDialog):
         if not callable(fn):
             return err(self, f"El archivo {script_name} no define la función {func_name}().")
 
-        self.txt_output.clear()
-        self.txt_output.append(f"[Ejecutando] {script_name}\n")
-        if self.btn_run_chain:
-            self.btn_run_chain.setEnabled(False)
+        vista_de(self.txt_output).limpiar()
+        vista_de(self.txt_output).agregar(f"[Ejecutando] {script_name}\n")
 
-        self.runner = FunctionRunner(fn, text)
-        self.runner.line.connect(self.txt_output.append)
-        self.runner.finished_ok.connect(lambda _: self._on_func_finished_ok())
-        self.runner.finished_err.connect(lambda m: self._on_func_finished_err(m))
-        self.runner.start()
-
-    def _on_func_finished_ok(self):
-        if self.txt_output:
-            self.txt_output.append("\n[OK] Ejecución terminada.")
-        if self.btn_run_chain:
-            self.btn_run_chain.setEnabled(True)
-        self.runner = None
-
-    def _on_func_finished_err(self, msg: str):
-        if self.btn_run_chain:
-            self.btn_run_chain.setEnabled(True)
-        err(self, msg)
-        if self.txt_output:
-            self.txt_output.append("\n[ERROR]\n" + msg)
-        self.runner = None
+        self._lanzar(script_name, f"{func_name}()", FunctionRunner(fn, text), PRIORIDAD_NORMAL,
+                     self.txt_output, self.btn_run_chain)
 
     # ---------- Panel resumen + traducción (ejercicios 2 y 3) ----------
     def _build_resumen_traduccion_panel(self, script_name: str, desc: str):
@@ -475,37 +652,43 @@ class Load_ventana_langchain(QDialog):
         if not texto:
             return warn(self, "Escribe un texto de entrada.")
 
-        try:
-            from dotenv import load_dotenv
-            from langchain.prompts import PromptTemplate
-            from langchain_google_genai import ChatGoogleGenerativeAI
+        vista_de(self.txt_output).limpiar()
+        runner = FunctionRunner(self._resumir_y_traducir, script_name, texto)
+        self._lanzar(script_name, "Resumen + traducción", runner, PRIORIDAD_NORMAL,
+                     self.txt_output, self.btn_run_chain, texto_ok=None)
 
-            load_dotenv()
-            os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY", "")
+    @staticmethod
+    def _resumir_y_traducir(script_name: str, texto: str) -> str:
+        """Corre en un hilo del planificador (antes bloqueaba la interfaz)."""
+        from dotenv import load_dotenv
+        from langchain.prompts import PromptTemplate
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        from medidor_uso import callbacks_uso
 
-            llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.7)
+        load_dotenv()
+        os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY", "")
 
-            prompt_resumen = PromptTemplate.from_template(
-                "Resume el siguiente texto: {input}"
-            )
-            prompt_traduccion = PromptTemplate.from_template(
-                "Tradúcelo al inglés: {input}"
-            )
+        llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.7,
+                                     callbacks=callbacks_uso(script_name.removesuffix(".py")))
 
-            if script_name == "2_sequientialchain.py":
-                chain_resumen = prompt_resumen | llm
-                chain_traduccion = prompt_traduccion | llm
-                chain_final = chain_resumen | chain_traduccion
-                result = chain_final.invoke(texto)
-            else:
-                chain = prompt_resumen | llm | prompt_traduccion | llm
-                result = chain.invoke(texto)
+        prompt_resumen = PromptTemplate.from_template(
+            "Resume el siguiente texto: {input}"
+        )
+        prompt_traduccion = PromptTemplate.from_template(
+            "Tradúcelo al inglés: {input}"
+        )
 
-            texto_final = result.content if hasattr(result, "content") else str(result)
-            if self.txt_output:
-                self.txt_output.setPlainText(texto_final.strip())
-        except Exception as e:
-            err(self, f"{e}\n\n{traceback.format_exc()}")
+        if script_name == "2_sequientialchain.py":
+            chain_resumen = prompt_resumen | llm
+            chain_traduccion = prompt_traduccion | llm
+            chain_final = chain_resumen | chain_traduccion
+            result = chain_final.invoke(texto)
+        else:
+            chain = prompt_resumen | llm | prompt_traduccion | llm
+            result = chain.invoke(texto)
+
+        texto_final = result.content if hasattr(result, "content") else str(result)
+        return texto_final.strip()
 
     # ---------- Panel de chat (ejercicio 7: usa tu script) ----------
     def _build_chat_panel(self, script_name: str, desc: str,
@@ -549,16 +732,13 @@ class Load_ventana_langchain(QDialog):
                 lambda: self._reset_chat_memory(script_name, reset_fn_name)
             )
 
-        self.txt_output.append("La memoria de la conversación se conserva entre mensajes.")
+        vista_de(self.txt_output).agregar("La memoria de la conversación se conserva entre mensajes.")
         if script_name == "7_persistencia.py":
-            self.txt_output.append(
+            vista_de(self.txt_output).agregar(
                 "En este ejercicio además se guarda el historial en un archivo JSON (memoria persistente)."
             )
 
     def _run_chat_message(self, script_name: str, func_name: str):
-        if self.runner and self.runner.isRunning():
-            return warn(self, "Ya hay un proceso en ejecución.")
-
         if not self.inp_chat:
             return
 
@@ -574,35 +754,18 @@ class Load_ventana_langchain(QDialog):
         if not callable(fn):
             return err(self, f"El archivo {script_name} no define la función {func_name}().")
 
-        if self.txt_output:
-            self.txt_output.append(f"👤 Tú: {text}")
+        self._enviar_chat(script_name, FunctionRunner(fn, text), text)
 
+    def _enviar_chat(self, script_name: str, runner, text: str):
+        salida = self.txt_output
+        vista = vista_de(salida)
+        vista.agregar(f"👤 Tú: {text}")
+        vista.agregar_temporal("⏳ Esperando respuesta…")
         self.inp_chat.clear()
-        if self.btn_chat_send:
-            self.btn_chat_send.setEnabled(False)
-
-        self.runner = FunctionRunner(fn, text)
-        self.runner.line.connect(self._append_bot_message)
-        self.runner.finished_ok.connect(lambda _: self._on_chat_finished_ok())
-        self.runner.finished_err.connect(lambda m: self._on_chat_finished_err(m))
-        self.runner.start()
-
-    def _append_bot_message(self, text: str):
-        if self.txt_output:
-            self.txt_output.append(f"🤖 Asistente: {text}")
-
-    def _on_chat_finished_ok(self):
-        if self.btn_chat_send:
-            self.btn_chat_send.setEnabled(True)
-        self.runner = None
-
-    def _on_chat_finished_err(self, msg: str):
-        if self.btn_chat_send:
-            self.btn_chat_send.setEnabled(True)
-        err(self, msg)
-        if self.txt_output:
-            self.txt_output.append("\n[ERROR]\n" + msg)
-        self.runner = None
+        self._lanzar(script_name, f"Chat: {text[:40]}", runner, PRIORIDAD_INTERACTIVA,
+                     salida, self.btn_chat_send,
+                     al_linea=lambda t: vista.agregar(f"🤖 Asistente: {t}"),
+                     texto_ok=None)
 
     def _reset_chat_memory(self, script_name: str, reset_fn_name: str):
         module = self._load_module(script_name)
@@ -613,32 +776,42 @@ class Load_ventana_langchain(QDialog):
         if not callable(fn):
             return err(self, f"El archivo {script_name} no define la función {reset_fn_name}().")
 
-        try:
-            fn()
-            if self.txt_output:
-                self.txt_output.clear()
-                self.txt_output.append("Memoria reiniciada.")
-        except Exception as e:
-            err(self, f"No se pudo reiniciar la memoria:\n{e}")
+        # Lo que está en cola o en marcha pertenece a la conversación que se
+        # olvida; el reinicio (con su E/S de disco) va en la misma cola, así
+        # corre después de que termine de verdad el turno en vuelo
+        self.planificador.cancelar_clave(script_name)
+        vista = vista_de(self.txt_output)
+
+        def al_reiniciar(_):
+            vista.limpiar()
+            vista.agregar("Memoria reiniciada.")
+
+        self._lanzar(script_name, "Borrar memoria", FunctionRunner(fn), PRIORIDAD_INTERACTIVA,
+                     self.txt_output, self.btn_chat_reset, al_linea=al_reiniciar, texto_ok=None)
 
     # ---------- Ejercicio 6: chat con memoria SOLO 3 conversaciones (en GUI) ----------
     def _init_mem6(self):
-        """Inicializa la memoria interna del ejercicio 6 (3 conversaciones)."""
-        if self._mem6 is not None:
-            return
+        """Inicializa la memoria interna del ejercicio 6 (3 conversaciones) y la devuelve."""
+        memoria = self._mem6
+        if memoria is not None:
+            return memoria
 
         from dotenv import load_dotenv
         from langchain_google_genai import ChatGoogleGenerativeAI
         from langchain.prompts import ChatPromptTemplate
         # *** CAMBIO IMPORTANTE SOLO AQUÍ: usamos ConversationBufferWindowMemory ***
         from langchain.memory import ConversationBufferWindowMemory
+        from medidor_uso import callbacks_uso
+        from prefijo_estable import MedidorPrefijo, modo_estable, ventana_historial
 
         load_dotenv()
         os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY", "")
 
         class MemoriaSesion:
             def __init__(self, max_items=3):
-                self.llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.7)
+                self.max_items = max_items
+                self.llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.7,
+                                                  callbacks=callbacks_uso("6_memoria (GUI)"))
                 self.prompt = ChatPromptTemplate.from_messages([
                     ("system", "Eres un asistente útil y recuerdas la conversación anterior."),
                     ("placeholder", "{history}"),
@@ -649,16 +822,28 @@ class Load_ventana_langchain(QDialog):
                     k=max_items,
                     return_messages=True
                 )
+                self.medidor_prefijo = MedidorPrefijo("6_memoria (GUI)")
 
             def conversar(self, texto: str) -> str:
-                vars_ = self.memory.load_memory_variables({})
-                history = vars_.get("history", [])
+                if modo_estable():
+                    # Recorte por bloques para no mover el prefijo en cada turno
+                    history = ventana_historial(self.memory.chat_memory.messages,
+                                                self.max_items * 2, estable=True)
+                else:
+                    vars_ = self.memory.load_memory_variables({})
+                    history = vars_.get("history", [])
+                self.medidor_prefijo.registrar(list(history) + [("human", texto)])
                 chain = self.prompt | self.llm
                 resp = chain.invoke({"history": history, "input": texto})
                 self.memory.save_context({"input": texto}, {"output": resp.content})
+                # La memoria de ventana solo LEE los últimos k turnos, pero guarda
+                # todos: se recorta igual que se lee para que no crezca sin fin
+                mensajes = self.memory.chat_memory.messages
+                mensajes[:] = ventana_historial(mensajes, self.max_items * 2, estable=modo_estable())
                 return resp.content.strip()
 
         self._mem6 = MemoriaSesion(max_items=3)
+        return self._mem6
 
     def _build_memoria6_panel(self, script_name: str, desc: str):
         """Interfaz del ejercicio 6: igual aspecto que el chat, pero memoria en la GUI (3 turnos)."""
@@ -694,15 +879,12 @@ class Load_ventana_langchain(QDialog):
         self.btn_chat_send.clicked.connect(self._run_memoria6_message)
         self.btn_chat_reset.clicked.connect(self._reset_memoria6)
 
-        self.txt_output.append(
+        vista_de(self.txt_output).agregar(
             "La memoria de la conversación se conserva entre mensajes, "
             "pero SOLO recuerda las últimas 3 conversaciones (pregunta-respuesta)."
         )
 
     def _run_memoria6_message(self):
-        if self.runner and self.runner.isRunning():
-            return warn(self, "Ya hay un proceso en ejecución.")
-
         if not self.inp_chat:
             return
 
@@ -710,26 +892,22 @@ class Load_ventana_langchain(QDialog):
         if not text:
             return warn(self, "Escribe un mensaje.")
 
-        self._init_mem6()
+        self._enviar_chat("6_memoria.py", FunctionRunner(self._conversar_mem6, text), text)
 
-        if self.txt_output:
-            self.txt_output.append(f"👤 Tú: {text}")
-
-        self.inp_chat.clear()
-        if self.btn_chat_send:
-            self.btn_chat_send.setEnabled(False)
-
-        self.runner = FunctionRunner(self._mem6.conversar, text)
-        self.runner.line.connect(self._append_bot_message)
-        self.runner.finished_ok.connect(lambda _: self._on_chat_finished_ok())
-        self.runner.finished_err.connect(lambda m: self._on_chat_finished_err(m))
-        self.runner.start()
+    def _conversar_mem6(self, texto: str) -> str:
+        # Corre en el hilo de la tarea: la primera vez también importa LangChain.
+        # Las tareas del ejercicio 6 van en cola, nunca dos a la vez. Con una
+        # referencia local: _reset_memoria6 puede soltar self._mem6 mientras tanto.
+        memoria = self._init_mem6()
+        return memoria.conversar(texto)
 
     def _reset_memoria6(self):
+        # Lo que está en cola o en marcha pertenece a la conversación que se olvida
+        self.planificador.cancelar_clave("6_memoria.py")
         self._mem6 = None
         if self.txt_output:
-            self.txt_output.clear()
-            self.txt_output.append("Memoria reiniciada (se olvidaron todas las conversaciones previas).")
+            vista_de(self.txt_output).limpiar()
+            vista_de(self.txt_output).agregar("Memoria reiniciada (se olvidaron todas las conversaciones previas).")
 
     # ---------- Panel RAG (ejercicio 8) ----------
     def _build_rag_panel(self, script_name: str, desc: str):
@@ -798,41 +976,19 @@ class Load_ventana_langchain(QDialog):
         if not callable(inicializar):
             return err(self, f"El archivo {script_name} no define la función inicializar_indice().")
 
-        if self.btn_select_pdf:
-            self.btn_select_pdf.setEnabled(False)
-        if self.txt_output:
-            self.txt_output.clear()
-            self.txt_output.append("Cargando y procesando el PDF seleccionado...\n")
-
-        self.runner = FunctionRunner(inicializar, file_path)
-        self.runner.line.connect(self._on_pdf_index_message)
-        self.runner.finished_ok.connect(lambda _: self._on_pdf_index_ok())
-        self.runner.finished_err.connect(lambda m: self._on_pdf_index_err(m))
-        self.runner.start()
-
-    def _on_pdf_index_message(self, text: str):
-        if self.txt_output and text:
-            self.txt_output.append(text)
-
-    def _on_pdf_index_ok(self):
-        if self.btn_select_pdf:
-            self.btn_select_pdf.setEnabled(True)
-        if self.txt_output:
-            self.txt_output.append("\n[OK] PDF procesado.")
-        self.runner = None
+        salida = self.txt_output
+        vista = vista_de(salida)
+        vista.limpiar()
+        vista.agregar("Cargando y procesando el PDF seleccionado...\n")
 
-    def _on_pdf_index_err(self, msg: str):
-        if self.btn_select_pdf:
-            self.btn_select_pdf.setEnabled(True)
-        err(self, msg)
-        if self.txt_output:
-            self.txt_output.append("\n[ERROR]\n" + msg)
-        self.runner = None
+        # Indexar es trabajo de lote: cede el paso a los chats de otros ejercicios
+        self._lanzar(script_name, f"Indexar {Path(file_path).name}",
+                     FunctionRunner(inicializar, file_path), PRIORIDAD_LOTE,
+                     salida, self.btn_select_pdf,
+                     al_linea=lambda t: vista.agregar(t) if t else None,
+                     texto_ok="\n[OK] PDF procesado.")
 
     def _run_rag_query(self, script_name: str):
-        if self.runner and self.runner.isRunning():
-            return warn(self, "Hay otra operación en curso.")
-
         if not self.txt_input:
             return
 
@@ -848,37 +1004,38 @@ class Load_ventana_langchain(QDialog):
         if not callable(fn):
             return err(self, f"El archivo {script_name} no define la función preguntar().")
 
-        if self.txt_output:
-            self.txt_output.clear()
-            self.txt_output.append("Consultando el documento...\n")
-
-        if self.btn_run_chain:
-            self.btn_run_chain.setEnabled(False)
-
-        self.runner = FunctionRunner(fn, pregunta)
-        self.runner.line.connect(self.txt_output.append)
-        self.runner.finished_ok.connect(lambda _: self._on_rag_finished_ok())
-        self.runner.finished_err.connect(lambda m: self._on_rag_finished_err(m))
-        self.runner.start()
-
-    def _on_rag_finished_ok(self):
-        if self.btn_run_chain:
-            self.btn_run_chain.setEnabled(True)
-        self.runner = None
-
-    def _on_rag_finished_err(self, msg: str):
-        if self.btn_run_chain:
-            self.btn_run_chain.setEnabled(True)
-        err(self, msg)
-        if self.txt_output:
-            self.txt_output.append("\n[ERROR]\n" + msg)
-        self.runner = None
+        vista_de(self.txt_output).limpiar()
+        vista_de(self.txt_output).agregar("Consultando el documento...\n")
+
+        # Si el PDF aún se está indexando, la consulta espera en la cola del ejercicio
+        self._lanzar(script_name, f"Pregunta: {pregunta[:40]}", FunctionRunner(fn, pregunta),
+                     PRIORIDAD_NORMAL, self.txt_output, self.btn_run_chain, texto_ok=None)
 
     # ---------- Selector de ejercicio ----------
     def _on_select(self, row: int):
         row = max(0, min(row, len(self.items) - 1))
         name, desc = self.items[row]
 
+        # Panel ya construido: se reutiliza (con su salida y tareas en curso)
+        if name in self._paneles:
+            self._clear_panel()
+            self.lblTitulo.setText(name)
+            self.txtDesc.setPlainText(desc)
+            widget, atributos = self._paneles[name]
+            for nombre, valor in atributos.items():
+                setattr(self, nombre, valor)
+            self.panelLayout.addWidget(widget)
+            widget.show()
+            return
+
+        self._construir_panel(name, desc)
+        item = self.panelLayout.itemAt(0)
+        if item and item.widget():
+            self._paneles[name] = (
+                item.widget(), {n: getattr(self, n) for n in ATRIBUTOS_PANEL}
+            )
+
+    def _construir_panel(self, name: str, desc: str):
         if name == "1_llmchain.py":
             self._build_llmchain1_panel(name, desc)
 
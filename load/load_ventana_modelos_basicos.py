@@ -9,36 +9,43 @@
 #   - Carga la UI
 #   - Conecta botones
 #   - Pasa el texto de entrada a tus .py
-#   - Captura 'print()' de tus .py (Memoria/Chat) y lo muestra en QTextEdit
-#   - Simula 'input()' (usuario y luego 'salir') para Memoria/Chat
+#   - Memoria/Chat: usa enviar(mensaje) -> respuesta de cada clase
+#   - Memoria va añadiendo cada turno al QTextEdit (load/vista_salida.py:
+#     solo se escribe lo nuevo, nunca se reconstruye el historial entero)
+#   - Chat muestra solo lo que el modelo recuerda (los últimos 4 pares),
+#     así que se redibuja entero: como mucho son 8 mensajes
+#   - Las llamadas a Groq corren en un pool de hilos (load/trabajadores.py):
+#     la ventana no se congela y el botón "Cancelar" libera la pestaña
 # ======================================================
 
-from PyQt5 import QtWidgets, uic, QtCore
+from PyQt5 import QtWidgets, QtCore
 from PyQt5.QtCore import QPropertyAnimation
 
-# Utilidades para capturar salida e inyectar input() a TUS .py
-import io, builtins
-from contextlib import redirect_stdout
+from load.cargar_ui import cargar_ui
+from load.trabajadores import EjecutorTareas
+from load.vista_salida import vista_de
 
-# ======= IMPORTS DE TUS TRES PROGRAMAS (.py) =======
-# 1) Prompt: usa modeloopenai.py (Groq)  -> pestaña "Prompt"
-from modeloopenai import ModeloOpenAI
-
-# 2) Memoria (historial sin límite): usa modelo_historial_groq.py -> pestaña "Memoria"
-from modelo_historial_groq import ModeloHistorial as ModeloHistorialMem
-
-# 3) Chat limitado a 4 pares: usa modelohistorial_2.py -> pestaña "Chat"
-from modelohistorial_2 import ModeloHistorial as ModeloHistorialTop5
+# ======= TUS TRES PROGRAMAS (.py) =======
+# Se importan (junto con el SDK de Groq) la primera vez que se usan,
+# no al abrir la aplicación; ver las propiedades modelo_* más abajo.
 
 
 class Load_ventana_modelos_basicos(QtWidgets.QDialog):
+    _modelo_prompt = None
+    _modelo_historial_full = None
+    _modelo_historial_top5 = None
+
     def __init__(self):
         super().__init__()
         
         # --------------------------------------------
         # Cargar la INTERFAZ tal cual tu .ui
         # --------------------------------------------
-        uic.loadUi("interfaces/ventana_modelos_basicos.ui", self)
+        cargar_ui(self, "ventana_modelos_basicos")
+
+        # Pool de hilos para las llamadas a Groq (una tarea activa por pestaña)
+        self.ejecutor = EjecutorTareas(max_hilos=3, parent=self)
+        self._tareas = {}
 
         # --------------------------------------------
         # Conectar cada pestaña con su .py correspondiente
@@ -113,9 +120,7 @@ class Load_ventana_modelos_basicos(QtWidgets.QDialog):
         self.boton_enviar  = self.findChild(QtWidgets.QPushButton,"boton_enviar")
         self.output_resp   = self.findChild(QtWidgets.QTextEdit,  "output_response")
 
-        # Instancia de tu clase del archivo .py (no se modifica)
-        self.modelo_prompt = ModeloOpenAI()
-
+        # La instancia de tu clase se crea al primer envío (ver modelo_prompt)
         if self.boton_enviar:
             self.boton_enviar.clicked.connect(self._on_prompt_click)
 
@@ -125,22 +130,24 @@ class Load_ventana_modelos_basicos(QtWidgets.QDialog):
         que el usuario escribió en la interfaz. Muestra el resultado.
         (modeloopenai.ModeloOpenAI.modeloSimple(texto) debe devolver str)
         """
+        if self._cancelar_si_activa("prompt", self.boton_enviar, self.output_resp):
+            return
         texto = (self.input_prompt.text() if self.input_prompt else "").strip()
         if not texto:
             self._set_text(self.output_resp, "⚠️ Escribe el prompt.")
             return
 
-        try:
-            salida = self.modelo_prompt.modeloSimple(texto)
-            self._set_text(self.output_resp, salida)
-        except Exception as e:
-            self._set_text(self.output_resp, f"❌ Error: {e}")
+        self._set_text(self.output_resp, "⏳ Consultando a Groq…")
+        self._lanzar(
+            "prompt", self.boton_enviar, self.output_resp,
+            lambda: self.modelo_prompt.modeloSimple(texto),
+            al_terminar=lambda salida: self._set_text(self.output_resp, salida),
+        )
 
     # ======================================================
     #                 PESTAÑA 2: MEMORIA
     #   -> llama a TU archivo  modelo_historial_groq.py (ModeloHistorial)
-    #   -> método: modeloHistorial()
-    #   -> le pasamos UNA entrada de usuario y luego 'salir'
+    #   -> método: enviar(mensaje) -> respuesta
     #   -> muestra el historial en: output_response_2
     # ======================================================
     def _wire_memoria(self):
@@ -148,55 +155,42 @@ class Load_ventana_modelos_basicos(QtWidgets.QDialog):
         self.boton_enviar_2    = self.findChild(QtWidgets.QPushButton,"boton_enviar_2")
         self.output_response_2 = self.findChild(QtWidgets.QTextEdit,  "output_response_2")
 
-        # Instancia de tu clase del archivo .py (sin modificar)
-        self.modelo_historial_full = ModeloHistorialMem()
-
+        # La instancia de tu clase se crea al primer envío (ver modelo_historial_full)
         if self.boton_enviar_2:
             self.boton_enviar_2.clicked.connect(self._on_memoria_click)
 
     def _on_memoria_click(self):
         """
-        Ejecuta TU método modeloHistorial() que usa input()/print().
-        Simulamos input() con:
-           - lo que el usuario escribió en input_prompt_2
-           - 'salir' para cerrar el loop
-        y capturamos lo que imprime para renderizarlo en la interfaz.
+        Envía lo que el usuario escribió en input_prompt_2 con enviar()
+        de TU clase y renderiza el historial en la interfaz.
         """
+        if self._cancelar_si_activa("memoria", self.boton_enviar_2, self.output_response_2):
+            return
         entrada = (self.input_prompt_2.text() if self.input_prompt_2 else "").strip()
+        vista = vista_de(self.output_response_2)
         if not entrada:
-            self._set_text(self.output_response_2, "⚠️ Escribe un mensaje.")
+            vista.agregar_temporal("⚠️ Escribe un mensaje.")
             return
 
-        respuestas = [entrada, "salir"]
-
-        def fake_input(prompt=""):
-            return respuestas.pop(0) if respuestas else "salir"
-
-        buf = io.StringIO()
-        real_input = builtins.input
-        try:
-            builtins.input = fake_input
-            with redirect_stdout(buf):
-                # Llama a TU método del .py (no lo modificamos)
-                self.modelo_historial_full.modeloHistorial()
-        except Exception as e:
-            self._set_text(self.output_response_2, f"❌ Error: {e}")
-            return
-        finally:
-            builtins.input = real_input
-
-        # Muestra el historial que TU clase lleva internamente (self.historial)
-        texto_hist = self._historial_to_text(self.modelo_historial_full.historial)
-        self._set_text(self.output_response_2, texto_hist)
-
         # Limpia el input de la pestaña Memoria
         if self.input_prompt_2:
             self.input_prompt_2.clear()
 
+        # Solo se añade el turno nuevo; TU clase sigue llevando su self.historial
+        vista.agregar(f"👤 {entrada}")
+        vista.agregar_temporal("⏳ Esperando respuesta…")
+
+        self._lanzar(
+            "memoria", self.boton_enviar_2, self.output_response_2,
+            lambda token: self.modelo_historial_full.enviar(entrada, token=token),
+            al_terminar=lambda respuesta: vista.agregar(f"🤖 {respuesta}"),
+            con_token=True,
+        )
+
     # ======================================================
     #                 PESTAÑA 3: CHAT (límite 4)
     #   -> llama a TU archivo  modelohistorial_2.py (ModeloHistorial)
-    #   -> método: modelohistorial(historial=list_mutable)
+    #   -> método: enviar(mensaje, historial=list_mutable)
     #   -> mantiene un historial propio en la UI (self.historial_top5 -> ahora top4)
     #   -> muestra en: output_response_3
     # ======================================================
@@ -205,9 +199,7 @@ class Load_ventana_modelos_basicos(QtWidgets.QDialog):
         self.boton_enviar_3    = self.findChild(QtWidgets.QPushButton,"boton_enviar_3")
         self.output_response_3 = self.findChild(QtWidgets.QTextEdit,  "output_response_3")
 
-        # Instancia del archivo NUEVO (límite 4 turnos)
-        self.modelo_historial_top5 = ModeloHistorialTop5()
-
+        # La instancia del archivo NUEVO (límite 4 turnos) se crea al primer envío
         # Historial PERSISTENTE en la UI que se pasa a tu método cada vez
         self.historial_top5 = [{"role": "system", "content": "Eres un asistente útil y amable."}]
 
@@ -216,41 +208,118 @@ class Load_ventana_modelos_basicos(QtWidgets.QDialog):
 
     def _on_chat_click(self):
         """
-        Ejecuta TU método modelohistorial(historial=...) que usa input()/print().
+        Envía el texto del usuario con enviar(mensaje, historial=...) de TU clase.
         - Le pasamos self.historial_top5 (lista mutable) para que la actualice.
-        - Simulamos input() con el texto del usuario y luego 'salir'.
         - Tu .py ya limita a 4 pares; aquí solo renderizamos el resultado.
         """
+        if self._cancelar_si_activa("chat", self.boton_enviar_3, self.output_response_3):
+            return
         entrada = (self.input_prompt_3.text() if self.input_prompt_3 else "").strip()
         if not entrada:
             self._set_text(self.output_response_3, "⚠️ Escribe un mensaje.")
             return
 
-        respuestas = [entrada, "salir"]
+        # Limpia el input de la pestaña Chat
+        if self.input_prompt_3:
+            self.input_prompt_3.clear()
 
-        def fake_input(prompt=""):
-            return respuestas.pop(0) if respuestas else "salir"
+        self._set_text(self.output_response_3, self._texto_pendiente(self.historial_top5, entrada))
+
+        def mostrar(_respuesta):
+            # (Tu .py ya recorta a 4 pares; aquí solo mostramos)
+            texto_hist = self._historial_to_text(self.historial_top5)
+            self._set_text(self.output_response_3, texto_hist)
+
+        self._lanzar(
+            "chat", self.boton_enviar_3, self.output_response_3,
+            # Llama a TU método del .py nuevo, pasándole el historial de la UI
+            lambda token: self.modelo_historial_top5.enviar(
+                entrada, historial=self.historial_top5, token=token
+            ),
+            al_terminar=mostrar,
+            con_token=True,
+        )
+
+    # ---------------- Tareas en segundo plano ----------------
+    def _lanzar(self, clave, boton, salida, fn, al_terminar, con_token: bool = False):
+        """
+        Ejecuta fn() en el pool (con con_token, fn(token=...)). Mientras corre,
+        el botón de la pestaña pasa a "Cancelar"; el resultado llega a
+        al_terminar en el hilo de la interfaz.
+        """
+        texto_boton = boton.text() if boton else ""
 
-        buf = io.StringIO()
-        real_input = builtins.input
-        try:
-            builtins.input = fake_input
-            with redirect_stdout(buf):
-                # Llama a TU método del .py nuevo, pasándole el historial de la UI
-                self.modelo_historial_top5.modelohistorial(historial=self.historial_top5)
-        except Exception as e:
-            self._set_text(self.output_response_3, f"❌ Error: {e}")
-            return
-        finally:
-            builtins.input = real_input
+        def liberar():
+            self._tareas.pop(clave, None)
+            if boton:
+                boton.setText(texto_boton)
 
-        # (Tu .py ya recorta a 4 pares; aquí solo mostramos)
-        texto_hist = self._historial_to_text(self.historial_top5)
-        self._set_text(self.output_response_3, texto_hist)
+        def ok(resultado):
+            liberar()
+            al_terminar(resultado)
 
-        # Limpia el input de la pestaña Chat
-        if self.input_prompt_3:
-            self.input_prompt_3.clear()
+        def fallo(msg):
+            liberar()
+            # Solo el mensaje; el traceback no aporta nada en la UI
+            self._mostrar_aviso(salida, "❌ Error: " + msg.split("\n\n")[0])
+
+        tarea = self.ejecutor.lanzar(fn, al_terminar=ok, al_error=fallo, con_token=con_token)
+        self._tareas[clave] = (tarea, texto_boton)
+        if boton:
+            boton.setText("Cancelar")
+
+    def _cancelar_si_activa(self, clave, boton, salida) -> bool:
+        """
+        Si la pestaña tiene una consulta en curso, la cancela y devuelve True.
+        La pestaña queda libre al momento; la respuesta, si llega, se descarta
+        y enviar(token=...) del modelo quita el turno del historial.
+        """
+        activa = self._tareas.pop(clave, None)
+        if activa is None:
+            return False
+        tarea, texto_boton = activa
+        tarea.token.cancelar()
+        if boton:
+            boton.setText(texto_boton)
+        self._mostrar_aviso(salida, "⛔ Consulta cancelada.")
+        return True
+
+    def _mostrar_aviso(self, salida, texto: str):
+        # En Memoria el aviso sustituye al "⏳" sin borrar el historial;
+        # en Prompt y Chat reemplaza la salida como siempre.
+        if salida is self.output_response_2:
+            vista_de(salida).agregar(texto)
+        else:
+            self._set_text(salida, texto)
+
+    def _texto_pendiente(self, historial, entrada):
+        previo = self._historial_to_text(historial)
+        return (previo + "\n" if previo else "") + f"👤 {entrada}\n⏳ Esperando respuesta…"
+
+    # ---------------- Modelos (carga diferida) ----------------
+    @property
+    def modelo_prompt(self):
+        # 1) Prompt: usa modeloopenai.py (Groq)  -> pestaña "Prompt"
+        if self._modelo_prompt is None:
+            from modeloopenai import ModeloOpenAI
+            self._modelo_prompt = ModeloOpenAI()
+        return self._modelo_prompt
+
+    @property
+    def modelo_historial_full(self):
+        # 2) Memoria (historial sin límite): usa modelo_historial_groq.py -> pestaña "Memoria"
+        if self._modelo_historial_full is None:
+            from modelo_historial_groq import ModeloHistorial as ModeloHistorialMem
+            self._modelo_historial_full = ModeloHistorialMem()
+        return self._modelo_historial_full
+
+    @property
+    def modelo_historial_top5(self):
+        # 3) Chat limitado a 4 pares: usa modelohistorial_2.py -> pestaña "Chat"
+        if self._modelo_historial_top5 is None:
+            from modelohistorial_2 import ModeloHistorial as ModeloHistorialTop5
+            self._modelo_historial_top5 = ModeloHistorialTop5()
+        return self._modelo_historial_top5
 
     # --------------------- Utilidades UI ---------------------
     def _set_text(self, widget, text: str):
@@ -1,12 +1,35 @@
-from PyQt5 import QtWidgets, uic
-from load.load_ventana_modelos_basicos import Load_ventana_modelos_basicos
-from load.load_ventana_langchain import Load_ventana_langchain  # ← ya lo tenías
-from load.load_ventana_cuestionario import Load_ventana_cuestionario  # ← nuevo import
+import os
+import time
+import logging
+import importlib
+import threading
+
+from PyQt5 import QtWidgets, QtCore
+
+from load.cargar_ui import cargar_ui
+from monitor_ram import atribuir
+# Las ventanas (y los SDK de IA que usan) se importan al abrirlas por primera vez,
+# así la ventana principal aparece sin esperar a groq, google.generativeai, pypdf...
+
+logger = logging.getLogger(__name__)
+
+# Módulos que se precargan en segundo plano tras mostrar la ventana
+# (desactivar con GUI_PRECALENTAR=0)
+MODULOS_PRECALENTAR = (
+    "load.load_ventana_modelos_basicos",
+    "load.load_ventana_cuestionario",
+    "load.load_ventana_langchain",
+    "groq",
+    "google.generativeai",
+    "extraccion_pdf",
+    "pypdf",
+)
+
 
 class Load_ventana_principal(QtWidgets.QMainWindow):
     def __init__(self):
         super().__init__()
-        uic.loadUi("interfaces/Ventana_principal.ui", self)
+        cargar_ui(self, "ventana_principal")
         self.showMaximized()
 
         # Conexiones que ya tenías
@@ -14,26 +37,64 @@ class Load_ventana_principal(QtWidgets.QMainWindow):
         self.actionLangchain.triggered.connect(self.abrirVentanaLangchain)
         self.actionSalir.triggered.connect(self.cerrarVentana)
 
+        # Ventanas ya construidas: se reutilizan en cada apertura
+        self.basicos = None
+        self.langchain = None
         # 🔹 NUEVO: atributo para guardar la ventana del cuestionario
         self.ventana_cuestionario = None
 
         # 🔹 NUEVO: conectar el menú "Cuestionario"
         self.actionCuestionario.triggered.connect(self.abrir_cuestionario)
 
+        # Precalentar importaciones cuando la ventana ya esté pintada
+        if os.getenv("GUI_PRECALENTAR", "1") != "0":
+            QtCore.QTimer.singleShot(500, self._precalentar)
+
+    def _precalentar(self):
+        def importar():
+            for nombre in MODULOS_PRECALENTAR:
+                try:
+                    importlib.import_module(nombre)
+                except Exception as e:
+                    # Si falta un paquete, el error se verá al abrir esa ventana
+                    logger.debug("No se pudo precargar %s: %s", nombre, e)
+
+        threading.Thread(target=importar, name="precalentar", daemon=True).start()
+
+    # Lo que crece la memoria mientras cada ventana está abierta queda
+    # atribuido a ella en monitor_ram.py
     def abrirVentanaBasicos(self):
-        self.basicos = Load_ventana_modelos_basicos()
-        self.basicos.exec_()
+        inicio = time.perf_counter()
+        with atribuir("ventana.basicos"):
+            if self.basicos is None:
+                from load.load_ventana_modelos_basicos import Load_ventana_modelos_basicos
+                self.basicos = Load_ventana_modelos_basicos()
+            self._medir_apertura("basicos", inicio)
+            self.basicos.exec_()
 
     def abrirVentanaLangchain(self):
-        self.langchain = Load_ventana_langchain()
-        self.langchain.exec_()  # el QDialog abre maximizado
+        inicio = time.perf_counter()
+        with atribuir("ventana.langchain"):
+            if self.langchain is None:
+                from load.load_ventana_langchain import Load_ventana_langchain
+                self.langchain = Load_ventana_langchain()
+            self._medir_apertura("langchain", inicio)
+            self.langchain.exec_()  # el QDialog abre maximizado
 
     def abrir_cuestionario(self):
-        if self.ventana_cuestionario is None:
-            self.ventana_cuestionario = Load_ventana_cuestionario(self)
+        inicio = time.perf_counter()
+        # No es modal: solo se atribuye la construcción (sus tareas van aparte)
+        with atribuir("ventana.cuestionario"):
+            if self.ventana_cuestionario is None:
+                from load.load_ventana_cuestionario import Load_ventana_cuestionario
+                self.ventana_cuestionario = Load_ventana_cuestionario(self)
+        self._medir_apertura("cuestionario", inicio)
         self.ventana_cuestionario.show()
         self.ventana_cuestionario.raise_()
         self.ventana_cuestionario.activateWindow()
 
+    def _medir_apertura(self, ventana: str, inicio: float):
+        logger.info("Ventana %s lista en %.1f ms", ventana, (time.perf_counter() - inicio) * 1000)
+
     def cerrarVentana(self):
         self.close()
@@ -0,0 +1,167 @@
+# load/planificador.py
+# ------------------------------------------------------
+# Planificador de tareas para la ventana de LangChain.
+#
+# - Pool acotado: como mucho `max_concurrentes` tareas a la vez.
+# - Una cola por ejercicio: dentro del mismo ejercicio las tareas van de una
+#   en una (los scripts guardan estado global: índice FAISS, memoria...),
+#   pero ejercicios distintos corren en paralelo.
+# - Prioridades: entre las tareas listas para arrancar, primero la de mayor
+#   prioridad (el chat interactivo antes que indexar un PDF), luego FIFO.
+# - Cancelación: una tarea en cola se descarta; una en ejecución se marca
+#   como cancelada (sus salidas se ignoran) y se le pide al runner que pare
+#   si sabe hacerlo (ScriptRunner mata el subproceso).
+#
+# Los "runners" son los QThread de la ventana (ScriptRunner, FunctionRunner):
+# señales line(str), finished_ok(int), finished_err(str) y cancelar() opcional.
+# ------------------------------------------------------
+
+import time
+import itertools
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+PRIORIDAD_LOTE = 0          # indexar PDF, ejecutar scripts completos
+PRIORIDAD_NORMAL = 1        # cadenas texto -> texto, consultas RAG
+PRIORIDAD_INTERACTIVA = 2   # mensajes de chat
+
+EN_COLA = "En cola"
+EJECUTANDO = "Ejecutando"
+TERMINADA = "OK"
+FALLIDA = "Error"
+CANCELADA = "Cancelada"
+
+
+class TareaPlanificada:
+    def __init__(self, id_, clave, descripcion, runner, prioridad,
+                 al_linea=None, al_ok=None, al_error=None, al_cancelar=None):
+        self.id = id_
+        self.clave = clave
+        self.descripcion = descripcion
+        self.runner = runner
+        self.prioridad = prioridad
+        self.al_linea = al_linea
+        self.al_ok = al_ok
+        self.al_error = al_error
+        self.al_cancelar = al_cancelar
+        self.estado = EN_COLA
+        self.creada = time.monotonic()
+        self.inicio = None
+        self.fin = None
+
+    @property
+    def activa(self) -> bool:
+        return self.estado in (EN_COLA, EJECUTANDO)
+
+    def duracion(self) -> float:
+        if self.inicio is None:
+            return 0.0
+        return (self.fin or time.monotonic()) - self.inicio
+
+
+class PlanificadorTareas(QObject):
+    # Se emite cada vez que cambia el estado de alguna tarea (para el monitor)
+    cambios = pyqtSignal()
+
+    def __init__(self, max_concurrentes: int = 3, historial: int = 30, parent=None):
+        super().__init__(parent)
+        self.max_concurrentes = max(1, max_concurrentes)
+        self.historial = historial
+        self._ids = itertools.count(1)
+        self._tareas = []          # todas las tareas recientes, en orden de llegada
+        self._claves_ocupadas = set()
+
+    # ---------------- API ----------------
+    def enviar(self, clave: str, descripcion: str, runner, prioridad: int = PRIORIDAD_NORMAL,
+               al_linea=None, al_ok=None, al_error=None, al_cancelar=None) -> TareaPlanificada:
+        tarea = TareaPlanificada(next(self._ids), clave, descripcion, runner, prioridad,
+                                 al_linea, al_ok, al_error, al_cancelar)
+        self._tareas.append(tarea)
+        self._despachar()
+        self.cambios.emit()
+        return tarea
+
+    def cancelar(self, tarea: TareaPlanificada):
+        if not tarea.activa:
+            return
+        estaba_en_cola = tarea.estado == EN_COLA
+        tarea.estado = CANCELADA
+        tarea.fin = time.monotonic()
+        if not estaba_en_cola and hasattr(tarea.runner, "cancelar"):
+            tarea.runner.cancelar()
+        if tarea.al_cancelar:
+            tarea.al_cancelar()
+        # Una tarea en ejecución sigue ocupando su ejercicio hasta que el hilo
+        # termine de verdad; una en cola se quita sin más.
+        self._despachar()
+        self.cambios.emit()
+
+    def cancelar_clave(self, clave: str):
+        for tarea in list(self._tareas):
+            if tarea.clave == clave and tarea.activa:
+                self.cancelar(tarea)
+
+    def cancelar_todas(self):
+        for tarea in list(self._tareas):
+            if tarea.activa:
+                self.cancelar(tarea)
+
+    def tareas(self):
+        return list(self._tareas)
+
+    def ocupada(self, clave: str) -> bool:
+        """True si el ejercicio tiene alguna tarea en cola o ejecutándose."""
+        return any(t.clave == clave and t.activa for t in self._tareas)
+
+    def en_ejecucion(self) -> int:
+        return len(self._claves_ocupadas)
+
+    # ---------------- Internos ----------------
+    def _despachar(self):
+        while len(self._claves_ocupadas) < self.max_concurrentes:
+            listas = [t for t in self._tareas
+                      if t.estado == EN_COLA and t.clave not in self._claves_ocupadas]
+            if not listas:
+                return
+            # Mayor prioridad primero; a igual prioridad, la más antigua
+            tarea = max(listas, key=lambda t: (t.prioridad, -t.id))
+            self._arrancar(tarea)
+
+    def _arrancar(self, tarea: TareaPlanificada):
+        tarea.estado = EJECUTANDO
+        tarea.inicio = time.monotonic()
+        self._claves_ocupadas.add(tarea.clave)
+
+        runner = tarea.runner
+        runner.line.connect(lambda texto: self._on_linea(tarea, texto))
+        runner.finished_ok.connect(lambda codigo: self._on_fin(tarea, True, codigo))
+        runner.finished_err.connect(lambda msg: self._on_fin(tarea, False, msg))
+        runner.start()
+
+    def _on_linea(self, tarea, texto):
+        if tarea.estado == EJECUTANDO and tarea.al_linea:
+            tarea.al_linea(texto)
+
+    def _on_fin(self, tarea, ok, dato):
+        self._claves_ocupadas.discard(tarea.clave)
+        if tarea.estado == EJECUTANDO:
+            tarea.estado = TERMINADA if ok else FALLIDA
+            tarea.fin = time.monotonic()
+            callback = tarea.al_ok if ok else tarea.al_error
+            if callback:
+                callback(dato)
+        self._podar()
+        self._despachar()
+        self.cambios.emit()
+
+    def _podar(self):
+        """Olvida las tareas terminadas más antiguas (solo si su hilo ya acabó)."""
+        terminadas = [t for t in self._tareas if not t.activa]
+        sobran = len(terminadas) - self.historial
+        for t in terminadas:
+            if sobran <= 0:
+                break
+            # Una tarea cancelada en cola nunca arrancó su hilo
+            if t.inicio is None or t.runner.isFinished():
+                self._tareas.remove(t)
+                sobran -= 1
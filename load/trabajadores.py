@@ -0,0 +1,136 @@
+# load/trabajadores.py
+# ------------------------------------------------------
+# Ejecución de tareas bloqueantes (llamadas a los modelos) fuera del hilo
+# de la interfaz, con un QThreadPool.
+#
+#   ejecutor = EjecutorTareas(max_hilos=3, parent=self)
+#   tarea = ejecutor.lanzar(fn, arg1, arg2,
+#                           al_terminar=..., al_error=..., al_cancelar=...)
+#   tarea.token.cancelar()
+#
+# Los callbacks se ejecutan en el hilo de la interfaz (llegan por señales).
+# Cancelar no puede cortar una petición de red ya enviada: la tarea queda
+# marcada y su resultado se descarta al llegar, así la interfaz se libera
+# al instante aunque el proveedor esté colgado. Las funciones largas pueden
+# consultar el token (token.verificar()) entre pasos para salir antes.
+#
+# Con al_progreso=..., la función recibe además token=... y progreso=...
+# (progreso(*datos) llega a al_progreso en el hilo de la interfaz):
+#   ejecutor.lanzar(pipeline, ruta, al_progreso=self._on_progreso, ...)
+# ------------------------------------------------------
+
+import threading
+import traceback
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from monitor_ram import atribuir
+from perfilado import perfilado_activado, perfilar
+from trazas import propagar
+
+
+class TareaCancelada(Exception):
+    """La lanza TokenCancelacion.verificar() cuando se pidió cancelar."""
+
+
+class TokenCancelacion:
+    def __init__(self):
+        self._evento = threading.Event()
+
+    def cancelar(self):
+        self._evento.set()
+
+    @property
+    def cancelado(self) -> bool:
+        return self._evento.is_set()
+
+    def verificar(self):
+        if self._evento.is_set():
+            raise TareaCancelada()
+
+
+class SenalesTarea(QObject):
+    resultado = pyqtSignal(object)
+    error = pyqtSignal(str)
+    cancelada = pyqtSignal()
+    terminada = pyqtSignal()
+    progreso = pyqtSignal(tuple)
+
+
+class Tarea(QRunnable):
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.token = TokenCancelacion()
+        # Se crean en el hilo de la interfaz: los callbacks conectados corren ahí
+        self.senales = SenalesTarea()
+
+    def reportar(self, *datos):
+        """Desde el hilo de trabajo: envía un aviso de progreso (si no se canceló)."""
+        if not self.token.cancelado:
+            self.senales.progreso.emit(datos)
+
+    def run(self):
+        try:
+            if self.token.cancelado:
+                self.senales.cancelada.emit()
+                return
+            nombre = getattr(self.fn, "__qualname__", repr(self.fn))
+            with atribuir(f"tarea.{nombre}"):
+                if perfilado_activado():
+                    resultado, _ = perfilar(nombre, self.fn, *self.args, **self.kwargs)
+                else:
+                    resultado = self.fn(*self.args, **self.kwargs)
+            if self.token.cancelado:
+                self.senales.cancelada.emit()
+            else:
+                self.senales.resultado.emit(resultado)
+        except TareaCancelada:
+            self.senales.cancelada.emit()
+        except Exception as e:
+            if self.token.cancelado:
+                self.senales.cancelada.emit()
+            else:
+                self.senales.error.emit(f"{e}\n\n{traceback.format_exc()}")
+        finally:
+            self.senales.terminada.emit()
+
+
+class EjecutorTareas(QObject):
+    def __init__(self, max_hilos: int = 4, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_hilos)
+        # Referencias vivas hasta que termine cada tarea (si no, PyQt puede liberarlas antes)
+        self._activas = set()
+
+    def lanzar(self, fn, *args, al_terminar=None, al_error=None, al_cancelar=None,
+               al_progreso=None, con_token: bool = False, prioridad: int = 0, **kwargs) -> Tarea:
+        # La tarea corre con el contexto de quien la lanza (trazas.py)
+        tarea = Tarea(propagar(fn), *args, **kwargs)
+        if con_token:
+            # fn recibe token= para comprobar ella misma si se canceló
+            tarea.kwargs.update(token=tarea.token)
+        if al_progreso:
+            tarea.kwargs.update(token=tarea.token, progreso=tarea.reportar)
+            tarea.senales.progreso.connect(lambda datos: al_progreso(*datos))
+        if al_terminar:
+            tarea.senales.resultado.connect(al_terminar)
+        if al_error:
+            tarea.senales.error.connect(al_error)
+        if al_cancelar:
+            tarea.senales.cancelada.connect(al_cancelar)
+        tarea.senales.terminada.connect(lambda: self._activas.discard(tarea))
+
+        self._activas.add(tarea)
+        self.pool.start(tarea, prioridad)
+        return tarea
+
+    def cancelar_todas(self):
+        for tarea in list(self._activas):
+            tarea.token.cancelar()
+
+    def activas(self) -> int:
+        return len(self._activas)
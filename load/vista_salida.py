@@ -0,0 +1,136 @@
+# load/vista_salida.py
+# ------------------------------------------------------
+# Salida incremental para los QTextEdit de historial y de logs.
+#
+# Antes cada turno reconstruía TODO el texto (setPlainText del historial
+# completo) o hacía un append por línea, así que las sesiones largas iban
+# cada vez más lentas. Aquí:
+#   - solo se añade lo nuevo (delta), nunca se reescribe el documento;
+#   - las líneas se acumulan y se vuelcan juntas cada `intervalo_ms`
+#     (un solo repintado aunque lleguen cientos de líneas);
+#   - el documento guarda como mucho `max_bloques` párrafos: Qt descarta
+#     los más antiguos, así el coste por mensaje no depende de la longitud
+#     de la conversación. La primera vez que se llega al tope se avisa en
+#     la propia salida (y en el tooltip) de que lo anterior ya no se ve;
+#   - si el usuario subió a leer algo, no se le mueve el scroll.
+#
+#   vista = vista_de(self.txt_output)
+#   vista.agregar("👤 hola")
+#   vista.agregar_temporal("⏳ Esperando respuesta…")   # se sustituye con el siguiente agregar()
+#
+# GUI_MAX_BLOQUES (por defecto 5000) fija el tope de párrafos; 0 lo desactiva
+# y el documento guarda toda la sesión.
+# ------------------------------------------------------
+
+import os
+
+from PyQt5.QtCore import QObject, QTimer
+from PyQt5.QtGui import QTextCursor
+
+
+def _max_bloques_por_defecto() -> int:
+    try:
+        return int(os.getenv("GUI_MAX_BLOQUES", "5000"))
+    except ValueError:
+        return 5000
+
+
+class SalidaIncremental(QObject):
+    def __init__(self, widget, max_bloques: int = None, intervalo_ms: int = 50, parent=None):
+        super().__init__(parent or widget)
+        self.widget = widget
+        self._pendientes = []
+        self._temporal = None       # texto provisional pendiente de mostrar
+        self._temporal_visible = False
+        self._tope_avisado = False
+
+        max_bloques = _max_bloques_por_defecto() if max_bloques is None else max_bloques
+        self._max_bloques = max(0, max_bloques)
+        if self._max_bloques:
+            widget.document().setMaximumBlockCount(self._max_bloques)
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(intervalo_ms)
+        self._timer.timeout.connect(self.volcar)
+
+    # ---------------- API ----------------
+    def agregar(self, texto: str):
+        """Encola un mensaje (una o varias líneas). No toca el documento hasta el volcado."""
+        self._temporal = None
+        self._pendientes.append(str(texto))
+        self._programar()
+
+    def agregar_temporal(self, texto: str):
+        """
+        Muestra una línea provisional ("⏳ Esperando respuesta…") que desaparece
+        con el siguiente agregar(). Solo puede haber una.
+        """
+        self._temporal = str(texto).replace("\n", " ")
+        self._programar()
+
+    def limpiar(self):
+        self._timer.stop()
+        self._pendientes.clear()
+        self._temporal = None
+        self._temporal_visible = False
+        self._tope_avisado = False
+        self.widget.clear()
+
+    def volcar(self):
+        """Escribe de una vez todo lo pendiente al final del documento."""
+        self._timer.stop()
+        barra = self.widget.verticalScrollBar()
+        al_final = barra.value() >= barra.maximum() - 4
+
+        doc = self.widget.document()
+        cursor = QTextCursor(doc)
+        cursor.beginEditBlock()
+        if self._temporal_visible:
+            self._quitar_ultimo_bloque(cursor)
+            self._temporal_visible = False
+
+        lineas = list(self._pendientes)
+        self._pendientes.clear()
+        if lineas and self._max_bloques and not self._tope_avisado \
+                and doc.blockCount() + sum(t.count("\n") + 1 for t in lineas) >= self._max_bloques:
+            # A partir de aquí Qt empieza a descartar las primeras líneas
+            self._tope_avisado = True
+            aviso = (f"ℹ️ Esta salida muestra solo las últimas {self._max_bloques} líneas; "
+                     "las anteriores se descartan (GUI_MAX_BLOQUES=0 las conserva todas).")
+            lineas.append(aviso)
+            self.widget.setToolTip(aviso)
+        if self._temporal is not None:
+            lineas.append(self._temporal)
+            self._temporal_visible = True
+
+        if lineas:
+            cursor.movePosition(QTextCursor.End)
+            vacio = doc.isEmpty()
+            cursor.insertText(("" if vacio else "\n") + "\n".join(lineas))
+        cursor.endEditBlock()
+
+        if al_final:
+            barra.setValue(barra.maximum())
+
+    # ---------------- Internos ----------------
+    def _programar(self):
+        if not self._timer.isActive():
+            self._timer.start()
+
+    @staticmethod
+    def _quitar_ultimo_bloque(cursor: QTextCursor):
+        cursor.movePosition(QTextCursor.End)
+        inicio = cursor.document().lastBlock().position()
+        # También el salto de línea que lo separaba del bloque anterior
+        cursor.setPosition(max(0, inicio - 1), QTextCursor.KeepAnchor)
+        cursor.removeSelectedText()
+
+
+def vista_de(widget, **kwargs) -> SalidaIncremental:
+    """Devuelve la SalidaIncremental asociada al widget (la crea la primera vez)."""
+    vista = getattr(widget, "_salida_incremental", None)
+    if vista is None:
+        vista = SalidaIncremental(widget, **kwargs)
+        widget._salida_incremental = vista
+    return vista
@@ -1,12 +1,66 @@
-from PyQt5 import QtWidgets
-import sys
-from load.load_ventana_principal import Load_ventana_principal
+import time
+# Antes de las demás importaciones: el arranque medido las incluye
+_INICIO = time.perf_counter()
+
+import os  # noqa: E402
+import sys  # noqa: E402
+from PyQt5 import QtWidgets, QtCore  # noqa: E402
+from load.load_ventana_principal import Load_ventana_principal  # noqa: E402
+
+
+class MedidorPrimerPintado(QtCore.QObject):
+    """Informa el tiempo desde el arranque hasta el primer Paint de la GUI y cierra la app."""
+
+    def eventFilter(self, obj, event):
+        if event.type() == QtCore.QEvent.Paint:
+            QtWidgets.QApplication.instance().removeEventFilter(self)
+            print(f"primer_pintado_ms={(time.perf_counter() - _INICIO) * 1000:.1f}", flush=True)
+            QtCore.QTimer.singleShot(0, QtWidgets.QApplication.quit)
+        return False
+
+
+def _cerrar_escritor():
+    # Solo si algún ejercicio llegó a usar el escritor de memoria
+    escritor = sys.modules.get("escritor_memoria")
+    if escritor is not None:
+        escritor.cerrar_escritor()
+
 
 def main():
+    # --perfilar (o PERFILAR=1): cada tarea de fondo se perfila (perfilado.py)
+    if "--perfilar" in sys.argv:
+        sys.argv.remove("--perfilar")
+        from perfilado import activar
+        activar(True)
+    # Grabación / reproducción de las llamadas a los modelos (grabadora_llm.py),
+    # solo si LLM_GRABADORA lo pide
+    if os.getenv("LLM_GRABADORA", "").strip():
+        import grabadora_llm
+        grabadora_llm.instalar()
+
     app = QtWidgets.QApplication(sys.argv)
+    # Volcar la memoria pendiente de las conversaciones antes de salir
+    app.aboutToQuit.connect(_cerrar_escritor)
+    # Monitor de RAM (monitor_ram.py): muestras, tope blando y aviso de fugas
+    from monitor_ram import monitor, monitor_activado
+    if monitor_activado():
+        monitor().iniciar()
+        app.aboutToQuit.connect(monitor().detener)
+    # Métricas (metricas.py): endpoint de Prometheus e instantánea JSON, si METRICAS=1
+    if os.getenv("METRICAS", "0").strip().lower() in ("1", "true", "si", "sí"):
+        import metricas
+        metricas.iniciar()
+        app.aboutToQuit.connect(metricas.detener)
     ventana = Load_ventana_principal() 
+
+    # Medición de arranque (benchmarks/arranque_gui.py)
+    if os.getenv("GUI_MEDIR_ARRANQUE"):
+        medidor = MedidorPrimerPintado(app)
+        app.installEventFilter(medidor)
+
     ventana.show()
+
     sys.exit(app.exec_())
 
 if __name__== "__main__":
-    main()
\ No newline at end of file
+    main()
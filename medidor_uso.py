@@ -0,0 +1,375 @@
+# medidor_uso.py
+# ------------------------------------------------------
+# Contador de tokens y coste de cada llamada a un modelo (Gemini / Groq),
+# agregado por backend, modelo, función, sesión y día en SQLite.
+#
+# Las llamadas directas registran la respuesta del SDK:
+#
+#   resp = cliente.chat.completions.create(...)
+#   registrar_respuesta("groq", "llama-3.1-8b-instant", "modeloSimple", resp,
+#                       entrada=texto_prompt, salida=texto_respuesta)
+#
+# y las cadenas de LangChain, un callback en el LLM (cuenta cada
+# chain.invoke que pase por él, también dentro de cadenas compuestas):
+#
+#   llm = ChatGoogleGenerativeAI(..., callbacks=callbacks_uso("4_parseo"))
+#
+# Se usa lo que informa el proveedor (usage_metadata de Gemini y de
+# LangChain, usage de Groq). Si no viene, se estima con tiktoken si está
+# instalado o, si no, ~4 caracteres por token, y la fila queda marcada como
+# estimada.
+#
+# Presupuestos: al pasar del 80 % y del 100 % del presupuesto diario se
+# avisa una vez por día (logging.warning y los oyentes de al_alerta()).
+#
+#   python medidor_uso.py informe [--dias 7] [--por funcion|backend|modelo|sesion|dia]
+#
+# Variables de entorno:
+#   USO_LLM=1                        0 desactiva el registro
+#   USO_LLM_DB=uso_llm.db
+#   USO_SESION                       nombre de la sesión (por defecto fecha-hora-pid;
+#                                    los subprocesos la heredan)
+#   USO_PRESUPUESTO_DIARIO_USD       p. ej. 0.50 (vacío = sin presupuesto)
+#   USO_PRESUPUESTO_DIARIO_TOKENS    p. ej. 200000
+#   USO_PRECIOS                      JSON {"modelo": [usd_entrada, usd_salida]} por millón
+#                                    de tokens, para corregir la tabla PRECIOS
+# ------------------------------------------------------
+
+import os
+import sys
+import json
+import time
+import logging
+import sqlite3
+import argparse
+import threading
+
+logger = logging.getLogger(__name__)
+
+RUTA_POR_DEFECTO = "uso_llm.db"
+
+# USD por millón de tokens (entrada, salida); precios públicos aproximados
+PRECIOS = {
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+}
+
+UMBRALES_ALERTA = (0.8, 1.0)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS uso (
+    dia TEXT NOT NULL,
+    backend TEXT NOT NULL,
+    modelo TEXT NOT NULL,
+    funcion TEXT NOT NULL,
+    sesion TEXT NOT NULL,
+    llamadas INTEGER DEFAULT 0,
+    tokens_entrada INTEGER DEFAULT 0,
+    tokens_salida INTEGER DEFAULT 0,
+    llamadas_estimadas INTEGER DEFAULT 0,
+    coste_usd REAL DEFAULT 0,
+    PRIMARY KEY (dia, backend, modelo, funcion, sesion)
+);
+CREATE INDEX IF NOT EXISTS idx_uso_dia ON uso (dia);
+"""
+
+
+def uso_activado() -> bool:
+    return os.getenv("USO_LLM", "1").strip().lower() not in ("0", "false", "no")
+
+
+def _real_env(nombre: str):
+    try:
+        valor = float(os.getenv(nombre, "") or 0)
+    except ValueError:
+        return None
+    return valor if valor > 0 else None
+
+
+def sesion_actual() -> str:
+    """Sesión del proceso; se deja en el entorno para que la hereden los subprocesos."""
+    if not os.getenv("USO_SESION"):
+        os.environ["USO_SESION"] = time.strftime("%Y%m%d-%H%M%S") + f"-{os.getpid()}"
+    return os.environ["USO_SESION"]
+
+
+def backend_de(modelo: str) -> str:
+    return "gemini" if (modelo or "").lower().startswith("gemini") else "groq"
+
+
+# ---------------- Tokens ----------------
+_codificador = None
+
+
+def estimar_tokens(texto: str) -> int:
+    """Tokens aproximados de un texto (tiktoken si está instalado; si no, ~4 caracteres/token)."""
+    global _codificador
+    if not texto:
+        return 0
+    if _codificador is None:
+        try:
+            import tiktoken
+            _codificador = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _codificador = False
+    if _codificador:
+        return len(_codificador.encode(texto, disallowed_special=()))
+    return max(1, (len(texto) + 3) // 4)
+
+
+def _atributo(obj, *nombres):
+    for nombre in nombres:
+        valor = obj.get(nombre) if isinstance(obj, dict) else getattr(obj, nombre, None)
+        if valor:
+            return int(valor)
+    return 0
+
+
+def tokens_de_respuesta(resp):
+    """
+    (entrada, salida) informados por el proveedor, o None si no vienen.
+    Entiende Gemini (usage_metadata), Groq/OpenAI (usage) y los mensajes de
+    LangChain (usage_metadata o response_metadata).
+    """
+    for campo in ("usage_metadata", "usage"):
+        uso = getattr(resp, campo, None)
+        if uso:
+            entrada = _atributo(uso, "prompt_token_count", "prompt_tokens", "input_tokens")
+            salida = _atributo(uso, "candidates_token_count", "completion_tokens", "output_tokens")
+            if entrada or salida:
+                return entrada, salida
+    meta = getattr(resp, "response_metadata", None) or {}
+    for clave in ("usage_metadata", "token_usage"):
+        if meta.get(clave):
+            entrada = _atributo(meta[clave], "prompt_token_count", "prompt_tokens", "input_tokens")
+            salida = _atributo(meta[clave], "candidates_token_count", "completion_tokens",
+                               "output_tokens")
+            if entrada or salida:
+                return entrada, salida
+    return None
+
+
+def precio(modelo: str):
+    precios = dict(PRECIOS)
+    try:
+        precios.update({k: tuple(v) for k, v in json.loads(os.getenv("USO_PRECIOS", "{}")).items()})
+    except (ValueError, TypeError):
+        logger.warning("USO_PRECIOS no es un JSON válido; se usan los precios por defecto")
+    return precios.get(modelo, (0.0, 0.0))
+
+
+def coste(modelo: str, entrada: int, salida: int) -> float:
+    p_entrada, p_salida = precio(modelo)
+    return (entrada * p_entrada + salida * p_salida) / 1e6
+
+
+# ---------------- Almacén ----------------
+class MedidorUso:
+    def __init__(self, ruta: str = None):
+        self.ruta = ruta or os.getenv("USO_LLM_DB", RUTA_POR_DEFECTO)
+        # Una conexión compartida entre hilos; varios procesos escriben gracias a WAL
+        self._con = sqlite3.connect(self.ruta, check_same_thread=False, timeout=5)
+        self._con.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._avisados = set()   # (dia, tipo, umbral) ya notificados en este proceso
+        self._oyentes = []
+        with self._lock, self._con:
+            self._con.execute("PRAGMA journal_mode=WAL")
+            self._con.executescript(_ESQUEMA)
+
+    def cerrar(self):
+        with self._lock:
+            self._con.close()
+
+    def al_alerta(self, oyente):
+        """oyente(mensaje) se llama (en el hilo que registró) al cruzar un umbral."""
+        self._oyentes.append(oyente)
+
+    def registrar(self, backend: str, modelo: str, funcion: str, entrada: int, salida: int,
+                  estimada: bool = False, sesion: str = None) -> float:
+        """Suma una llamada; devuelve su coste en USD."""
+        dia = time.strftime("%Y-%m-%d")
+        usd = coste(modelo, entrada, salida)
+        with self._lock, self._con:
+            self._con.execute(
+                "INSERT INTO uso (dia, backend, modelo, funcion, sesion, llamadas, tokens_entrada, "
+                "tokens_salida, llamadas_estimadas, coste_usd) VALUES (?, ?, ?, ?, ?, 1, ?, ?, ?, ?) "
+                "ON CONFLICT (dia, backend, modelo, funcion, sesion) DO UPDATE SET "
+                "llamadas = llamadas + 1, tokens_entrada = tokens_entrada + excluded.tokens_entrada, "
+                "tokens_salida = tokens_salida + excluded.tokens_salida, "
+                "llamadas_estimadas = llamadas_estimadas + excluded.llamadas_estimadas, "
+                "coste_usd = coste_usd + excluded.coste_usd",
+                (dia, backend, modelo, funcion, sesion or sesion_actual(),
+                 entrada, salida, int(estimada), usd),
+            )
+        self._revisar_presupuesto(dia)
+        return usd
+
+    def total_dia(self, dia: str = None) -> dict:
+        dia = dia or time.strftime("%Y-%m-%d")
+        with self._lock:
+            fila = self._con.execute(
+                "SELECT COALESCE(SUM(llamadas), 0) AS llamadas, "
+                "COALESCE(SUM(tokens_entrada + tokens_salida), 0) AS tokens, "
+                "COALESCE(SUM(coste_usd), 0) AS coste_usd FROM uso WHERE dia = ?", (dia,)
+            ).fetchone()
+        return dict(fila)
+
+    def _revisar_presupuesto(self, dia: str):
+        limites = {"usd": _real_env("USO_PRESUPUESTO_DIARIO_USD"),
+                   "tokens": _real_env("USO_PRESUPUESTO_DIARIO_TOKENS")}
+        if not any(limites.values()):
+            return
+        total = self.total_dia(dia)
+        gastado = {"usd": total["coste_usd"], "tokens": total["tokens"]}
+        for tipo, limite in limites.items():
+            if not limite:
+                continue
+            cruzados = [u for u in UMBRALES_ALERTA if gastado[tipo] >= limite * u]
+            # Un solo aviso aunque se crucen dos umbrales de golpe
+            if cruzados and (dia, tipo, cruzados[-1]) not in self._avisados:
+                self._avisados.update((dia, tipo, u) for u in cruzados)
+                valor = f"{gastado[tipo]:.4f} USD" if tipo == "usd" else f"{gastado[tipo]} tokens"
+                mensaje = (f"⚠️ Uso de modelos hoy: {valor} "
+                           f"({gastado[tipo] / limite:.0%} del presupuesto diario).")
+                logger.warning(mensaje)
+                for oyente in list(self._oyentes):
+                    try:
+                        oyente(mensaje)
+                    except Exception as e:
+                        logger.debug("Oyente de alertas falló: %s", e)
+
+    def informe(self, dias: int = 7, por: str = "funcion"):
+        """Filas agregadas de los últimos `dias` días, de más a menos coste."""
+        if por not in ("funcion", "backend", "modelo", "sesion", "dia"):
+            raise ValueError(f"No se puede agrupar por {por!r}")
+        desde = time.strftime("%Y-%m-%d", time.localtime(time.time() - (dias - 1) * 86400))
+        with self._lock:
+            filas = self._con.execute(
+                f"SELECT {por} AS clave, SUM(llamadas) AS llamadas, "
+                "SUM(tokens_entrada) AS tokens_entrada, SUM(tokens_salida) AS tokens_salida, "
+                "SUM(llamadas_estimadas) AS estimadas, SUM(coste_usd) AS coste_usd "
+                f"FROM uso WHERE dia >= ? GROUP BY {por} ORDER BY coste_usd DESC, llamadas DESC",
+                (desde,),
+            ).fetchall()
+        return [dict(f) for f in filas]
+
+
+_compartido = None
+_lock_compartido = threading.Lock()
+
+
+def medidor() -> MedidorUso:
+    """Medidor único del proceso."""
+    global _compartido
+    with _lock_compartido:
+        if _compartido is None:
+            _compartido = MedidorUso()
+        return _compartido
+
+
+def registrar_respuesta(backend: str, modelo: str, funcion: str, resp=None,
+                        entrada: str = "", salida: str = ""):
+    """
+    Registra una llamada con los tokens que trae `resp` o, si no los trae,
+    estimados a partir de los textos de entrada y salida. Nunca lanza: un
+    fallo del contador no debe romper la llamada al modelo.
+    """
+    if not uso_activado():
+        return
+    try:
+        tokens = tokens_de_respuesta(resp) if resp is not None else None
+        estimada = tokens is None
+        if estimada:
+            tokens = (estimar_tokens(entrada), estimar_tokens(salida))
+        medidor().registrar(backend, modelo, funcion, tokens[0], tokens[1], estimada)
+    except Exception as e:
+        logger.debug("No se pudo registrar el uso de %s: %s", funcion, e)
+
+
+# ---------------- LangChain ----------------
+_clase_callback = None
+
+
+def callbacks_uso(funcion: str) -> list:
+    """Lista con un callback de LangChain que registra cada llamada del LLM."""
+    global _clase_callback
+    if not uso_activado():
+        return []
+    if _clase_callback is None:
+        from langchain_core.callbacks import BaseCallbackHandler
+
+        class CallbackUso(BaseCallbackHandler):
+            def __init__(self, funcion):
+                self.funcion = funcion
+                self._entradas = {}   # run_id -> texto del prompt (por si hay que estimar)
+
+            def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+                self._entradas[run_id] = "\n".join(
+                    str(m.content) for lista in messages for m in lista)
+
+            def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+                self._entradas[run_id] = "\n".join(prompts)
+
+            def on_llm_error(self, error, *, run_id, **kwargs):
+                self._entradas.pop(run_id, None)
+
+            def on_llm_end(self, response, *, run_id, **kwargs):
+                entrada = self._entradas.pop(run_id, "")
+                modelo_llm = (response.llm_output or {}).get("model_name", "")
+                for lista in response.generations:
+                    for generacion in lista:
+                        mensaje = getattr(generacion, "message", None)
+                        meta = getattr(mensaje, "response_metadata", None) or {}
+                        modelo = meta.get("model_name") or modelo_llm or "desconocido"
+                        registrar_respuesta(backend_de(modelo), modelo, self.funcion, mensaje,
+                                            entrada=entrada, salida=generacion.text)
+
+        _clase_callback = CallbackUso
+    return [_clase_callback(funcion)]
+
+
+# ---------------- Informe ----------------
+def texto_informe(filas, por: str) -> str:
+    if not filas:
+        return "Sin llamadas registradas en el periodo."
+    ancho = max(12, max(len(str(f["clave"])) for f in filas))
+    lineas = [f"{por:<{ancho}} {'llamadas':>9} {'tok. entrada':>13} {'tok. salida':>12} "
+              f"{'USD':>10} {'estimadas':>10}"]
+    for f in filas:
+        lineas.append(f"{str(f['clave']):<{ancho}} {f['llamadas']:>9} {f['tokens_entrada']:>13} "
+                      f"{f['tokens_salida']:>12} {f['coste_usd']:>10.4f} "
+                      f"{f['estimadas'] / f['llamadas'] if f['llamadas'] else 0:>10.0%}")
+    total = sum(f["coste_usd"] for f in filas)
+    lineas.append(f"{'total':<{ancho}} {sum(f['llamadas'] for f in filas):>9} "
+                  f"{sum(f['tokens_entrada'] for f in filas):>13} "
+                  f"{sum(f['tokens_salida'] for f in filas):>12} {total:>10.4f}")
+    return "\n".join(lineas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tokens y coste de las llamadas a los modelos")
+    parser.add_argument("vista", nargs="?", choices=("informe",), default="informe")
+    parser.add_argument("--dias", type=int, default=7)
+    parser.add_argument("--por", default="funcion",
+                        choices=("funcion", "backend", "modelo", "sesion", "dia"))
+    args = parser.parse_args()
+
+    m = medidor()
+    print(f"Últimos {args.dias} días, por {args.por}:")
+    print(texto_informe(m.informe(args.dias, args.por), args.por))
+
+    hoy = m.total_dia()
+    limite_usd = _real_env("USO_PRESUPUESTO_DIARIO_USD")
+    limite_tokens = _real_env("USO_PRESUPUESTO_DIARIO_TOKENS")
+    print(f"\nHoy: {hoy['llamadas']} llamadas, {hoy['tokens']} tokens, {hoy['coste_usd']:.4f} USD"
+          + (f" ({hoy['coste_usd'] / limite_usd:.0%} de {limite_usd} USD)" if limite_usd else "")
+          + (f" ({hoy['tokens'] / limite_tokens:.0%} de {limite_tokens:.0f} tokens)"
+             if limite_tokens else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
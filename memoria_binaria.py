@@ -0,0 +1,241 @@
+# memoria_binaria.py
+# ------------------------------------------------------
+# Formato binario compacto para el historial de conversación,
+# con índice de offsets para leer los mensajes bajo demanda.
+#
+#   archivo.bin      -> cabecera MAGIA + registros [tipo:1 byte][largo:4 bytes][texto utf-8]
+#   archivo.bin.idx  -> offsets (8 bytes cada uno) del inicio de cada registro
+#
+# Ambos archivos solo crecen por el final (append), así guardar un turno
+# nuevo cuesta lo mismo sin importar lo largo que sea el historial.
+#
+# Conversión desde el formato anterior:
+#   python memoria_binaria.py memoria.json memoria.bin
+# ------------------------------------------------------
+
+import os
+import sys
+import json
+import struct
+import logging
+import threading
+
+MAGIA = b"MCB1"
+_CABECERA = struct.Struct(">BI")   # tipo, largo del texto
+_OFFSET = struct.Struct(">Q")
+
+TIPOS = {"human": 0, "ai": 1, "system": 2}
+_TIPOS_INV = {v: k for k, v in TIPOS.items()}
+
+logger = logging.getLogger(__name__)
+
+
+class ConversacionBinaria:
+    """
+    Historial guardado en disco que se lee de forma perezosa.
+
+    Solo se mantiene en RAM la lista de offsets; el texto de cada mensaje
+    se lee del archivo cuando se pide (cola(), __getitem__, iteración).
+    Los mensajes nuevos se acumulan con agregar() y se escriben al
+    llamar a sincronizar().
+    """
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self.ruta_idx = ruta + ".idx"
+        self._offsets = []
+        self._pendientes = []
+        self._lock = threading.RLock()
+        self._abrir()
+
+    # ---------------- Lectura ----------------
+    def __len__(self):
+        with self._lock:
+            return len(self._offsets) + len(self._pendientes)
+
+    def __getitem__(self, i):
+        with self._lock:
+            n = len(self)
+            if isinstance(i, slice):
+                return [self[j] for j in range(*i.indices(n))]
+            if i < 0:
+                i += n
+            if not 0 <= i < n:
+                raise IndexError("índice de mensaje fuera de rango")
+            if i >= len(self._offsets):
+                return self._pendientes[i - len(self._offsets)]
+            with open(self.ruta, "rb") as f:
+                return self._leer_en(f, self._offsets[i])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def cola(self, n: int):
+        """Devuelve los últimos n mensajes como lista de (tipo, contenido)."""
+        with self._lock:
+            total = len(self)
+            inicio = max(0, total - n)
+            guardados = len(self._offsets)
+            res = []
+            if inicio < guardados:
+                with open(self.ruta, "rb") as f:
+                    for off in self._offsets[inicio:]:
+                        res.append(self._leer_en(f, off))
+            res.extend(self._pendientes[max(0, inicio - guardados):])
+            return res
+
+    # ---------------- Escritura ----------------
+    def agregar(self, tipo: str, contenido: str):
+        if tipo not in TIPOS:
+            raise ValueError(f"Tipo de mensaje desconocido: {tipo}")
+        with self._lock:
+            self._pendientes.append((tipo, str(contenido)))
+
+    def sincronizar(self):
+        """Escribe al final del archivo los mensajes pendientes."""
+        with self._lock:
+            if not self._pendientes:
+                return
+            nuevo = not os.path.exists(self.ruta)
+            with open(self.ruta, "ab") as f, open(self.ruta_idx, "ab") as fi:
+                if nuevo:
+                    f.write(MAGIA)
+                pos = f.tell()
+                offsets = []
+                partes = []
+                for tipo, contenido in self._pendientes:
+                    datos = contenido.encode("utf-8")
+                    partes.append(_CABECERA.pack(TIPOS[tipo], len(datos)))
+                    partes.append(datos)
+                    offsets.append(pos)
+                    pos += _CABECERA.size + len(datos)
+                f.write(b"".join(partes))
+                f.flush()
+                os.fsync(f.fileno())
+                # El índice se escribe después de los datos: si se corta a medias,
+                # al abrir se reconstruye a partir del archivo principal.
+                fi.write(b"".join(_OFFSET.pack(o) for o in offsets))
+            self._offsets.extend(offsets)
+            self._pendientes = []
+
+    def vaciar(self):
+        """Borra el historial en RAM y en disco."""
+        with self._lock:
+            self._offsets = []
+            self._pendientes = []
+            for ruta in (self.ruta, self.ruta_idx):
+                try:
+                    if os.path.exists(ruta):
+                        os.remove(ruta)
+                except OSError:
+                    pass
+
+    def exportar_json(self, ruta_json: str):
+        """Exporta al formato anterior (memoria.json)."""
+        history = [{"type": t, "content": c} for t, c in self]
+        with open(ruta_json, "w", encoding="utf-8") as f:
+            json.dump({"history": history}, f, ensure_ascii=False, indent=2)
+
+    # ---------------- Internos ----------------
+    def _leer_en(self, f, offset: int):
+        f.seek(offset)
+        tipo, largo = _CABECERA.unpack(f.read(_CABECERA.size))
+        return _TIPOS_INV.get(tipo, "human"), f.read(largo).decode("utf-8")
+
+    def _abrir(self):
+        if not os.path.exists(self.ruta):
+            return
+        tam = os.path.getsize(self.ruta)
+        if tam < len(MAGIA):
+            # Vacío o cortado antes de completar la cabecera: no hay mensajes
+            # que salvar, se empieza de nuevo con la cabecera escrita.
+            with open(self.ruta, "wb") as f:
+                f.write(MAGIA)
+            with open(self.ruta_idx, "wb"):
+                pass
+            return
+        with open(self.ruta, "rb") as f:
+            cabecera = f.read(len(MAGIA))
+        if cabecera != MAGIA:
+            self._apartar_corrupto()
+            return
+
+        offsets = []
+        if os.path.exists(self.ruta_idx):
+            with open(self.ruta_idx, "rb") as fi:
+                datos = fi.read()
+            usable = len(datos) - len(datos) % _OFFSET.size
+            offsets = [o for (o,) in _OFFSET.iter_unpack(datos[:usable])]
+
+        with open(self.ruta, "rb") as f:
+            if offsets and self._fin_registro(f, offsets[-1]) == tam:
+                self._offsets = offsets
+                return
+            # Índice ausente o desincronizado: se recorre solo la cabecera de cada registro
+            self._offsets, fin = self._escanear(f, tam)
+
+        if fin < tam:
+            # Registro final incompleto (corte durante la escritura)
+            with open(self.ruta, "r+b") as f:
+                f.truncate(fin)
+        with open(self.ruta_idx, "wb") as fi:
+            fi.write(b"".join(_OFFSET.pack(o) for o in self._offsets))
+
+    def _apartar_corrupto(self):
+        """Mueve a un lado un archivo que no es un historial binario y empieza vacío."""
+        destino = self.ruta + ".corrupto"
+        n = 1
+        while os.path.exists(destino):
+            destino = f"{self.ruta}.corrupto{n}"
+            n += 1
+        os.replace(self.ruta, destino)
+        try:
+            os.remove(self.ruta_idx)
+        except OSError:
+            pass
+        logger.warning("%s no es un historial binario válido; se movió a %s y se empieza vacío.",
+                       self.ruta, destino)
+
+    def _fin_registro(self, f, offset: int) -> int:
+        f.seek(offset)
+        cab = f.read(_CABECERA.size)
+        if len(cab) < _CABECERA.size:
+            return -1
+        return offset + _CABECERA.size + _CABECERA.unpack(cab)[1]
+
+    def _escanear(self, f, tam: int):
+        offsets = []
+        pos = len(MAGIA)
+        while pos < tam:
+            fin = self._fin_registro(f, pos)
+            if fin < 0 or fin > tam:
+                break
+            offsets.append(pos)
+            pos = fin
+        return offsets, pos
+
+
+def convertir_json_a_binario(ruta_json: str, ruta_bin: str) -> int:
+    """
+    Convierte un memoria.json (formato {"history": [{"type","content"}]})
+    al formato binario. Devuelve el número de mensajes convertidos.
+    """
+    with open(ruta_json, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    conv = ConversacionBinaria(ruta_bin)
+    conv.vaciar()
+    for msg in data.get("history", []):
+        if msg.get("type") in TIPOS:
+            conv.agregar(msg["type"], msg.get("content", ""))
+    conv.sincronizar()
+    return len(conv)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Uso: python memoria_binaria.py memoria.json memoria.bin")
+        sys.exit(1)
+    total = convertir_json_a_binario(sys.argv[1], sys.argv[2])
+    print(f"Convertidos {total} mensajes a {sys.argv[2]}")
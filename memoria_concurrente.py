@@ -0,0 +1,62 @@
+# memoria_concurrente.py
+# ------------------------------------------------------
+# Memoria de conversación segura para varios hilos.
+#
+# - Cada sesión guarda su historial como una TUPLA inmutable de
+#   (tipo, contenido). Los lectores toman la tupla actual sin bloquear
+#   (copy-on-write): nunca ven un historial a medio modificar.
+# - Los escritores reemplazan la tupla bajo el candado de su "franja".
+#   Hay un número fijo de candados y cada sesión usa el que le toca por
+#   hash, así sesiones distintas casi nunca compiten entre sí.
+#
+# Los mensajes (("human", "..."), ("ai", "...")) se pueden pasar tal cual
+# al placeholder {history} de un ChatPromptTemplate.
+# ------------------------------------------------------
+
+import threading
+
+SESION_POR_DEFECTO = "default"
+
+
+class MemoriaSesiones:
+    def __init__(self, franjas: int = 16):
+        self._franjas = [threading.RLock() for _ in range(max(1, franjas))]
+        self._sesiones = {}
+
+    # ---------------- Lectura (sin bloqueo) ----------------
+    def instantanea(self, sesion: str = SESION_POR_DEFECTO) -> tuple:
+        """Historial actual de la sesión; la tupla no cambia aunque otro hilo escriba."""
+        return self._sesiones.get(sesion, ())
+
+    def sesiones(self):
+        return list(self._sesiones.keys())
+
+    def __len__(self):
+        return len(self._sesiones)
+
+    # ---------------- Escritura ----------------
+    def bloqueo(self, sesion: str = SESION_POR_DEFECTO):
+        """
+        Candado de la franja de la sesión, para operaciones compuestas
+        (p. ej. agregar el turno y encolarlo en disco en el mismo orden).
+        Es reentrante: dentro se pueden llamar los métodos de escritura.
+        """
+        return self._franjas[hash(sesion) % len(self._franjas)]
+
+    def agregar(self, sesion: str, *mensajes) -> int:
+        """Añade mensajes (tipo, contenido) al final. Devuelve el largo nuevo."""
+        with self.bloqueo(sesion):
+            nuevo = self._sesiones.get(sesion, ()) + tuple(mensajes)
+            self._sesiones[sesion] = nuevo
+            return len(nuevo)
+
+    def agregar_turno(self, sesion: str, humano: str, ia: str) -> int:
+        return self.agregar(sesion, ("human", humano), ("ai", ia))
+
+    def reemplazar(self, sesion: str, mensajes):
+        with self.bloqueo(sesion):
+            self._sesiones[sesion] = tuple(mensajes)
+
+    def reiniciar(self, sesion: str = SESION_POR_DEFECTO):
+        with self.bloqueo(sesion):
+            self._sesiones.pop(sesion, None)
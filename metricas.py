@@ -0,0 +1,375 @@
+# metricas.py
+# ------------------------------------------------------
+# Contadores operativos de la aplicación, para verlos desde un Prometheus
+# central (una entrada por máquina del laboratorio) o en local.
+#
+#   contar("cache_consultas_total", cache="banco", resultado="acierto")
+#   observar("llm_latencia_segundos", 1.8, backend="gemini")
+#   registrar_medidor("sesiones_activas", lambda: len(memoria), ejercicio="7_persistencia")
+#
+# Qué se mide:
+#   - llm_peticiones_total{backend,estado}, llm_latencia_segundos{backend}:
+#     salen de los tramos "llm.*" de trazas.py (al_cerrar_tramo), así que
+#     cubren todas las llamadas ya instrumentadas sin tocarlas.
+#   - llm_respaldos_total{de,a,funcion}: Gemini falló y se pasó a Groq.
+#   - cache_consultas_total{cache,resultado}: caché de PDF y banco de preguntas.
+#   - sesiones_activas, indice_vectores, indice_bytes, llm_limitador_en_cola
+#     y ram_*: medidores que se leen al consultar (no cuestan nada entre medias).
+# Los scripts que corren en otro proceso (trabajador_scripts.py) no llegan aquí.
+#
+# Salida, con METRICAS=1:
+#   http://METRICAS_HOST:METRICAS_PUERTO/metrics        formato de texto de Prometheus
+#   http://METRICAS_HOST:METRICAS_PUERTO/metricas.json  lo mismo en JSON
+#   http://METRICAS_HOST:METRICAS_PUERTO/               tabla que se refresca sola
+#   METRICAS_ARCHIVO                                    instantánea JSON cada METRICAS_INTERVALO_S
+#
+#   python metricas.py ver [--archivo metricas.json]    tabla a partir de la instantánea
+#
+# Desactivado (por defecto), contar()/observar()/fijar() vuelven en la
+# primera línea y no se registra ningún observador de tramos.
+#
+# Variables de entorno:
+#   METRICAS=0               1 activa el registro y la exportación
+#   METRICAS_HOST=127.0.0.1  0.0.0.0 para que lo lea un Prometheus de otra máquina
+#   METRICAS_PUERTO=9464     0 = sin servidor HTTP
+#   METRICAS_ARCHIVO=metricas.json   vacío = sin instantánea
+#   METRICAS_INTERVALO_S=15
+# ------------------------------------------------------
+
+import os
+import sys
+import json
+import time
+import bisect
+import socket
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+CUBETAS_LATENCIA = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# nombre -> (tipo, ayuda)
+DESCRIPCIONES = {
+    "llm_peticiones_total": ("counter", "Llamadas a modelos por backend y estado"),
+    "llm_latencia_segundos": ("histogram", "Duración de las llamadas a modelos"),
+    "llm_respaldos_total": ("counter", "Veces que se pasó de un proveedor a otro tras un fallo"),
+    "cache_consultas_total": ("counter", "Consultas a cachés por resultado (acierto/fallo)"),
+    "sesiones_activas": ("gauge", "Sesiones de conversación en memoria"),
+    "indice_vectores": ("gauge", "Vectores en el índice FAISS cargado"),
+    "indice_bytes": ("gauge", "Tamaño aproximado del índice cargado"),
+    "llm_limitador_en_cola": ("gauge", "Llamadas esperando ficha en el limitador"),
+    "llm_limitador_peticiones_total": ("counter", "Fichas entregadas por el limitador"),
+    "llm_limitador_espera_segundos_total": ("counter", "Tiempo total esperando al limitador"),
+    "ram_rss_bytes": ("gauge", "Memoria residente del proceso"),
+    "ram_subsistema_bytes": ("gauge", "Tamaño aproximado de cada subsistema (monitor_ram.py)"),
+}
+
+
+def _entero_env(nombre: str, defecto: int) -> int:
+    try:
+        return int(os.getenv(nombre, str(defecto)))
+    except ValueError:
+        return defecto
+
+
+_activo = os.getenv("METRICAS", "0").strip().lower() in ("1", "true", "si", "sí")
+
+
+def metricas_activadas() -> bool:
+    return _activo
+
+
+# ---------------- Registro ----------------
+_lock = threading.Lock()
+_contadores = {}     # (nombre, etiquetas) -> valor
+_medidores = {}      # (nombre, etiquetas) -> valor
+_histogramas = {}    # (nombre, etiquetas) -> [cuentas por cubeta, suma, cuenta]
+_leidos = {}         # (nombre, etiquetas) -> (fn, por)
+
+
+def _clave(nombre: str, etiquetas: dict):
+    return nombre, tuple(sorted((k, str(v)) for k, v in etiquetas.items()))
+
+
+def contar(nombre: str, valor: float = 1, **etiquetas):
+    if not _activo:
+        return
+    clave = _clave(nombre, etiquetas)
+    with _lock:
+        _contadores[clave] = _contadores.get(clave, 0) + valor
+
+
+def fijar(nombre: str, valor: float, **etiquetas):
+    if not _activo:
+        return
+    with _lock:
+        _medidores[_clave(nombre, etiquetas)] = valor
+
+
+def observar(nombre: str, valor: float, cubetas=CUBETAS_LATENCIA, **etiquetas):
+    if not _activo:
+        return
+    clave = _clave(nombre, etiquetas)
+    with _lock:
+        h = _histogramas.get(clave)
+        if h is None:
+            h = _histogramas[clave] = [[0] * len(cubetas), 0.0, 0, tuple(cubetas)]
+        i = bisect.bisect_left(cubetas, valor)
+        if i < len(cubetas):
+            h[0][i] += 1
+        h[1] += valor
+        h[2] += 1
+
+
+def registrar_medidor(nombre: str, fn, por: str = None, **etiquetas):
+    """
+    Medidor que se lee al exportar: fn() -> número. Con `por`, fn() devuelve
+    {valor de la etiqueta `por`: número} (una serie por entrada).
+    Registrar otra vez el mismo nombre y etiquetas reemplaza la función.
+    """
+    with _lock:
+        _leidos[_clave(nombre, etiquetas)] = (fn, por)
+
+
+def _series():
+    """[(nombre, tipo, etiquetas dict, valor o histograma)] de todo el registro."""
+    with _lock:
+        contadores = dict(_contadores)
+        medidores = dict(_medidores)
+        histogramas = {k: (list(v[0]), v[1], v[2], v[3]) for k, v in _histogramas.items()}
+        leidos = dict(_leidos)
+
+    series = []
+    for (nombre, etq), valor in contadores.items():
+        series.append((nombre, "counter", dict(etq), valor))
+    for (nombre, etq), valor in medidores.items():
+        series.append((nombre, "gauge", dict(etq), valor))
+    for (nombre, etq), (fn, por) in leidos.items():
+        try:
+            valor = fn()
+        except Exception as e:
+            logger.debug("No se pudo leer %s: %s", nombre, e)
+            continue
+        tipo = DESCRIPCIONES.get(nombre, ("gauge", ""))[0]
+        if por:
+            for k, v in (valor or {}).items():
+                series.append((nombre, tipo, dict(etq, **{por: str(k)}), v))
+        elif valor is not None:
+            series.append((nombre, tipo, dict(etq), valor))
+    for (nombre, etq), (cuentas, suma, cuenta, cubetas) in histogramas.items():
+        acumulado, cubetas_acum = 0, {}
+        for limite, n in zip(cubetas, cuentas):
+            acumulado += n
+            cubetas_acum[repr(float(limite))] = acumulado
+        cubetas_acum["+Inf"] = cuenta
+        series.append((nombre, "histogram", dict(etq),
+                       {"cubetas": cubetas_acum, "suma": suma, "cuenta": cuenta}))
+    return sorted(series, key=lambda s: (s[0], sorted(s[2].items())))
+
+
+# ---------------- Formatos ----------------
+def _etiquetas_prom(etiquetas: dict) -> str:
+    if not etiquetas:
+        return ""
+    partes = []
+    for k, v in sorted(etiquetas.items()):
+        v = str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        partes.append(f'{k}="{v}"')
+    return "{" + ",".join(partes) + "}"
+
+
+def texto_prometheus() -> str:
+    """Formato de exposición de texto de Prometheus (0.0.4)."""
+    lineas, descritas = [], set()
+    for nombre, tipo, etiquetas, valor in _series():
+        if nombre not in descritas:
+            descritas.add(nombre)
+            ayuda = DESCRIPCIONES.get(nombre, (tipo, ""))[1]
+            if ayuda:
+                lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+        if tipo == "histogram":
+            for limite, n in valor["cubetas"].items():
+                lineas.append(f"{nombre}_bucket{_etiquetas_prom(dict(etiquetas, le=limite))} {n}")
+            lineas.append(f"{nombre}_sum{_etiquetas_prom(etiquetas)} {valor['suma']}")
+            lineas.append(f"{nombre}_count{_etiquetas_prom(etiquetas)} {valor['cuenta']}")
+        else:
+            lineas.append(f"{nombre}{_etiquetas_prom(etiquetas)} {valor}")
+    return "\n".join(lineas) + "\n"
+
+
+def instantanea() -> dict:
+    return {
+        "momento": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "maquina": socket.gethostname(),
+        "pid": os.getpid(),
+        "metricas": [{"nombre": n, "tipo": t, "etiquetas": e, "valor": v} for n, t, e, v in _series()],
+    }
+
+
+def texto_tabla(datos: dict) -> str:
+    """Tabla legible de una instantánea, con las tasas de acierto de caché ya calculadas."""
+    lineas = [f"{datos.get('maquina', '')} · pid {datos.get('pid', '')} · {datos.get('momento', '')}", ""]
+    caches = {}
+    for m in datos["metricas"]:
+        etiquetas = ",".join(f"{k}={v}" for k, v in sorted(m["etiquetas"].items()))
+        if m["tipo"] == "histogram":
+            v = m["valor"]
+            media = v["suma"] / v["cuenta"] if v["cuenta"] else 0
+            lineas.append(f"{m['nombre']:<36} {etiquetas:<40} {v['cuenta']:>8} llamadas, media {media:.2f} s")
+        else:
+            lineas.append(f"{m['nombre']:<36} {etiquetas:<40} {m['valor']:>12.6g}")
+        if m["nombre"] == "cache_consultas_total":
+            por_cache = caches.setdefault(m["etiquetas"].get("cache", "?"), {})
+            por_cache[m["etiquetas"].get("resultado")] = m["valor"]
+    for cache, cuentas in sorted(caches.items()):
+        total = sum(cuentas.values())
+        if total:
+            lineas.append(f"{'tasa de aciertos ' + cache:<36} {'':<40} {cuentas.get('acierto', 0) / total:>12.1%}")
+    return "\n".join(lineas)
+
+
+# ---------------- Fuentes automáticas ----------------
+def _al_cerrar_tramo(nombre: str, segundos: float, estado: str, atributos: dict):
+    if nombre.startswith("llm."):
+        backend = nombre[4:]
+        contar("llm_peticiones_total", backend=backend, estado=estado)
+        observar("llm_latencia_segundos", segundos, backend=backend)
+    elif nombre == "pdf.extraer" and "cache" in atributos:
+        contar("cache_consultas_total", cache="pdf",
+               resultado="acierto" if atributos["cache"] else "fallo")
+
+
+def _medidores_ram():
+    from monitor_ram import monitor, rss_actual
+    registrar_medidor("ram_rss_bytes", rss_actual)
+
+    def subsistemas():
+        muestras = monitor().muestras
+        return {k: v for k, v in muestras[-1]["subsistemas"].items() if v is not None} if muestras else {}
+    registrar_medidor("ram_subsistema_bytes", subsistemas, por="subsistema")
+
+
+# ---------------- Exportación ----------------
+class _Manejador(BaseHTTPRequestHandler):
+    def do_GET(self):
+        ruta = self.path.split("?")[0]
+        if ruta == "/metrics":
+            cuerpo, tipo = texto_prometheus(), "text/plain; version=0.0.4; charset=utf-8"
+        elif ruta == "/metricas.json":
+            cuerpo, tipo = json.dumps(instantanea(), ensure_ascii=False), "application/json"
+        elif ruta == "/":
+            tabla = texto_tabla(instantanea()).replace("&", "&amp;").replace("<", "&lt;")
+            cuerpo = ('<html><head><meta charset="utf-8"><meta http-equiv="refresh" content="5">'
+                      f"<title>Métricas</title></head><body><pre>{tabla}</pre></body></html>")
+            tipo = "text/html; charset=utf-8"
+        else:
+            self.send_error(404)
+            return
+        datos = cuerpo.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def log_message(self, formato, *args):
+        logger.debug("metricas http: " + formato, *args)
+
+
+class Exportador:
+    def __init__(self):
+        self.servidor = None
+        self._parar = threading.Event()
+        self._hilo_archivo = None
+
+    def iniciar(self):
+        global _activo
+        _activo = True
+        from trazas import al_cerrar_tramo
+        al_cerrar_tramo(_al_cerrar_tramo)
+        _medidores_ram()
+
+        puerto = _entero_env("METRICAS_PUERTO", 9464)
+        if puerto:
+            host = os.getenv("METRICAS_HOST", "127.0.0.1")
+            try:
+                self.servidor = ThreadingHTTPServer((host, puerto), _Manejador)
+                self.servidor.daemon_threads = True
+                threading.Thread(target=self.servidor.serve_forever, name="metricas-http",
+                                 daemon=True).start()
+                logger.info("Métricas en http://%s:%d/metrics", host, puerto)
+            except OSError as e:
+                logger.warning("No se pudo abrir el puerto de métricas %s:%d: %s", host, puerto, e)
+
+        if os.getenv("METRICAS_ARCHIVO", "metricas.json"):
+            self._hilo_archivo = threading.Thread(target=self._bucle_archivo, name="metricas-archivo",
+                                                  daemon=True)
+            self._hilo_archivo.start()
+
+    def _escribir_archivo(self):
+        from escritor_memoria import escribir_atomico
+        try:
+            escribir_atomico(os.getenv("METRICAS_ARCHIVO", "metricas.json"),
+                             json.dumps(instantanea(), ensure_ascii=False, indent=1))
+        except OSError as e:
+            logger.debug("No se pudo escribir la instantánea de métricas: %s", e)
+
+    def _bucle_archivo(self):
+        intervalo = max(1, _entero_env("METRICAS_INTERVALO_S", 15))
+        while not self._parar.wait(intervalo):
+            self._escribir_archivo()
+
+    def detener(self):
+        self._parar.set()
+        if self.servidor is not None:
+            self.servidor.shutdown()
+            self.servidor.server_close()
+            self.servidor = None
+        if self._hilo_archivo is not None:
+            self._hilo_archivo.join(timeout=2)
+            self._hilo_archivo = None
+            self._escribir_archivo()   # la última, con lo acumulado hasta el cierre
+
+
+_exportador = None
+
+
+def iniciar() -> Exportador:
+    """Activa el registro y arranca el servidor HTTP y la instantánea periódica (una vez por proceso)."""
+    global _exportador
+    with _lock:
+        if _exportador is not None:
+            return _exportador
+        _exportador = Exportador()
+    _exportador.iniciar()
+    return _exportador
+
+
+def detener():
+    if _exportador is not None:
+        _exportador.detener()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Métricas operativas")
+    sub = parser.add_subparsers(dest="orden", required=True)
+    ver = sub.add_parser("ver", help="tabla a partir de la instantánea JSON")
+    ver.add_argument("--archivo", default=os.getenv("METRICAS_ARCHIVO", "metricas.json"))
+    args = parser.parse_args()
+
+    try:
+        with open(args.archivo, encoding="utf-8") as f:
+            datos = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"No se pudo leer {args.archivo}: {e}", file=sys.stderr)
+        return 1
+    print(texto_tabla(datos))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,10 @@
-from groq import Groq
 from dotenv import load_dotenv
 import os
+import asyncio
+import threading
+
+from medidor_uso import registrar_respuesta
+from prefijo_estable import MedidorPrefijo
 
 class ModeloHistorial:
     def __init__(self):
@@ -12,11 +16,59 @@ class ModeloHistorial:
             raise ValueError("❌ No se encontró GROQ_API_KEY en el archivo .env")
 
         # Crear el cliente con la API key segura
-        self.cliente = Groq(api_key=api_key)
+        # (el SDK se importa aquí, no al importar este archivo)
+        from groq import Groq
+        self.cliente = Groq(api_key=api_key, timeout=float(os.getenv("GROQ_TIMEOUT", "60")))
 
         # El historial se guarda como atributo de la clase
         self.historial = [{"role": "system", "content": "Eres un asistente útil y amigable"}]
 
+        # El historial solo crece por el final: el prefijo ya es estable, solo lo medimos
+        self.medidor_prefijo = MedidorPrefijo("modelo_historial_groq")
+
+        # Un turno a la vez por conversación (varias instancias sí pueden ir en paralelo)
+        self._lock = threading.Lock()
+
+    def enviar(self, mensaje: str, token=None) -> str:
+        """
+        Envía UN mensaje, lo guarda en el historial junto con la respuesta
+        y devuelve la respuesta. No usa input()/print(), así que se puede
+        llamar desde la interfaz o desde hilos de trabajo.
+        Con `token` (algo con .cancelado, como el de la interfaz), si se
+        canceló mientras esperaba la respuesta el turno no queda en el historial.
+        """
+        with self._lock:
+            # Agregar la pregunta del usuario al historial
+            self.historial.append({"role": "user", "content": mensaje})
+
+            try:
+                # Llamada al API de Groq
+                self.medidor_prefijo.registrar(self.historial)
+                respuesta = self.cliente.chat.completions.create(
+                    model="llama-3.1-8b-instant",
+                    messages=self.historial
+                )
+            except Exception:
+                # Deshacer el append del usuario si hubo fallo
+                self.historial.pop()
+                raise
+
+            # Obtener la respuesta del chatbot y agregarla al historial
+            respuesta_chatbot = respuesta.choices[0].message.content
+            registrar_respuesta("groq", "llama-3.1-8b-instant", "modelo_historial_groq", respuesta,
+                                entrada="\n".join(m["content"] for m in self.historial),
+                                salida=respuesta_chatbot)
+            if token is not None and token.cancelado:
+                # Consulta cancelada: se deshace el turno (la respuesta se descarta)
+                self.historial.pop()
+                return respuesta_chatbot
+            self.historial.append({"role": "assistant", "content": respuesta_chatbot})
+            return respuesta_chatbot
+
+    async def enviar_async(self, mensaje: str) -> str:
+        """Versión asíncrona de enviar() (la llamada bloqueante corre en otro hilo)."""
+        return await asyncio.to_thread(self.enviar, mensaje)
+
     def modeloHistorial(self):
         print("Chatbot iniciado. Escribe 'salir' para terminar la conversación.\n")
 
@@ -27,18 +79,5 @@ class ModeloHistorial:
                 print("Chatbot terminado.")
                 break
 
-            # Agregar la pregunta del usuario al historial
-            self.historial.append({"role": "user", "content": pregunta})
-
-            # Llamada al API de Groq
-            respuesta = self.cliente.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=self.historial
-            )
-
-            # Obtener la respuesta del chatbot
-            respuesta_chatbot = respuesta.choices[0].message.content
+            respuesta_chatbot = self.enviar(pregunta)
             print("Chatbot: " + respuesta_chatbot + "\n")
-
-            # Agregar la respuesta al historial
-            self.historial.append({"role": "assistant", "content": respuesta_chatbot})
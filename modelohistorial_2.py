@@ -1,18 +1,86 @@
-from groq import Groq
 from dotenv import load_dotenv
 import os
+import asyncio
+import threading
+
+from medidor_uso import registrar_respuesta
+from prefijo_estable import MedidorPrefijo, ventana_historial
 
 load_dotenv()
 
 class ModeloHistorial:
     def __init__(self):
         # API key desde .env
-        self.cliente = Groq(api_key=os.getenv("GROQ_API_KEY", ""))
+        # El SDK se importa al crear el modelo, no al importar este archivo
+        from groq import Groq
+        self.cliente = Groq(api_key=os.getenv("GROQ_API_KEY", ""), timeout=float(os.getenv("GROQ_TIMEOUT", "60")))
         self.model = "llama-3.1-8b-instant"
 
         # Máximo de TURNOS (pares user/assistant) a conservar -> 4
         self.MAX_HISTORIAL_LENGTH = 4
 
+        # Historial propio, por si quien llama no pasa el suyo
+        self.historial = [{"role": "system", "content": "Eres un asistente útil y amable."}]
+
+        self.medidor_prefijo = MedidorPrefijo("modelohistorial_2")
+
+        # Un turno a la vez por instancia (varias instancias sí pueden ir en paralelo)
+        self._lock = threading.Lock()
+
+    def enviar(self, mensaje: str, historial=None, token=None) -> str:
+        """
+        Envía UN mensaje y devuelve la respuesta, sin input()/print().
+        Actualiza 'historial' (o self.historial si no se pasa) y lo recorta
+        a los últimos 4 pares (8 msgs) + system. Si Groq falla, deshace el
+        turno y relanza la excepción; con `token` (algo con .cancelado),
+        también lo deshace si se canceló mientras esperaba la respuesta.
+        """
+        if historial is None:
+            historial = self.historial
+
+        with self._lock:
+            # Añadir mensaje de usuario
+            historial.append({"role": "user", "content": mensaje})
+
+            try:
+                # Llamada a Groq
+                self.medidor_prefijo.registrar(historial)
+                respuesta = self.cliente.chat.completions.create(
+                    model=self.model,
+                    messages=historial
+                )
+                respuesta_chatbot = respuesta.choices[0].message.content
+                registrar_respuesta("groq", self.model, "modelohistorial_2", respuesta,
+                                    entrada="\n".join(m["content"] for m in historial),
+                                    salida=respuesta_chatbot)
+            except Exception:
+                # Deshacer el último append del usuario si hubo fallo
+                if historial and historial[-1].get("role") == "user":
+                    historial.pop()
+                raise
+
+            if token is not None and token.cancelado:
+                # Consulta cancelada: se deshace el turno (la respuesta se descarta)
+                historial.pop()
+                return respuesta_chatbot
+
+            # Añadir mensaje del asistente
+            historial.append({"role": "assistant", "content": respuesta_chatbot})
+
+            # ---- Recorte a 4 pares (user/assistant) + system ----
+            # (con HISTORIAL_PREFIJO_ESTABLE=1 se recorta por bloques; ver prefijo_estable.py)
+            conv = [m for m in historial if m.get("role") in ("user", "assistant")]
+            if len(conv) > self.MAX_HISTORIAL_LENGTH * 2:
+                conv = ventana_historial(conv, self.MAX_HISTORIAL_LENGTH * 2)
+                base = [m for m in historial if m.get("role") == "system"]
+                historial[:] = base + conv
+
+            return respuesta_chatbot
+
+    async def enviar_async(self, mensaje: str, historial=None) -> str:
+        """Versión asíncrona de enviar() (la llamada bloqueante corre en otro hilo)."""
+        return await asyncio.to_thread(self.enviar, mensaje, historial)
+
     def modelohistorial(self, historial=None):
         """
         Usa una lista 'historial' mutable que nos pasa la UI.
@@ -30,31 +98,8 @@ class ModeloHistorial:
                 print("Chatbot terminado.")
                 break
 
-            # Añadir mensaje de usuario
-            historial.append({"role": "user", "content": pregunta})
-
             try:
-                # Llamada a Groq
-                respuesta = self.cliente.chat.completions.create(
-                    model=self.model,
-                    messages=historial
-                )
-                respuesta_chatbot = respuesta.choices[0].message.content
-
+                respuesta_chatbot = self.enviar(pregunta, historial)
                 print("Chatbot: " + respuesta_chatbot + "\n")
-
-                # Añadir mensaje del asistente
-                historial.append({"role": "assistant", "content": respuesta_chatbot})
-
-                # ---- Recorte a 4 pares (user/assistant) + system ----
-                conv = [m for m in historial if m.get("role") in ("user", "assistant")]
-                if len(conv) > self.MAX_HISTORIAL_LENGTH * 2:
-                    conv = conv[-self.MAX_HISTORIAL_LENGTH * 2:]
-                    base = [m for m in historial if m.get("role") == "system"]
-                    historial[:] = base + conv
-
             except Exception as e:
                 print(f"Ocurrió un error al comunicarse con el API de Groq: {e}")
-                # Deshacer el último append del usuario si hubo fallo
-                if historial and historial[-1].get("role") == "user":
-                    historial.pop()
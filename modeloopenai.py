@@ -1,7 +1,9 @@
-from groq import Groq
 from dotenv import load_dotenv
 import os
 
+from medidor_uso import registrar_respuesta
+from trazas import tramo, trazado
+
 # Cargar variables de entorno (GROQ_API_KEY)
 load_dotenv()
 
@@ -10,6 +12,7 @@ class ModeloOpenAI:
         # El cliente puede construirse una vez o en cada llamada; aquí lo creamos al usarlo
         pass
 
+    @trazado("modeloSimple")
     def modeloSimple(self, texto: str) -> str:
         """
         Recibe 'texto' desde la interfaz gráfica, llama al modelo Groq
@@ -27,12 +30,17 @@ class ModeloOpenAI:
             return resp_text
 
         try:
-            cliente = Groq(api_key=api_key)
-            respuesta = cliente.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=[{"role": "user", "content": texto}],
-            )
+            # El SDK se importa al primer uso para no frenar el arranque de la GUI
+            from groq import Groq
+            cliente = Groq(api_key=api_key, timeout=float(os.getenv("GROQ_TIMEOUT", "60")))
+            with tramo("llm.groq", modelo="llama-3.1-8b-instant"):
+                respuesta = cliente.chat.completions.create(
+                    model="llama-3.1-8b-instant",
+                    messages=[{"role": "user", "content": texto}],
+                )
             contenido = respuesta.choices[0].message.content
+            registrar_respuesta("groq", "llama-3.1-8b-instant", "modeloSimple", respuesta,
+                                entrada=texto, salida=contenido)
             print(contenido)  # compatibilidad
             return contenido
         except Exception as e:
@@ -0,0 +1,384 @@
+# monitor_ram.py
+# ------------------------------------------------------
+# Monitor de memoria para sesiones largas de la interfaz.
+#
+# Un hilo toma cada RAM_INTERVALO_S una muestra del RSS del proceso (y de
+# tracemalloc si está activo) y del tamaño de cada subsistema registrado:
+#
+#   registrar_subsistema("ejercicio.8_memoria.py", medir=uso_memoria, liberar=liberar_memoria)
+#
+# medir() devuelve bytes aproximados y se llama en cada muestra, así que
+# debe ser barato: contadores (vectores del índice, número de fragmentos...)
+# mejor que recorrer objetos. tamano_aprox() recorre el grafo entero; úsalo
+# solo si medida_profunda() lo permite. liberar(), si se da, suelta lo que
+# se pueda reconstruir después (índices FAISS, módulos cacheados...).
+#
+# El crecimiento también se atribuye a ventanas y tareas:
+#
+#   with atribuir("ventana.langchain"):
+#       ventana.exec_()
+#
+# guarda cuánto subió el RSS (y lo trazado por tracemalloc) mientras duró el
+# bloque. Si hay varias tareas a la vez, cada una se lleva también lo que
+# asignaron las demás: es una pista de dónde mirar, no una cuenta exacta.
+#
+# Tope blando (RAM_TOPE_MB): si el RSS lo supera, se llama a liberar() de
+# los subsistemas, del más grande al más pequeño, hasta bajar del 90 % del
+# tope. Si el RSS sube de forma sostenida más de RAM_FUGA_MB_H por hora, se
+# avisa de una posible fuga con los subsistemas y tareas que más crecieron.
+#
+# Variables de entorno:
+#   RAM_MONITOR=1          0 desactiva el monitor de la interfaz
+#   RAM_INTERVALO_S=30     segundos entre muestras
+#   RAM_TOPE_MB=0          tope blando de RSS (0 = sin tope)
+#   RAM_FUGA_MB_H=50       pendiente a partir de la que se avisa de una fuga
+#   RAM_MUESTRAS=120       muestras que se conservan para la tendencia
+#   RAM_TRACEMALLOC=0      1 activa tracemalloc durante toda la sesión (más lento)
+#   RAM_MEDIDA_PROFUNDA=0  1 mide los subsistemas recorriendo sus objetos con
+#                          tamano_aprox() (más exacto, pero cuesta en cada muestra)
+# ------------------------------------------------------
+
+import os
+import gc
+import sys
+import time
+import types
+import ctypes
+import logging
+import threading
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+# Fracción del tope a la que hay que bajar al liberar
+OBJETIVO_TOPE = 0.9
+# Mínimo de muestras (y de minutos) antes de juzgar la tendencia
+MIN_MUESTRAS_TENDENCIA = 6
+MIN_MINUTOS_TENDENCIA = 5
+# Segundos entre dos liberaciones automáticas (si tras liberar sigue por
+# encima del tope, no tiene sentido repetirlo en cada muestra)
+ENFRIAMIENTO_LIBERAR = 300
+
+
+def _entero_env(nombre: str, defecto: int) -> int:
+    try:
+        return int(os.getenv(nombre, str(defecto)))
+    except ValueError:
+        return defecto
+
+
+def monitor_activado() -> bool:
+    return os.getenv("RAM_MONITOR", "1").strip().lower() not in ("0", "false", "no")
+
+
+def medida_profunda() -> bool:
+    """True si los medir() pueden recorrer objetos con tamano_aprox()."""
+    return os.getenv("RAM_MEDIDA_PROFUNDA", "0").strip().lower() in ("1", "true", "si", "sí")
+
+
+# ---------------- Medidas ----------------
+def rss_actual() -> int:
+    """RSS del proceso en bytes (psutil si está instalado; si no, /proc o el pico de getrusage)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    import resource
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico if sys.platform == "darwin" else pico * 1024
+
+
+def tamano_aprox(obj, limite: int = 100_000) -> int:
+    """
+    Bytes aproximados de obj y de lo que cuelga de él (contenedores y
+    __dict__ de objetos), visitando como mucho `limite` objetos. No entra
+    en módulos, clases ni funciones.
+    """
+    vistos = set()
+    pila = [obj]
+    total = 0
+    while pila and len(vistos) < limite:
+        o = pila.pop()
+        if id(o) in vistos or isinstance(o, (type, types.ModuleType, types.FunctionType,
+                                             types.MethodType, types.BuiltinFunctionType)):
+            continue
+        vistos.add(id(o))
+        total += sys.getsizeof(o, 0)
+        try:
+            if isinstance(o, dict):
+                pila.extend(list(o.keys()))
+                pila.extend(list(o.values()))
+            elif isinstance(o, (list, tuple, set, frozenset, deque)):
+                pila.extend(list(o))
+            elif not isinstance(o, (str, bytes, int, float)) and hasattr(o, "__dict__"):
+                pila.append(o.__dict__)
+        except RuntimeError:
+            # Otro hilo cambió el contenedor mientras se recorría: se cuenta lo visto
+            continue
+    return total
+
+
+def _devolver_al_so():
+    """Pide a glibc que devuelva al sistema la memoria libre del montículo (solo Linux)."""
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def _mb(n) -> str:
+    return "—" if n is None else f"{n / MB:.1f} MB"
+
+
+# ---------------- Monitor ----------------
+class MonitorMemoria:
+    def __init__(self):
+        self.intervalo = max(1, _entero_env("RAM_INTERVALO_S", 30))
+        self.tope = max(0, _entero_env("RAM_TOPE_MB", 0)) * MB
+        self.fuga_mb_h = max(1, _entero_env("RAM_FUGA_MB_H", 50))
+        self.muestras = deque(maxlen=max(MIN_MUESTRAS_TENDENCIA, _entero_env("RAM_MUESTRAS", 120)))
+        self._subsistemas = {}    # nombre -> (medir, liberar)
+        self._iniciales = {}      # nombre -> primer tamaño medido
+        self._atribuciones = {}   # etiqueta -> [veces, rss, traza]
+        self._liberaciones = []   # (hora, motivo, bytes recuperados)
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._hilo = None
+        self._tracemalloc = False
+        self._base_traza = None
+        self._ultimo_aviso_fuga = 0.0
+        self._ultima_liberacion = 0.0
+        self.rss_inicial = None
+        self.rss_pico = 0
+
+    @property
+    def activo(self) -> bool:
+        return self._hilo is not None
+
+    # ---------------- Registro ----------------
+    def registrar_subsistema(self, nombre: str, medir, liberar=None):
+        """Registra (o reemplaza) un subsistema; medir() -> bytes, liberar() opcional."""
+        with self._lock:
+            self._subsistemas[nombre] = (medir, liberar)
+
+    def quitar_subsistema(self, nombre: str):
+        with self._lock:
+            self._subsistemas.pop(nombre, None)
+            self._iniciales.pop(nombre, None)
+
+    @contextmanager
+    def atribuir(self, etiqueta: str):
+        """Atribuye a `etiqueta` lo que crezca la memoria mientras dura el bloque."""
+        if not self.activo:
+            yield
+            return
+        rss = rss_actual()
+        traza = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        try:
+            yield
+        finally:
+            delta_rss = rss_actual() - rss
+            delta_traza = (tracemalloc.get_traced_memory()[0] - traza
+                           if traza is not None and tracemalloc.is_tracing() else 0)
+            with self._lock:
+                acumulado = self._atribuciones.setdefault(etiqueta, [0, 0, 0])
+                acumulado[0] += 1
+                acumulado[1] += delta_rss
+                acumulado[2] += delta_traza
+
+    # ---------------- Ciclo de vida ----------------
+    def iniciar(self):
+        if self.activo:
+            return
+        if os.getenv("RAM_TRACEMALLOC", "0") == "1":
+            from perfilado import iniciar_memoria
+            iniciar_memoria()
+            self._tracemalloc = True
+            self._base_traza = tracemalloc.take_snapshot()
+        self.rss_inicial = rss_actual()
+        self._parar.clear()
+        self._hilo = threading.Thread(target=self._bucle, name="monitor-ram", daemon=True)
+        self._hilo.start()
+        logger.info("Monitor de memoria: muestras cada %d s, tope %s", self.intervalo,
+                    _mb(self.tope) if self.tope else "sin tope")
+
+    def detener(self):
+        """Para el hilo y deja el informe final en el log."""
+        if not self.activo:
+            return
+        self._parar.set()
+        self._hilo.join(timeout=5)
+        logger.info("Memoria al terminar la sesión:\n%s", self.informe())
+        self._hilo = None
+        if self._tracemalloc:
+            from perfilado import detener_memoria
+            detener_memoria()
+            self._tracemalloc = False
+            self._base_traza = None
+
+    def _bucle(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.muestrear()
+            except Exception:
+                logger.exception("Fallo al tomar la muestra de memoria")
+
+    # ---------------- Muestras ----------------
+    def _medir_subsistemas(self) -> dict:
+        with self._lock:
+            subsistemas = dict(self._subsistemas)
+        tamanos = {}
+        for nombre, (medir, _) in subsistemas.items():
+            try:
+                tamanos[nombre] = int(medir() or 0)
+            except Exception as e:
+                logger.debug("No se pudo medir %s: %s", nombre, e)
+                tamanos[nombre] = None
+        with self._lock:
+            for nombre, tam in tamanos.items():
+                if tam is not None:
+                    self._iniciales.setdefault(nombre, tam)
+        return tamanos
+
+    def muestrear(self) -> dict:
+        rss = rss_actual()
+        self.rss_pico = max(self.rss_pico, rss)
+        muestra = {
+            "t": time.time(),
+            "rss": rss,
+            "traza": tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None,
+            "subsistemas": self._medir_subsistemas(),
+        }
+        self.muestras.append(muestra)
+        if self.tope and rss > self.tope and time.time() - self._ultima_liberacion >= ENFRIAMIENTO_LIBERAR:
+            self.liberar(f"RSS {_mb(rss)} por encima del tope {_mb(self.tope)}", muestra["subsistemas"])
+        self._revisar_tendencia()
+        return muestra
+
+    def tendencia_mb_h(self):
+        """Pendiente (mínimos cuadrados) del RSS en MB/hora sobre las muestras guardadas."""
+        muestras = list(self.muestras)
+        if (len(muestras) < MIN_MUESTRAS_TENDENCIA
+                or muestras[-1]["t"] - muestras[0]["t"] < MIN_MINUTOS_TENDENCIA * 60):
+            return None
+        t0 = muestras[0]["t"]
+        xs = [(m["t"] - t0) / 3600 for m in muestras]
+        ys = [m["rss"] / MB for m in muestras]
+        mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+        den = sum((x - mx) ** 2 for x in xs)
+        return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / den if den else None
+
+    def _revisar_tendencia(self):
+        pendiente = self.tendencia_mb_h()
+        ahora = time.time()
+        if pendiente is None or pendiente < self.fuga_mb_h or ahora - self._ultimo_aviso_fuga < 3600:
+            return
+        self._ultimo_aviso_fuga = ahora
+        logger.warning("⚠️ Posible fuga de memoria: el RSS sube %.0f MB/h.\n%s",
+                       pendiente, self.informe())
+
+    # ---------------- Liberación ----------------
+    def liberar(self, motivo: str = "manual", tamanos: dict = None) -> int:
+        """
+        Llama a liberar() de los subsistemas, del más grande al más pequeño,
+        hasta bajar del 90 % del tope (o todos, si no hay tope).
+        Devuelve los bytes de RSS recuperados.
+        """
+        if tamanos is None:
+            tamanos = self._medir_subsistemas()
+        with self._lock:
+            liberables = [(tamanos.get(n) or 0, n, liberar)
+                          for n, (_, liberar) in self._subsistemas.items() if liberar]
+        antes = rss_actual()
+        liberados = []
+        for _, nombre, liberar in sorted(liberables, key=lambda x: x[0], reverse=True):
+            try:
+                liberar()
+                liberados.append(nombre)
+            except Exception:
+                logger.exception("Fallo al liberar %s", nombre)
+            gc.collect()
+            _devolver_al_so()
+            if self.tope and rss_actual() <= self.tope * OBJETIVO_TOPE:
+                break
+        recuperado = antes - rss_actual()
+        self._ultima_liberacion = time.time()
+        with self._lock:
+            self._liberaciones.append((time.strftime("%H:%M:%S"), motivo, recuperado))
+        logger.warning("🧹 Memoria liberada (%s): %s -> %s recuperados",
+                       motivo, ", ".join(liberados) or "nada que liberar", _mb(recuperado))
+        return recuperado
+
+    # ---------------- Informe ----------------
+    def informe(self) -> str:
+        rss = rss_actual()
+        pendiente = self.tendencia_mb_h()
+        lineas = [f"RSS: {_mb(rss)} (inicio {_mb(self.rss_inicial)}, pico {_mb(max(self.rss_pico, rss))})"
+                  + ("" if pendiente is None else f", tendencia {pendiente:+.1f} MB/h")]
+        if tracemalloc.is_tracing():
+            actual, pico = tracemalloc.get_traced_memory()
+            lineas.append(f"tracemalloc: {_mb(actual)} (pico {_mb(pico)})")
+
+        tamanos = self.muestras[-1]["subsistemas"] if self.muestras else self._medir_subsistemas()
+        with self._lock:
+            iniciales = dict(self._iniciales)
+            atribuciones = dict(self._atribuciones)
+            liberaciones = list(self._liberaciones)
+        if tamanos:
+            lineas.append("Subsistemas (tamaño, crecimiento desde la primera muestra):")
+            for nombre, tam in sorted(tamanos.items(), key=lambda x: x[1] or 0, reverse=True):
+                inicial = iniciales.get(nombre)
+                crece = "" if tam is None or inicial is None else f" ({(tam - inicial) / MB:+.1f} MB)"
+                lineas.append(f"  {nombre:<32} {_mb(tam)}{crece}")
+        if atribuciones:
+            lineas.append("Ventanas y tareas (crecimiento de RSS acumulado):")
+            for etiqueta, (veces, d_rss, d_traza) in sorted(atribuciones.items(),
+                                                             key=lambda x: x[1][1], reverse=True)[:15]:
+                traza = f", trazado {d_traza / MB:+.1f} MB" if d_traza else ""
+                lineas.append(f"  {etiqueta:<32} {d_rss / MB:+.1f} MB ({veces}x{traza})")
+        if self._base_traza is not None and tracemalloc.is_tracing():
+            lineas.append("Líneas que más crecieron desde el inicio (tracemalloc):")
+            for stat in tracemalloc.take_snapshot().compare_to(self._base_traza, "lineno")[:5]:
+                marco = stat.traceback[0]
+                lineas.append(f"  {marco.filename}:{marco.lineno}  {stat.size_diff / MB:+.2f} MB")
+        if liberaciones:
+            hora, motivo, recuperado = liberaciones[-1]
+            lineas.append(f"Liberaciones: {len(liberaciones)} (última a las {hora}: "
+                          f"{motivo}, {_mb(recuperado)})")
+        return "\n".join(lineas)
+
+
+# ---------------- Instancia del proceso ----------------
+_monitor = None
+_lock_monitor = threading.Lock()
+
+
+def monitor() -> MonitorMemoria:
+    global _monitor
+    if _monitor is None:
+        with _lock_monitor:
+            if _monitor is None:
+                _monitor = MonitorMemoria()
+    return _monitor
+
+
+def registrar_subsistema(nombre: str, medir, liberar=None):
+    monitor().registrar_subsistema(nombre, medir, liberar)
+
+
+def quitar_subsistema(nombre: str):
+    monitor().quitar_subsistema(nombre)
+
+
+def atribuir(etiqueta: str):
+    """Context manager; no hace nada si el monitor no está en marcha."""
+    return monitor().atribuir(etiqueta)
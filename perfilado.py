@@ -0,0 +1,212 @@
+# perfilado.py
+# ------------------------------------------------------
+# Modo de perfilado de tareas: cada tarea de fondo (FunctionRunner de la
+# ventana LangChain y las tareas de EjecutorTareas) se ejecuta bajo
+# cProfile y con dos instantáneas de tracemalloc (antes y después), y se
+# guarda en PERFILES_DIR:
+#
+#   <fecha>-<tarea>.pstats      para pstats / snakeviz
+#   <fecha>-<tarea>.txt         top de funciones por tiempo acumulado
+#   <fecha>-<tarea>.memoria.txt top de líneas que más memoria retuvieron y el pico
+#   <fecha>-<tarea>.collapsed   pilas "a;b;c microsegundos", listas para
+#                               flamegraph.pl o speedscope
+#
+# Se activa con PERFILAR=1, con `python main_gui.py --perfilar` o con la
+# casilla "Perfilar tareas" de la ventana LangChain (activar()).
+#
+#   resultado, rutas = perfilar("8_memoria.preguntar", preguntar, "¿De qué trata?")
+#
+# Las pilas colapsadas se reconstruyen a partir del grafo llamador ->
+# llamado de cProfile, repartiendo el tiempo de cada función entre quienes
+# la llamaron en proporción a lo que cada uno consumió; es la misma
+# aproximación que usan los conversores de pstats a flame graph.
+#
+# tracemalloc es global al proceso: si hay varias tareas perfilándose a la
+# vez, sus asignaciones se mezclan (el pico también). En Python 3.12+ solo
+# puede haber un cProfile activo a la vez; las demás tareas quedan solo con
+# el perfil de memoria.
+#
+# Variables de entorno:
+#   PERFILAR=0              1 activa el modo al arrancar
+#   PERFILES_DIR=perfiles
+#   PERFILES_TOP=25         líneas en los top de tiempo y memoria
+#   PERFILES_MARCOS=1       marcos de pila que guarda tracemalloc por asignación
+# ------------------------------------------------------
+
+import os
+import re
+import time
+import pstats
+import cProfile
+import logging
+import threading
+import tracemalloc
+from collections import Counter, defaultdict
+
+logger = logging.getLogger(__name__)
+
+# Por debajo de esto (µs) no se sigue bajando por una rama del grafo
+MIN_US_RAMA = 50
+MAX_PROFUNDIDAD = 80
+
+
+def _entero_env(nombre: str, defecto: int) -> int:
+    try:
+        return int(os.getenv(nombre, str(defecto)))
+    except ValueError:
+        return defecto
+
+
+_activo = os.getenv("PERFILAR", "0").strip().lower() in ("1", "true", "si", "sí")
+
+
+def perfilado_activado() -> bool:
+    return _activo
+
+
+def activar(valor: bool = True):
+    global _activo
+    _activo = bool(valor)
+    logger.info("Perfilado de tareas %s", "activado" if _activo else "desactivado")
+
+
+# ---------------- tracemalloc compartido ----------------
+# Con contador de usos: lo comparten las tareas perfiladas y monitor_ram.py,
+# y solo se para cuando ya nadie lo usa.
+_lock_memoria = threading.Lock()
+_tareas_memoria = 0
+
+
+def iniciar_memoria():
+    global _tareas_memoria
+    with _lock_memoria:
+        if _tareas_memoria == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(max(1, _entero_env("PERFILES_MARCOS", 1)))
+        tracemalloc.reset_peak()
+        _tareas_memoria += 1
+
+
+def detener_memoria():
+    global _tareas_memoria
+    with _lock_memoria:
+        _tareas_memoria -= 1
+        if _tareas_memoria == 0:
+            tracemalloc.stop()
+
+
+def _instantanea():
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ))
+
+
+# ---------------- Pilas colapsadas ----------------
+def _etiqueta(func) -> str:
+    archivo, linea, nombre = func
+    if archivo == "~":
+        return nombre.replace(";", ",")
+    return f"{os.path.basename(archivo)}:{nombre}:{linea}".replace(";", ",")
+
+
+def pilas_colapsadas(stats: pstats.Stats) -> Counter:
+    """{"a;b;c": microsegundos de tiempo propio de c bajo esa pila}."""
+    datos = stats.stats   # func -> (cc, nc, tt, ct, {llamador: (cc, nc, tt, ct)})
+    hijos = defaultdict(list)
+    for func, (_, _, _, _, llamadores) in datos.items():
+        for llamador, arista in llamadores.items():
+            hijos[llamador].append((func, arista[3]))
+    pilas = Counter()
+
+    def recorrer(func, pila, en_pila, peso, profundidad):
+        _, _, tt, ct, _ = datos[func]
+        pila = pila + (_etiqueta(func),)
+        propio = tt * peso * 1e6
+        if propio >= 1:
+            pilas[";".join(pila)] += propio
+        if profundidad >= MAX_PROFUNDIDAD:
+            return
+        en_pila = en_pila | {func}
+        for hijo, ct_arista in hijos.get(func, ()):
+            ct_hijo = datos[hijo][3]
+            if hijo in en_pila or ct_hijo <= 0 or ct_arista * peso * 1e6 < MIN_US_RAMA:
+                continue
+            recorrer(hijo, pila, en_pila, peso * min(1.0, ct_arista / ct_hijo), profundidad + 1)
+
+    for func, (_, _, _, _, llamadores) in datos.items():
+        if not llamadores:
+            recorrer(func, (), frozenset(), 1.0, 0)
+    return pilas
+
+
+# ---------------- Guardado ----------------
+def _base_archivo(nombre: str) -> str:
+    carpeta = os.getenv("PERFILES_DIR", "perfiles")
+    os.makedirs(carpeta, exist_ok=True)
+    seguro = re.sub(r"[^\w.-]+", "_", nombre).strip("_")[:60] or "tarea"
+    marca = time.strftime("%Y%m%d-%H%M%S") + f"-{int(time.time() * 1000) % 1000:03d}"
+    return os.path.join(carpeta, f"{marca}-{seguro}")
+
+
+def _guardar(nombre: str, perfil, antes, despues, pico: int, segundos: float) -> dict:
+    top = max(1, _entero_env("PERFILES_TOP", 25))
+    base = _base_archivo(nombre)
+    rutas = {}
+
+    if perfil is not None:
+        rutas["pstats"] = base + ".pstats"
+        perfil.dump_stats(rutas["pstats"])
+        rutas["resumen"] = base + ".txt"
+        with open(rutas["resumen"], "w", encoding="utf-8") as f:
+            f.write(f"Tarea: {nombre}\nDuración: {segundos:.3f} s\n\n")
+            pstats.Stats(perfil, stream=f).strip_dirs().sort_stats("cumulative").print_stats(top)
+        rutas["collapsed"] = base + ".collapsed"
+        with open(rutas["collapsed"], "w", encoding="utf-8") as f:
+            for pila, us in sorted(pilas_colapsadas(pstats.Stats(perfil)).items()):
+                f.write(f"{pila} {int(round(us))}\n")
+
+    rutas["memoria"] = base + ".memoria.txt"
+    with open(rutas["memoria"], "w", encoding="utf-8") as f:
+        f.write(f"Tarea: {nombre}\nPico de memoria trazada: {pico / 1024:.1f} KiB\n\n")
+        f.write(f"Top {top} líneas por memoria retenida al terminar:\n")
+        for stat in despues.compare_to(antes, "lineno")[:top]:
+            marco = stat.traceback[0]
+            f.write(f"  {marco.filename}:{marco.lineno}  {stat.size_diff / 1024:+.1f} KiB "
+                    f"({stat.count_diff:+d} bloques, total {stat.size / 1024:.1f} KiB)\n")
+    return rutas
+
+
+# ---------------- API ----------------
+def perfilar(nombre: str, fn, *args, **kwargs):
+    """
+    Ejecuta fn(*args, **kwargs) bajo cProfile y tracemalloc.
+    Devuelve (resultado, rutas); si fn lanza, la excepción sigue su curso
+    (el perfil se guarda igual). Un fallo al guardar solo se registra.
+    """
+    iniciar_memoria()
+    antes = _instantanea()
+    perfil = cProfile.Profile()
+    inicio = time.perf_counter()
+    rutas = {}
+    try:
+        try:
+            perfil.enable()
+        except ValueError:  # 3.12+: ya hay otro cProfile activo en el proceso
+            perfil = None
+        try:
+            resultado = fn(*args, **kwargs)
+        finally:
+            if perfil is not None:
+                perfil.disable()
+    finally:
+        segundos = time.perf_counter() - inicio
+        despues = _instantanea()
+        pico = tracemalloc.get_traced_memory()[1]
+        detener_memoria()
+        try:
+            rutas = _guardar(nombre, perfil, antes, despues, pico, segundos)
+            logger.info("Perfil de %s guardado en %s", nombre, rutas.get("pstats", rutas["memoria"]))
+        except OSError as e:
+            logger.warning("No se pudo guardar el perfil de %s: %s", nombre, e)
+    return resultado, rutas
@@ -0,0 +1,117 @@
+# prefijo_estable.py
+# ------------------------------------------------------
+# Armado del historial pensando en el caché de prompts del proveedor.
+#
+# Los proveedores (Groq, Gemini) reutilizan el cómputo de un prompt cuando
+# su INICIO es idéntico al de una petición anterior. Si el historial se
+# recorta "deslizando" un turno cada vez, el prefijo cambia en cada
+# petición y el caché nunca acierta.
+#
+# Con el modo estable (HISTORIAL_PREFIJO_ESTABLE=1) los turnos antiguos se
+# descartan en bloques completos de HISTORIAL_TAM_BLOQUE turnos: el prefijo
+# queda congelado durante varios turnos y solo cambia la cola.
+#
+# MedidorPrefijo registra, por petición, qué fracción del prompt coincide
+# con el inicio de la petición anterior (reutilización de prefijo).
+# ------------------------------------------------------
+
+import os
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def modo_estable() -> bool:
+    return os.getenv("HISTORIAL_PREFIJO_ESTABLE", "0").strip().lower() in ("1", "true", "si", "sí")
+
+
+def tam_bloque() -> int:
+    try:
+        return max(1, int(os.getenv("HISTORIAL_TAM_BLOQUE", "4")))
+    except ValueError:
+        return 4
+
+
+def ventana_historial(mensajes, max_mensajes: int, estable: bool = None, bloque_mensajes: int = None):
+    """
+    Devuelve la parte del historial que se envía al modelo.
+
+    - Modo normal: los últimos `max_mensajes` (ventana deslizante).
+    - Modo estable: se descartan mensajes antiguos en múltiplos de
+      `bloque_mensajes`, conservando entre max_mensajes y
+      max_mensajes + bloque_mensajes - 1 mensajes.
+    """
+    mensajes = list(mensajes)
+    sobrantes = len(mensajes) - max_mensajes
+    if sobrantes <= 0:
+        return mensajes
+
+    if estable is None:
+        estable = modo_estable()
+    if not estable:
+        return mensajes[-max_mensajes:] if max_mensajes > 0 else []
+
+    if bloque_mensajes is None:
+        bloque_mensajes = tam_bloque() * 2  # pares usuario/asistente
+    descartar = (sobrantes // bloque_mensajes) * bloque_mensajes
+    return mensajes[descartar:]
+
+
+def _texto_mensaje(m) -> str:
+    """Representación comparable de un mensaje (dict de Groq, mensaje de LangChain o tupla)."""
+    if isinstance(m, dict):
+        return f"{m.get('role', '')}:{m.get('content', '')}"
+    if isinstance(m, (tuple, list)) and len(m) == 2:
+        return f"{m[0]}:{m[1]}"
+    return f"{getattr(m, 'type', '')}:{getattr(m, 'content', m)}"
+
+
+class MedidorPrefijo:
+    """
+    Compara cada petición con la anterior (de la misma sesión) y calcula la
+    proporción de caracteres que forman un prefijo común (mensaje a mensaje).
+    """
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self._anteriores = {}
+        self._lock = threading.Lock()
+        self.peticiones = 0
+        self.ultimo_ratio = 0.0
+        self._chars_reutilizados = 0
+        self._chars_totales = 0
+
+    def registrar(self, mensajes, sesion=None) -> float:
+        textos = [_texto_mensaje(m) for m in mensajes]
+        total = sum(len(t) for t in textos)
+
+        with self._lock:
+            comun = 0
+            for previo, actual in zip(self._anteriores.get(sesion, ()), textos):
+                if previo != actual:
+                    break
+                comun += len(actual)
+            self._anteriores[sesion] = textos
+
+            ratio = (comun / total) if total else 0.0
+            self.peticiones += 1
+            self.ultimo_ratio = ratio
+            self._chars_reutilizados += comun
+            self._chars_totales += total
+
+        logger.info(
+            "[%s] petición %d: reutilización de prefijo %.0f%% (%d/%d caracteres)",
+            self.nombre, self.peticiones, ratio * 100, comun, total,
+        )
+        return ratio
+
+    def ratio_acumulado(self) -> float:
+        with self._lock:
+            if not self._chars_totales:
+                return 0.0
+            return self._chars_reutilizados / self._chars_totales
+
+    def reiniciar(self, sesion=None):
+        with self._lock:
+            self._anteriores.pop(sesion, None)
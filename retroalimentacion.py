@@ -0,0 +1,208 @@
+# retroalimentacion.py
+# ------------------------------------------------------
+# Retroalimentación del cuestionario sin esperar al modelo.
+#
+# Las preguntas se generan con una explicación breve por opción
+# (cuestionario_ia.py) y se guardan con ellas en el banco. Al calificar,
+# el informe se arma al instante con plantillas: por cada pregunta, si
+# acertó, qué eligió, por qué esa opción es (in)correcta y cuál era la
+# buena. El puntaje ya se calculaba en local.
+#
+# El comentario del profesor hecho por el modelo (narrativa) queda como
+# añadido opcional: la ventana lo pide en segundo plano y lo agrega al
+# informe cuando llega. CUESTIONARIO_NARRATIVA=0 lo desactiva.
+# ------------------------------------------------------
+
+import os
+import re
+
+from cuestionario_ia import LETRAS, MODELO_GEMINI, MODELO_GROQ
+from limitador import limitador_llm
+from medidor_uso import registrar_respuesta
+from metricas import contar
+from trazas import tramo, trazado
+
+LIMITE_TEXTO_NARRATIVA = 3000
+
+
+def narrativa_activada() -> bool:
+    return os.getenv("CUESTIONARIO_NARRATIVA", "1").strip().lower() not in ("0", "false", "no")
+
+
+# ---------------- Evaluación local ----------------
+def letra_respuesta(texto: str) -> str:
+    """Primera letra A-D que aparezca en la respuesta ("" si no hay)."""
+    m = re.search(r"[ABCD]", (texto or "").strip().upper())
+    return m.group(0) if m else ""
+
+
+def puntaje(letras, correctas) -> int:
+    """
+    Puntaje sobre 100 repartido entre las preguntas (20 por pregunta con 5).
+    Las preguntas sin letra correcta A-D no puntúan. Es la regla de la
+    ventana y, vectorizada, la de calificador_lote.calcular_puntajes.
+    """
+    aciertos = 0
+    for letra, correcta in zip(letras, correctas):
+        if letra == correcta and correcta in LETRAS:
+            aciertos += 1
+    return round(aciertos * 100 / max(1, len(correctas)))
+
+
+def evaluar(preguntas_mc, letras):
+    """
+    Compara la letra elegida en cada pregunta con la correcta.
+    Devuelve una lista de dicts con lo necesario para el informe.
+    """
+    evaluacion = []
+    for i, item in enumerate(preguntas_mc):
+        opciones = list(item.get("opciones", []))
+        explicaciones = list(item.get("explicaciones") or [])
+        explicaciones += [""] * (len(opciones) - len(explicaciones))
+        correcta = (item.get("correcta") or "").upper()[:1]
+        letra = letras[i] if i < len(letras) else ""
+
+        def opcion(l):
+            k = LETRAS.index(l) if l in LETRAS else -1
+            return (opciones[k], explicaciones[k]) if 0 <= k < len(opciones) else ("", "")
+
+        evaluacion.append({
+            "numero": i + 1,
+            "letra": letra,
+            "correcta": correcta,
+            "acierto": bool(letra) and letra == correcta,
+            "opcion_elegida": opcion(letra)[0],
+            "explicacion_elegida": opcion(letra)[1],
+            "opcion_correcta": opcion(correcta)[0],
+            "explicacion_correcta": opcion(correcta)[1],
+        })
+    return evaluacion
+
+
+def _conclusion(aciertos: int, total: int) -> str:
+    if total and aciertos == total:
+        return "Excelente: dominas el contenido evaluado."
+    if aciertos >= total * 0.6:
+        return "Buen trabajo: comprendes las ideas principales; repasa las preguntas falladas."
+    if aciertos >= total * 0.4:
+        return "Comprensión parcial: conviene volver a leer las secciones de las preguntas falladas."
+    return "Todavía hay conceptos clave por afianzar: repasa el documento y vuelve a intentarlo."
+
+
+def informe_local(preguntas_mc, letras, puntaje: int) -> str:
+    """Informe de retroalimentación armado con plantillas (sin llamar al modelo)."""
+    evaluacion = evaluar(preguntas_mc, letras)
+    lineas = [f"Puntaje: {puntaje}/100", ""]
+    for e in evaluacion:
+        n = e["numero"]
+        if not e["correcta"]:
+            lineas.append(f"⚪ Pregunta {n}: el examen no indicaba la opción correcta.")
+        elif not e["letra"]:
+            lineas.append(f"⚪ Pregunta {n}: sin respuesta. "
+                          f"La correcta era {e['correcta']}) {e['opcion_correcta']}.")
+            if e["explicacion_correcta"]:
+                lineas.append(f"   {e['explicacion_correcta']}")
+        elif e["acierto"]:
+            lineas.append(f"✅ Pregunta {n}: correcta ({e['letra']}) {e['opcion_correcta']}.")
+            if e["explicacion_correcta"]:
+                lineas.append(f"   {e['explicacion_correcta']}")
+        else:
+            lineas.append(f"❌ Pregunta {n}: elegiste {e['letra']}) {e['opcion_elegida']}.")
+            if e["explicacion_elegida"]:
+                lineas.append(f"   {e['explicacion_elegida']}")
+            lineas.append(f"   La correcta era {e['correcta']}) {e['opcion_correcta']}.")
+            if e["explicacion_correcta"]:
+                lineas.append(f"   {e['explicacion_correcta']}")
+        lineas.append("")
+
+    aciertos = sum(e["acierto"] for e in evaluacion)
+    lineas.append(f"Conclusión: {_conclusion(aciertos, len(evaluacion))}")
+    return "\n".join(lineas)
+
+
+# ---------------- Narrativa opcional (modelo) ----------------
+def construir_prompt_narrativa(texto_tema: str, preguntas_mc, letras) -> str:
+    """
+    Prompt corto para el comentario del profesor: el detalle por pregunta
+    ya lo da el informe local, aquí solo se pide la valoración global.
+    """
+    bloque = []
+    for e, item in zip(evaluar(preguntas_mc, letras), preguntas_mc):
+        estado = "correcta" if e["acierto"] else ("sin responder" if not e["letra"] else "incorrecta")
+        bloque.append(
+            f"- {item.get('pregunta', '').strip()} -> {estado}"
+            + ("" if e["acierto"] or not e["letra"] else
+               f" (eligió «{e['opcion_elegida']}», la correcta era «{e['opcion_correcta']}»)")
+        )
+    bloque = "\n".join(bloque)
+
+    return f"""
+Eres un profesor universitario de Inteligencia Artificial.
+
+Contenido del tema (extracto):
+\"\"\"{texto_tema[:LIMITE_TEXTO_NARRATIVA]}\"\"\"
+
+Resultado del estudiante en un cuestionario de opción múltiple:
+{bloque}
+
+Escribe un comentario breve (3 a 5 frases) en español sobre qué tan bien comprendió
+el tema y qué conceptos concretos debería repasar. No repitas pregunta por pregunta
+ni des un puntaje numérico.
+"""
+
+
+@trazado("calificar.narrativa")
+def generar_narrativa(generador, texto_tema: str, preguntas_mc, letras, token=None, progreso=None):
+    """
+    Pide el comentario del profesor (Gemini y, si falla, Groq).
+    Pensado para un hilo de fondo (EjecutorTareas pasa token y progreso).
+    Devuelve (texto, origen); lanza RuntimeError si ningún modelo respondió.
+    """
+    prompt = construir_prompt_narrativa(texto_tema, preguntas_mc, letras)
+    generador.configurar()
+    limitador = limitador_llm()
+    errores = []
+
+    if generador.gemini_model:
+        try:
+            limitador.adquirir(token)
+            with tramo("llm.gemini"):
+                resp = generador.gemini_model.generate_content(prompt)
+                texto = (resp.text or "").strip()
+            registrar_respuesta("gemini", MODELO_GEMINI, "calificar.narrativa", resp,
+                                entrada=prompt, salida=texto)
+            if texto:
+                return texto, "Gemini"
+        except Exception as e:
+            if token is not None and token.cancelado:
+                raise
+            errores.append(f"Gemini: {e}")
+
+    if generador.groq_client:
+        if generador.gemini_model:
+            contar("llm_respaldos_total", de="gemini", a="groq", funcion="calificar.narrativa")
+        try:
+            limitador.adquirir(token)
+            with tramo("llm.groq"):
+                resp = generador.groq_client.chat.completions.create(
+                    model=MODELO_GROQ,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": "Eres un profesor de IA que evalúa respuestas de estudiantes en español.",
+                        },
+                        {"role": "user", "content": prompt},
+                    ],
+                    temperature=0.3,
+                )
+                texto = (resp.choices[0].message.content or "").strip()
+            registrar_respuesta("groq", MODELO_GROQ, "calificar.narrativa", resp,
+                                entrada=prompt, salida=texto)
+            if texto:
+                return texto, "Groq"
+        except Exception as e:
+            if token is not None and token.cancelado:
+                raise
+            errores.append(f"Groq: {e}")
+
+    raise RuntimeError("No se pudo obtener el comentario de la IA. " + "; ".join(errores))
@@ -0,0 +1,386 @@
+# trabajador_scripts.py
+# ------------------------------------------------------
+# Pool de procesos "calientes" para ejecutar los scripts de ejercicios
+# (1_llmchain.py, ...) sin pagar en cada clic el arranque del intérprete
+# ni la importación de LangChain / Gemini.
+#
+# Cada trabajador es un proceso de Python que importa los módulos pesados
+# una sola vez y luego atiende trabajos por su stdin. El protocolo es una
+# línea JSON por mensaje:
+#
+#   GUI -> trabajador: {"id": 1, "script": "...", "cwd": "...",
+#                       "env": {"PROMPT_TEMA": "..."}, "quitar_env": []}
+#   trabajador -> GUI: {"id": 1, "tipo": "linea", "texto": "..."}   (una por línea de stdout)
+#                      {"id": 1, "tipo": "fin", "codigo": 0, "stderr": "..."}
+#
+# El script se ejecuta con runpy como "__main__", con las variables de
+# entorno del trabajo aplicadas solo mientras dura. Al terminar cada
+# trabajo se ejecutan los atexit que registraron los módulos del proyecto
+# y esos módulos se descargan (ver _aislar_trabajo); las bibliotecas
+# siguen cargadas. Tras TRABAJADOR_MAX_TRABAJOS trabajos el proceso se recicla.
+#
+# Uso desde la GUI (ver ScriptRunner en load/load_ventana_langchain.py):
+#   pool = obtener_pool()
+#   codigo, stderr = pool.ejecutar(ruta, env, cwd, al_linea=print)
+#
+# Variables de entorno:
+#   SCRIPTS_POOL=0              desactiva el pool (un subproceso por ejecución)
+#   SCRIPTS_TRABAJADORES=2      procesos calientes
+#   TRABAJADOR_MAX_TRABAJOS=50  trabajos antes de reciclar un proceso
+# ------------------------------------------------------
+
+import os
+import io
+import sys
+import json
+import queue
+import runpy
+import atexit
+import logging
+import threading
+import traceback
+import subprocess
+from contextlib import contextmanager
+
+from trazas import tramo
+
+logger = logging.getLogger(__name__)
+
+# Lo que cuesta segundos importar en cada ejecución en frío
+MODULOS_PRECARGA = (
+    "dotenv",
+    "langchain.prompts",
+    "langchain.chains",
+    "langchain_core.runnables",
+    "langchain_google_genai",
+)
+
+
+def pool_activado() -> bool:
+    return os.getenv("SCRIPTS_POOL", "1").strip().lower() not in ("0", "false", "no")
+
+
+# ====================================================================
+# Lado del trabajador (proceso hijo)
+# ====================================================================
+class _SalidaPorLineas(io.TextIOBase):
+    """stdout del script: cada línea completa se envía como mensaje JSON."""
+
+    def __init__(self, enviar):
+        self._enviar = enviar
+        self._pendiente = ""
+
+    def writable(self):
+        return True
+
+    def write(self, texto):
+        self._pendiente += texto
+        while "\n" in self._pendiente:
+            linea, self._pendiente = self._pendiente.split("\n", 1)
+            self._enviar(linea)
+        return len(texto)
+
+    def flush(self):
+        pass
+
+    def cerrar(self):
+        if self._pendiente:
+            self._enviar(self._pendiente)
+            self._pendiente = ""
+
+
+def _aplicar_env(env: dict, quitar: list) -> dict:
+    """Aplica las variables del trabajo y devuelve lo necesario para deshacerlo."""
+    previas = {}
+    for clave in list(env) + list(quitar):
+        previas[clave] = os.environ.get(clave)
+    for clave in quitar:
+        os.environ.pop(clave, None)
+    os.environ.update(env)
+    return previas
+
+
+def _restaurar_env(previas: dict):
+    for clave, valor in previas.items():
+        if valor is None:
+            os.environ.pop(clave, None)
+        else:
+            os.environ[clave] = valor
+
+
+@contextmanager
+def _aislar_trabajo(carpetas: tuple, errores):
+    """
+    Lo que un script deja en el proceso no pasa al siguiente trabajo:
+    - los atexit.register() de módulos del proyecto (los de `carpetas`) se
+      ejecutan al terminar el trabajo, p. ej. el volcado a disco de
+      escritor_memoria, en lugar de esperar a que se recicle el proceso;
+    - los módulos del proyecto importados durante el trabajo se quitan de
+      sys.modules, así sus globales y singletons se crean de nuevo.
+    Las bibliotecas se quedan cargadas (y sus atexit, para el final del
+    proceso): es lo que hace rápido al pool, y muchas extensiones en C no
+    soportan reimportarse.
+    """
+    previos = set(sys.modules)
+    salidas = []
+    registrar_real, quitar_real = atexit.register, atexit.unregister
+
+    def es_local(modulo) -> bool:
+        archivo = getattr(modulo, "__file__", None)
+        return bool(archivo) and os.path.abspath(archivo).startswith(carpetas)
+
+    def registrar(fn, *args, **kwargs):
+        if es_local(sys.modules.get(getattr(fn, "__module__", None) or "")):
+            salidas.append((fn, args, kwargs))
+            return fn
+        return registrar_real(fn, *args, **kwargs)
+
+    def quitar(fn):
+        salidas[:] = [s for s in salidas if s[0] != fn]
+        quitar_real(fn)
+
+    atexit.register, atexit.unregister = registrar, quitar
+    try:
+        yield
+    finally:
+        atexit.register, atexit.unregister = registrar_real, quitar_real
+        for fn, args, kwargs in reversed(salidas):
+            try:
+                fn(*args, **kwargs)
+            except Exception:
+                errores.write(traceback.format_exc())
+        for nombre in list(sys.modules):
+            if nombre not in previos and es_local(sys.modules[nombre]):
+                del sys.modules[nombre]
+
+
+def _ejecutar_trabajo(trabajo: dict, canal):
+    id_ = trabajo.get("id")
+
+    def enviar(mensaje: dict):
+        mensaje["id"] = id_
+        canal.write(json.dumps(mensaje, ensure_ascii=False) + "\n")
+        canal.flush()
+
+    salida = _SalidaPorLineas(lambda linea: enviar({"tipo": "linea", "texto": linea}))
+    errores = io.StringIO()
+    previas = _aplicar_env(trabajo.get("env") or {}, trabajo.get("quitar_env") or [])
+    cwd_previo = os.getcwd()
+    stdout, stderr, stdin, argv = sys.stdout, sys.stderr, sys.stdin, sys.argv
+    codigo = 0
+    try:
+        os.chdir(trabajo.get("cwd") or cwd_previo)
+        sys.stdout, sys.stderr = salida, errores
+        # stdin es el canal de trabajos: el script no debe leerlo
+        sys.stdin = io.StringIO("")
+        sys.argv = [trabajo["script"]]
+        carpetas = tuple({os.path.join(os.path.dirname(os.path.abspath(p)), "")
+                          for p in (__file__, trabajo["script"])})
+        # Con TRAZA_PADRE en el env del trabajo, el tramo cuelga del de la GUI
+        with tramo("script.ejecutar", script=os.path.basename(trabajo["script"]), pid=os.getpid()), \
+                _aislar_trabajo(carpetas, errores):
+            runpy.run_path(trabajo["script"], run_name="__main__")
+    except SystemExit as e:
+        if isinstance(e.code, int):
+            codigo = e.code
+        elif e.code is not None:
+            errores.write(str(e.code))
+            codigo = 1
+    except BaseException:
+        errores.write(traceback.format_exc())
+        codigo = 1
+    finally:
+        salida.cerrar()
+        sys.stdout, sys.stderr, sys.stdin, sys.argv = stdout, stderr, stdin, argv
+        os.chdir(cwd_previo)
+        _restaurar_env(previas)
+
+    enviar({"tipo": "fin", "codigo": codigo, "stderr": errores.getvalue().strip()})
+
+
+def main_trabajador():
+    # El canal de mensajes es una copia del stdout original; el descriptor 1
+    # pasa a apuntar a stderr para que nada escrito a bajo nivel (gRPC, C...)
+    # se cuele en el protocolo.
+    canal = os.fdopen(os.dup(1), "w", encoding="utf-8", buffering=1)
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+    for modulo in MODULOS_PRECARGA:
+        try:
+            __import__(modulo)
+        except Exception as e:  # el script fallará después con un error claro
+            logger.debug("No se pudo precargar %s: %s", modulo, e)
+    # LLM_GRABADORA se hereda de la GUI: los scripts graban o reproducen en el mismo casete
+    from grabadora_llm import instalar
+    instalar()
+
+    canal.write(json.dumps({"tipo": "listo", "pid": os.getpid()}) + "\n")
+    canal.flush()
+
+    for linea in sys.stdin:
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            trabajo = json.loads(linea)
+        except ValueError:
+            continue
+        _ejecutar_trabajo(trabajo, canal)
+
+
+# ====================================================================
+# Lado de la GUI (proceso padre)
+# ====================================================================
+class TrabajadorCaido(RuntimeError):
+    """El proceso trabajador murió a mitad de un trabajo (o fue cancelado)."""
+
+
+class _Proceso:
+    def __init__(self):
+        self.proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+            env=os.environ.copy(),
+        )
+        # Variables de entorno con las que nació: los trabajos solo envían la diferencia
+        self.env_base = os.environ.copy()
+        self.trabajos = 0
+        self.listo = False
+
+    def vivo(self) -> bool:
+        return self.proc.poll() is None
+
+    def leer(self) -> dict:
+        while True:
+            linea = self.proc.stdout.readline()
+            if not linea:
+                raise TrabajadorCaido("El proceso trabajador terminó inesperadamente.")
+            try:
+                return json.loads(linea)
+            except ValueError:
+                continue
+
+    def cerrar(self):
+        try:
+            if self.vivo():
+                self.proc.stdin.close()
+                self.proc.wait(timeout=2)
+        except Exception:
+            pass
+        if self.vivo():
+            self.proc.kill()
+
+
+class PoolScripts:
+    def __init__(self, tam: int = None, max_trabajos: int = None):
+        self.tam = max(1, tam or int(os.getenv("SCRIPTS_TRABAJADORES", "2")))
+        self.max_trabajos = max_trabajos or int(os.getenv("TRABAJADOR_MAX_TRABAJOS", "50"))
+        self._libres = queue.Queue()
+        self._lock = threading.Lock()
+        self._ids = 0
+        self._iniciado = False
+        self._cerrado = False
+
+    def iniciar(self):
+        """Arranca los procesos (no espera a que terminen de importar)."""
+        with self._lock:
+            if self._iniciado:
+                return
+            self._iniciado = True
+        for _ in range(self.tam):
+            self._libres.put(_Proceso())
+
+    def ejecutar(self, script: str, env: dict = None, cwd: str = None,
+                 al_linea=None, al_iniciar=None):
+        """
+        Ejecuta `script` en un trabajador caliente (bloquea hasta que termine).
+        `al_iniciar(cancelar)` recibe una función que mata el trabajo en curso.
+        Devuelve (codigo, stderr).
+        """
+        if self._cerrado:
+            raise RuntimeError("El pool de scripts está cerrado.")
+        self.iniciar()
+        proceso = self._libres.get()
+        if not proceso.vivo():
+            proceso = _Proceso()
+
+        env = dict(env if env is not None else os.environ)
+        with self._lock:
+            self._ids += 1
+            id_ = self._ids
+        trabajo = {
+            "id": id_,
+            "script": str(script),
+            "cwd": str(cwd or os.getcwd()),
+            "env": {k: v for k, v in env.items() if proceso.env_base.get(k) != v},
+            "quitar_env": [k for k in proceso.env_base if k not in env],
+        }
+
+        devolver = True
+        try:
+            if al_iniciar:
+                al_iniciar(proceso.proc.kill)
+            proceso.proc.stdin.write(json.dumps(trabajo, ensure_ascii=False) + "\n")
+            proceso.proc.stdin.flush()
+            while True:
+                mensaje = proceso.leer()
+                tipo = mensaje.get("tipo")
+                if tipo == "listo":
+                    proceso.listo = True
+                elif mensaje.get("id") != id_:
+                    continue
+                elif tipo == "linea":
+                    if al_linea:
+                        al_linea(mensaje.get("texto", ""))
+                elif tipo == "fin":
+                    proceso.trabajos += 1
+                    return int(mensaje.get("codigo", 1)), mensaje.get("stderr", "")
+        except (TrabajadorCaido, BrokenPipeError, OSError):
+            devolver = False
+            proceso.cerrar()
+            raise TrabajadorCaido("El proceso trabajador terminó a mitad del script (¿cancelado?).")
+        finally:
+            if self._cerrado:
+                # El pool se cerró mientras corría el trabajo: nadie cerraría uno nuevo
+                proceso.cerrar()
+            elif devolver:
+                # Tras un uso largo se recicla (las bibliotecas que importan los
+                # scripts siguen cargadas; ver _aislar_trabajo)
+                if proceso.trabajos >= self.max_trabajos or not proceso.vivo():
+                    proceso.cerrar()
+                    proceso = _Proceso()
+                self._libres.put(proceso)
+            else:
+                self._libres.put(_Proceso())
+
+    def cerrar(self):
+        self._cerrado = True
+        while True:
+            try:
+                self._libres.get_nowait().cerrar()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def obtener_pool() -> PoolScripts:
+    """Pool compartido por la aplicación (se crea al primer uso)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PoolScripts()
+                atexit.register(_pool.cerrar)
+    return _pool
+
+
+if __name__ == "__main__":
+    main_trabajador()
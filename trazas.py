@@ -0,0 +1,461 @@
+# trazas.py
+# ------------------------------------------------------
+# Trazas ligeras para saber en qué se va el tiempo: lectura del PDF,
+# troceado, embeddings, búsqueda en FAISS, armado del prompt, red del
+# modelo, parseo y renderizado en la interfaz.
+#
+#   from trazas import tramo, trazado
+#
+#   with tramo("rag.buscar", k=3) as t:
+#       docs = retriever.invoke(pregunta)
+#       t.atributos["docs"] = len(docs)
+#
+#   @trazado("llm.groq")
+#   def llamar(...): ...
+#
+# Cada tramo (span) tiene traza, id, padre, duración, atributos y estado,
+# y se escribe como una línea al cerrarse. El tramo activo vive en un
+# contextvar, así que los tramos anidados se enlazan solos dentro de un
+# hilo. Para otros hilos y procesos:
+#   - hilos:       propagar(fn) -> fn que corre con el contexto actual
+#                  (ThreadPoolExecutor y QThread no lo copian solos)
+#   - subprocesos: env_con_traza(env) añade TRAZA_PADRE (formato W3C
+#                  traceparent) y el archivo de salida; el hijo cuelga sus
+#                  tramos de ahí (también en los trabajadores calientes de
+#                  trabajador_scripts.py, que aplican el env por trabajo).
+#
+# Resumen con p50/p95 por tramo:
+#   python trazas.py resumen [--archivo .trazas/trazas.jsonl] [--ultimos 5000]
+#   python trazas.py ultima          (árbol de la última traza)
+#
+# Variables de entorno:
+#   TRAZAS=0                           1 las activa; desactivadas, tramo() no hace nada
+#                                      (salvo medir para los observadores de al_cerrar_tramo())
+#   TRAZAS_ARCHIVO=.trazas/trazas.jsonl
+#   TRAZAS_MAX_MB=20                   al pasar de este tamaño el archivo se renombra a
+#                                      .1 (sustituye al anterior) y se empieza otro;
+#                                      0 = sin tope
+#   TRAZAS_FORMATO=jsonl               jsonl | otlp (una línea OTLP/JSON por tramo,
+#                                      como el exportador a archivo de OpenTelemetry)
+# ------------------------------------------------------
+
+import os
+import sys
+import json
+import math
+import time
+import atexit
+import argparse
+import threading
+import functools
+import contextvars
+from collections import defaultdict, deque
+
+SERVICIO = "langchain-gui"
+ENV_PADRE = "TRAZA_PADRE"
+
+# Cada cuántas líneas escritas se comprueba el tamaño del archivo
+_COMPROBAR_CADA = 100
+
+_actual = contextvars.ContextVar("tramo_actual", default=None)
+
+
+def _entero_env(nombre: str, defecto: int) -> int:
+    try:
+        return int(os.getenv(nombre, str(defecto)))
+    except ValueError:
+        return defecto
+
+
+def trazas_activadas() -> bool:
+    return os.getenv("TRAZAS", "0").strip().lower() in ("1", "true", "si", "sí")
+
+
+def _archivo() -> str:
+    return os.getenv("TRAZAS_ARCHIVO", os.path.join(".trazas", "trazas.jsonl"))
+
+
+def _nuevo_id(bytes_: int) -> str:
+    return os.urandom(bytes_).hex()
+
+
+# ---------------- Salida ----------------
+class _Sumidero:
+    """
+    Añade una línea por tramo al archivo (un write por línea: seguro entre
+    procesos) y lo rota al pasar de TRAZAS_MAX_MB.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ruta = None
+        self._fd = None
+        self._escritos = 0
+
+    def escribir(self, registro: dict):
+        linea = (json.dumps(_a_otlp(registro) if os.getenv("TRAZAS_FORMATO", "jsonl") == "otlp"
+                            else registro, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        ruta = _archivo()
+        with self._lock:
+            try:
+                if ruta != self._ruta:
+                    self._cerrar()
+                    carpeta = os.path.dirname(ruta)
+                    if carpeta:
+                        os.makedirs(carpeta, exist_ok=True)
+                    self._abrir(ruta)
+                self._escritos += 1
+                if self._escritos % _COMPROBAR_CADA == 0:
+                    self._rotar_si_hace_falta()
+                os.write(self._fd, linea)
+            except OSError:
+                pass  # trazar nunca debe romper la aplicación
+
+    def _abrir(self, ruta: str):
+        self._fd = os.open(ruta, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._ruta = ruta
+
+    def _rotar_si_hace_falta(self):
+        ruta = self._ruta
+        try:
+            actual = os.stat(ruta)
+        except FileNotFoundError:
+            actual = None
+        if actual is None or actual.st_ino != os.fstat(self._fd).st_ino:
+            # Otro proceso ya lo rotó (o lo borraron): se sigue en el nuevo
+            self._cerrar()
+            self._abrir(ruta)
+            return
+        tope = _entero_env("TRAZAS_MAX_MB", 20) * 1024 * 1024
+        if tope > 0 and actual.st_size >= tope:
+            os.replace(ruta, ruta + ".1")
+            self._cerrar()
+            self._abrir(ruta)
+
+    def _cerrar(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd, self._ruta = None, None
+
+    def cerrar(self):
+        with self._lock:
+            self._cerrar()
+
+
+_sumidero = _Sumidero()
+atexit.register(_sumidero.cerrar)
+
+
+def _a_otlp(r: dict) -> dict:
+    """Un tramo en el formato JSON de OTLP (resourceSpans -> scopeSpans -> spans)."""
+    def valor(v):
+        if isinstance(v, bool):
+            return {"boolValue": v}
+        if isinstance(v, int):
+            return {"intValue": str(v)}
+        if isinstance(v, float):
+            return {"doubleValue": v}
+        return {"stringValue": str(v)}
+
+    atributos = [{"key": k, "value": valor(v)} for k, v in r["atributos"].items()]
+    atributos += [{"key": "thread.name", "value": valor(r["hilo"])}]
+    tramo_otlp = {
+        "traceId": r["traza"],
+        "spanId": r["id"],
+        "name": r["nombre"],
+        "kind": 1,
+        "startTimeUnixNano": str(r["inicio_ns"]),
+        "endTimeUnixNano": str(r["inicio_ns"] + int(r["duracion_ms"] * 1e6)),
+        "attributes": atributos,
+        "status": {"code": 2, "message": r.get("error", "")} if r["estado"] == "error" else {"code": 1},
+    }
+    if r["padre"]:
+        tramo_otlp["parentSpanId"] = r["padre"]
+    return {"resourceSpans": [{
+        "resource": {"attributes": [
+            {"key": "service.name", "value": {"stringValue": SERVICIO}},
+            {"key": "process.pid", "value": {"intValue": str(r["pid"])}},
+        ]},
+        "scopeSpans": [{"scope": {"name": "trazas"}, "spans": [tramo_otlp]}],
+    }]}
+
+
+def _de_otlp(obj: dict):
+    """Inverso de _a_otlp (para que el resumen lea los dos formatos)."""
+    for rs in obj.get("resourceSpans", []):
+        for ss in rs.get("scopeSpans", []):
+            for s in ss.get("spans", []):
+                inicio, fin = int(s["startTimeUnixNano"]), int(s["endTimeUnixNano"])
+                yield {
+                    "traza": s["traceId"], "id": s["spanId"], "padre": s.get("parentSpanId"),
+                    "nombre": s["name"], "inicio_ns": inicio, "duracion_ms": (fin - inicio) / 1e6,
+                    "estado": "error" if s.get("status", {}).get("code") == 2 else "ok",
+                    "atributos": {a["key"]: next(iter(a["value"].values()))
+                                  for a in s.get("attributes", [])},
+                }
+
+
+# ---------------- Tramos ----------------
+class Tramo:
+    __slots__ = ("nombre", "traza", "id", "padre", "atributos", "_inicio_ns", "_t0", "_ficha")
+
+    def __init__(self, nombre: str, traza: str, padre, atributos: dict):
+        self.nombre = nombre
+        self.traza = traza
+        self.id = _nuevo_id(8)
+        self.padre = padre
+        self.atributos = atributos
+        self._inicio_ns = time.time_ns()
+        self._t0 = time.perf_counter()
+        self._ficha = None
+
+    def traceparent(self) -> str:
+        return f"00-{self.traza}-{self.id}-01"
+
+    def __enter__(self):
+        self._ficha = _actual.set(self)
+        return self
+
+    def __exit__(self, tipo, valor, tb):
+        duracion = (time.perf_counter() - self._t0) * 1000
+        _actual.reset(self._ficha)
+        if tipo is SystemExit and valor.code in (0, None):
+            tipo = None  # sys.exit(0) de un script no es un error
+        registro = {
+            "traza": self.traza,
+            "id": self.id,
+            "padre": self.padre,
+            "nombre": self.nombre,
+            "inicio_ns": self._inicio_ns,
+            "duracion_ms": round(duracion, 3),
+            "estado": "ok" if tipo is None else "error",
+            "atributos": self.atributos,
+            "pid": os.getpid(),
+            "hilo": threading.current_thread().name,
+        }
+        if tipo is not None:
+            registro["error"] = f"{tipo.__name__}: {valor}"[:300]
+        _sumidero.escribir(registro)
+        if _observadores:
+            _notificar(self.nombre, duracion / 1000, registro["estado"], self.atributos)
+        return False
+
+
+class _TramoNulo:
+    """Lo que devuelve tramo() con las trazas desactivadas: no mide ni escribe."""
+    __slots__ = ("atributos",)
+
+    def __init__(self):
+        self.atributos = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _TramoMedido:
+    """Con TRAZAS=0 pero con observadores (metricas.py): mide y avisa, sin escribir."""
+    __slots__ = ("nombre", "atributos", "_t0")
+
+    def __init__(self, nombre: str, atributos: dict):
+        self.nombre = nombre
+        self.atributos = atributos
+        self._t0 = time.perf_counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, tb):
+        if tipo is SystemExit and valor.code in (0, None):
+            tipo = None
+        _notificar(self.nombre, time.perf_counter() - self._t0,
+                   "ok" if tipo is None else "error", self.atributos)
+        return False
+
+
+# ---------------- Observadores ----------------
+_observadores = []
+
+
+def al_cerrar_tramo(oyente):
+    """
+    oyente(nombre, segundos, estado, atributos) se llama al cerrar cada
+    tramo, también con las trazas desactivadas. Debe ser rápido.
+    """
+    _observadores.append(oyente)
+
+
+def _notificar(nombre: str, segundos: float, estado: str, atributos: dict):
+    for oyente in _observadores:
+        try:
+            oyente(nombre, segundos, estado, atributos)
+        except Exception:
+            pass  # un observador roto no debe romper la aplicación
+
+
+def _padre_de_entorno():
+    """(traza, id) de TRAZA_PADRE si el proceso lo recibió de quien lo lanzó."""
+    partes = os.getenv(ENV_PADRE, "").split("-")
+    if len(partes) == 4 and len(partes[1]) == 32 and len(partes[2]) == 16:
+        return partes[1], partes[2]
+    return None, None
+
+
+def tramo(nombre: str, **atributos):
+    """Context manager de un tramo, hijo del tramo activo (o de TRAZA_PADRE)."""
+    if not trazas_activadas():
+        return _TramoMedido(nombre, atributos) if _observadores else _TramoNulo()
+    padre = _actual.get()
+    if padre is not None:
+        return Tramo(nombre, padre.traza, padre.id, atributos)
+    traza, id_padre = _padre_de_entorno()
+    return Tramo(nombre, traza or _nuevo_id(16), id_padre, atributos)
+
+
+def trazado(nombre: str = None, **atributos):
+    """Decorador: cada llamada a la función es un tramo."""
+    def decorador(fn):
+        etiqueta = nombre or fn.__qualname__
+
+        @functools.wraps(fn)
+        def envoltura(*args, **kwargs):
+            with tramo(etiqueta, **atributos):
+                return fn(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+# ---------------- Propagación ----------------
+def propagar(fn):
+    """Envuelve fn para que, en otro hilo, sus tramos cuelguen del tramo actual."""
+    contexto = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def envoltura(*args, **kwargs):
+        return contexto.run(fn, *args, **kwargs)
+    return envoltura
+
+
+def env_con_traza(env: dict) -> dict:
+    """Copia de env con TRAZA_PADRE y TRAZAS_ARCHIVO (absoluto) para un subproceso."""
+    env = dict(env)
+    actual = _actual.get()
+    if actual is not None:
+        env[ENV_PADRE] = actual.traceparent()
+    env.setdefault("TRAZAS_ARCHIVO", os.path.abspath(_archivo()))
+    return env
+
+
+# ---------------- Resumen ----------------
+def leer_tramos(ruta: str = None, ultimos: int = None):
+    """
+    Tramos del archivo y de su rotación anterior (.1), en cualquiera de los
+    dos formatos. Con `ultimos` solo se guardan en memoria los N más recientes.
+    """
+    ruta = ruta or _archivo()
+    tramos = deque(maxlen=ultimos or None)
+    for archivo in (ruta + ".1", ruta):
+        try:
+            with open(archivo, encoding="utf-8") as f:
+                for linea in f:
+                    try:
+                        obj = json.loads(linea)
+                    except ValueError:
+                        continue  # línea a medio escribir
+                    if "resourceSpans" in obj:
+                        tramos.extend(_de_otlp(obj))
+                    else:
+                        tramos.append(obj)
+        except FileNotFoundError:
+            continue
+    return list(tramos)
+
+
+def _percentil(valores, p: float) -> float:
+    """Percentil por rango más cercano (valores ya ordenados)."""
+    if not valores:
+        return 0.0
+    k = max(0, min(len(valores) - 1, math.ceil(p / 100 * len(valores)) - 1))
+    return valores[k]
+
+
+def resumen(tramos) -> list:
+    """Por nombre: n, p50, p95, máximo y total en ms, y errores; de más a menos tiempo total."""
+    por_nombre = defaultdict(list)
+    errores = defaultdict(int)
+    for t in tramos:
+        por_nombre[t["nombre"]].append(t["duracion_ms"])
+        if t.get("estado") == "error":
+            errores[t["nombre"]] += 1
+    filas = []
+    for nombre, duraciones in por_nombre.items():
+        duraciones.sort()
+        filas.append({
+            "nombre": nombre,
+            "n": len(duraciones),
+            "p50_ms": round(_percentil(duraciones, 50), 2),
+            "p95_ms": round(_percentil(duraciones, 95), 2),
+            "max_ms": round(duraciones[-1], 2),
+            "total_ms": round(sum(duraciones), 1),
+            "errores": errores[nombre],
+        })
+    filas.sort(key=lambda f: -f["total_ms"])
+    return filas
+
+
+def texto_resumen(filas) -> str:
+    if not filas:
+        return "Sin tramos registrados."
+    ancho = max(24, max(len(f["nombre"]) for f in filas))
+    lineas = [f"{'tramo':<{ancho}} {'n':>6} {'p50 ms':>10} {'p95 ms':>10} "
+              f"{'max ms':>10} {'total s':>9} {'err':>4}"]
+    for f in filas:
+        lineas.append(f"{f['nombre']:<{ancho}} {f['n']:>6} {f['p50_ms']:>10.2f} {f['p95_ms']:>10.2f} "
+                      f"{f['max_ms']:>10.2f} {f['total_ms'] / 1000:>9.2f} {f['errores']:>4}")
+    return "\n".join(lineas)
+
+
+def texto_arbol(tramos, traza: str = None) -> str:
+    """Árbol de una traza (por defecto, la del último tramo escrito)."""
+    if not tramos:
+        return "Sin tramos registrados."
+    traza = traza or tramos[-1]["traza"]
+    propios = sorted((t for t in tramos if t["traza"] == traza), key=lambda t: t["inicio_ns"])
+    ids = {t["id"] for t in propios}
+    hijos = defaultdict(list)
+    for t in propios:
+        hijos[t["padre"] if t["padre"] in ids else None].append(t)
+    lineas = [f"traza {traza}"]
+
+    def pintar(padre, nivel):
+        for t in hijos[padre]:
+            marca = " ❌" if t.get("estado") == "error" else ""
+            extra = " ".join(f"{k}={v}" for k, v in t.get("atributos", {}).items())
+            lineas.append(f"{'  ' * nivel}{t['nombre']}  {t['duracion_ms']:.1f} ms{marca}"
+                          + (f"  [{extra}]" if extra else ""))
+            pintar(t["id"], nivel + 1)
+
+    pintar(None, 1)
+    return "\n".join(lineas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumen de las trazas registradas")
+    parser.add_argument("vista", nargs="?", choices=("resumen", "ultima"), default="resumen")
+    parser.add_argument("--archivo", default=None, help="por defecto TRAZAS_ARCHIVO")
+    parser.add_argument("--ultimos", type=int, default=None, help="solo los N tramos más recientes")
+    parser.add_argument("--traza", default=None, help="id de traza para la vista 'ultima'")
+    args = parser.parse_args()
+
+    tramos = leer_tramos(args.archivo, args.ultimos)
+    if args.vista == "ultima":
+        print(texto_arbol(tramos, args.traza))
+    else:
+        print(texto_resumen(resumen(tramos)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())